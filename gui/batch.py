@@ -0,0 +1,236 @@
+from __future__ import annotations
+from typing import *
+
+import numpy as np
+
+from gui.graphics import Bounds, Point
+from gui.primitives import *
+from misc import default
+from misc.util import parse_color_rgba
+
+
+class ColorCache:
+    """
+    Packed draw list colors per distinct color value and shading factor, so every color is parsed once.
+    """
+
+    def __init__(self):
+        self.colors: Dict[Tuple[Any, float], int] = dict()
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    @staticmethod
+    def pack(r: float, g: float, b: float, a: float) -> int:
+        # Same rounding and ABGR layout as imgui.get_color_u32_rgba, without needing an imgui context
+        def channel(c):
+            return int(min(max(np.float32(c), 0.0), 1.0) * np.float32(255.0) + np.float32(0.5))
+
+        return channel(a) << 24 | channel(b) << 16 | channel(g) << 8 | channel(r)
+
+    def get(self, value: Any, factor: float) -> int:
+        key = (value, factor)
+        if key not in self.colors:
+            if value is None:
+                r, g, b, a = default.r, default.g, default.b, default.a
+            else:
+                r, g, b, a = parse_color_rgba(value, factor)
+            self.colors[key] = ColorCache.pack(r * factor, g * factor, b * factor, a)
+
+        return self.colors[key]
+
+
+class DrawBatch:
+    """
+    Retained draw commands for a primitive tree, in draw order, as NumPy columns.
+
+    Every command has a kind, four world space geometry values (rectangle or line corners, or circle center and
+    radius), world space bounds for culling and a packed color. Group commands follow their subtree and also store
+    where it starts, together with the color of its first primitive. The batch is rebuilt only when the tree, its
+    version or the selected group changes, and the screen space commands are reused as long as the camera does not
+    move.
+
+    Level of detail is decided on screen size: primitives smaller than point_pixels become single pixel sprites and
+    groups smaller than group_pixels are drawn as one filled box instead of their subtree.
+    """
+    RECT = 0
+    LINE = 1
+    CIRCLE = 2
+    GROUP = 3
+    POINT = 4
+    GROUP_FILL = 5
+
+    group_margin = 10
+    group_color = "c_ffffffff"
+    point_pixels = 1.0
+    group_pixels = 2.0
+
+    def __init__(self):
+        self.colors: ColorCache = ColorCache()
+        self.key: Optional[Tuple[int, int, ReferenceFactory.Reference]] = None
+        self.kinds: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self.geometry: np.ndarray = np.zeros((0, 4), dtype=np.float64)
+        self.bounds: np.ndarray = np.zeros((0, 4), dtype=np.float64)
+        self.color: np.ndarray = np.zeros(0, dtype=np.uint32)
+        self.starts: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.fill: np.ndarray = np.zeros(0, dtype=np.uint32)
+        self.builds: int = 0
+
+        self._view_key: Optional[Tuple] = None
+        self._commands: List[Tuple[int, Tuple]] = []
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def update(self, root: PrimitiveGroup, selected_group: ReferenceFactory.Reference) -> bool:
+        # Building reads every bounds, so afterwards any edit propagates up to the root and bumps its version
+        key = (id(root), root.version, selected_group)
+        if key == self.key:
+            return False
+
+        self.build(root, selected_group)
+        self.key = (id(root), root.version, selected_group)
+
+        return True
+
+    def build(self, root: PrimitiveGroup, selected_group: ReferenceFactory.Reference):
+        kinds: List[int] = []
+        geometry: List[Tuple[float, float, float, float]] = []
+        bounds: List[Tuple[float, float, float, float]] = []
+        colors: List[int] = []
+        starts: List[int] = []
+        fills: List[int] = []
+
+        def add(kind: int, values: Tuple[float, float, float, float], box: Bounds, color: int, start: Optional[int] = None, fill: Optional[int] = None):
+            kinds.append(kind)
+            geometry.append(values)
+            bounds.append((box.min.x, box.min.y, box.max.x, box.max.y))
+            colors.append(color)
+            starts.append(len(starts) if start is None else start)
+            fills.append(color if fill is None else fill)
+
+        def color(primitive: Primitive, factor: float) -> int:
+            value = primitive[primitive.color_index] if primitive.color_index is not None and primitive.arity > primitive.color_index else None
+            return self.colors.get(value, factor)
+
+        def visit(renderable: PrimitiveGroup.Parameter, selected: bool, root: bool = False):
+            box = renderable.bounds()
+            if isinstance(renderable, PrimitiveGroup):
+                selected = selected or renderable.identifier == selected_group
+                start = len(kinds)
+                for child in renderable:
+                    visit(child, selected)
+
+                if not root and box is not None:
+                    factor = 1.0 if selected else 0.5
+                    group_color = self.colors.get(DrawBatch.group_color, factor)
+                    fill = next((colors[index] for index in range(start, len(kinds)) if kinds[index] != DrawBatch.GROUP), group_color)
+                    add(DrawBatch.GROUP, (box.min.x, box.min.y, box.max.x, box.max.y), box, group_color, start=start, fill=fill)
+                return
+
+            factor = 1.0 if selected else 0.5
+            if isinstance(renderable, Rect):
+                add(DrawBatch.RECT, (box.min.x, box.min.y, box.max.x, box.max.y), box, color(renderable, factor))
+            elif isinstance(renderable, (Line, Vector)):
+                start, end = renderable.endpoints()
+                add(DrawBatch.LINE, (start.x, start.y, end.x, end.y), box, color(renderable, factor))
+            elif isinstance(renderable, Circle):
+                add(DrawBatch.CIRCLE, (renderable[0], renderable[1], renderable.get_radius(), 0.0), box, color(renderable, factor))
+
+        visit(root, False, root=True)
+
+        self.kinds = np.array(kinds, dtype=np.uint8)
+        self.geometry = np.array(geometry, dtype=np.float64).reshape((-1, 4))
+        self.bounds = np.array(bounds, dtype=np.float64).reshape((-1, 4))
+        self.color = np.array(colors, dtype=np.uint32)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.fill = np.array(fills, dtype=np.uint32)
+        self.builds += 1
+        self._view_key = None
+
+    def visible(self, viewport: Optional[Bounds]) -> np.ndarray:
+        if viewport is None:
+            return np.arange(len(self.kinds))
+
+        mask = (self.bounds[:, 0] <= viewport.max.x) & (viewport.min.x <= self.bounds[:, 2]) & (self.bounds[:, 1] <= viewport.max.y) & (viewport.min.y <= self.bounds[:, 3])
+
+        return np.nonzero(mask)[0]
+
+    def screen(self, offset: Point, scale: float) -> np.ndarray:
+        # Screen space x0, y0, x1, y1 for every command, circles keep their radius in the third column
+        screen = np.empty_like(self.geometry)
+        screen[:, 0] = self.geometry[:, 0] * scale + offset.x
+        screen[:, 1] = self.geometry[:, 1] * -scale + offset.y
+        screen[:, 2] = self.geometry[:, 2] * scale + offset.x
+        screen[:, 3] = self.geometry[:, 3] * -scale + offset.y
+
+        circles = self.kinds == DrawBatch.CIRCLE
+        screen[circles, 2] = self.geometry[circles, 2] * scale
+
+        return screen
+
+    def level_of_detail(self, screen: np.ndarray, scale: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Kinds after level of detail, commands hidden inside collapsed groups and circle segment counts
+        kinds = self.kinds.copy()
+        extent = np.maximum(self.bounds[:, 2] - self.bounds[:, 0], self.bounds[:, 3] - self.bounds[:, 1]) * scale
+
+        groups = self.kinds == DrawBatch.GROUP
+        collapsed = groups & (extent < DrawBatch.group_pixels)
+        delta = np.zeros(len(kinds) + 1, dtype=np.int64)
+        np.add.at(delta, self.starts[collapsed], 1)
+        np.add.at(delta, np.nonzero(collapsed)[0], -1)
+        hidden = np.cumsum(delta)[:-1] > 0
+        kinds[collapsed] = DrawBatch.GROUP_FILL
+
+        points = ~groups & (extent < DrawBatch.point_pixels)
+        kinds[points] = DrawBatch.POINT
+        centers_x = (screen[points, 0] + screen[points, 2]) / 2.0
+        centers_y = (screen[points, 1] + screen[points, 3]) / 2.0
+        circles = self.kinds[points] == DrawBatch.CIRCLE
+        centers_x[circles], centers_y[circles] = screen[points, 0][circles], screen[points, 1][circles]
+        screen[points] = np.stack([centers_x - 0.5, centers_y - 0.5, centers_x + 0.5, centers_y + 0.5], axis=1)
+
+        outlined = groups & ~collapsed
+        screen[outlined] += np.array([-1.0, 1.0, 1.0, -1.0]) * DrawBatch.group_margin
+
+        segments = np.clip(np.ceil(2.0 * np.pi * np.abs(self.geometry[:, 2] * scale) / Circle.segment_length), Circle.min_segments, Circle.max_segments).astype(np.int64)
+
+        return kinds, hidden, segments
+
+    def commands(self, offset: Point, scale: float, viewport: Optional[Bounds] = None) -> List[Tuple[int, Tuple]]:
+        view_key = (offset.x, offset.y, scale, None if viewport is None else (viewport.min.x, viewport.min.y, viewport.max.x, viewport.max.y))
+        if view_key == self._view_key:
+            return self._commands
+
+        screen = self.screen(offset, scale)
+        kinds, hidden, segments = self.level_of_detail(screen, scale)
+
+        indices = self.visible(viewport)
+        indices = indices[~hidden[indices]]
+        screen = screen[indices].tolist()
+        colors = np.where(kinds == DrawBatch.GROUP_FILL, self.fill, self.color)[indices].tolist()
+        segments = segments[indices].tolist()
+        kinds = kinds[indices].tolist()
+
+        self._commands = []
+        for kind, (x0, y0, x1, y1), color, segment in zip(kinds, screen, colors, segments):
+            if kind == DrawBatch.CIRCLE:
+                self._commands.append((kind, (x0, y0, x1, color, segment)))
+            else:
+                self._commands.append((kind, (x0, y0, x1, y1, color)))
+        self._view_key = view_key
+
+        return self._commands
+
+    def submit(self, draw_list: Any, offset: Point, scale: float, viewport: Optional[Bounds] = None):
+        # The draw list has no bulk api, so the prepared arguments are handed over in one tight loop
+        functions = {
+            DrawBatch.RECT: draw_list.add_rect_filled,
+            DrawBatch.LINE: draw_list.add_line,
+            DrawBatch.CIRCLE: draw_list.add_circle_filled,
+            DrawBatch.GROUP: draw_list.add_rect,
+            DrawBatch.POINT: draw_list.add_rect_filled,
+            DrawBatch.GROUP_FILL: draw_list.add_rect_filled,
+        }
+        for kind, arguments in self.commands(offset, scale, viewport):
+            functions[kind](*arguments)
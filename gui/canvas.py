@@ -5,10 +5,12 @@ import math
 import imgui
 import numpy as np
 
+from gui.batch import DrawBatch
 from gui.graphics import Bounds, Point
 from gui.primitives import PrimitiveGroup, Renderable, Primitive
 from misc import util, default
 from misc.util import ReferenceFactory
+from pattern.virtual import VirtualPrimitiveGroup
 
 
 class Selection:
@@ -64,6 +66,7 @@ class Selection:
 class Canvas:
 
     handle_size = 5
+    label_pixels = 8
 
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
@@ -80,6 +83,7 @@ class Canvas:
         self.selected_handle: Optional[int] = None
 
         self.scale: float = 1.0
+        self.batch: DrawBatch = DrawBatch()
 
     def __getitem__(self, item: int) -> PrimitiveGroup.Parameter:
         return self.primitives[item]
@@ -106,7 +110,15 @@ class Canvas:
                 _selected: bool = False,
                 _intersected: bool = False,
                 _render_identifiers: bool = False,
-                _render_order: int = 0):
+                _render_order: int = 0,
+                _render_primitives: bool = True,
+                _viewport: Optional[Bounds] = None):
+
+            # Subtrees outside the visible world rectangle are skipped entirely, including their overlays
+            if _viewport is not None and not _root:
+                bounds = renderable.bounds()
+                if bounds is not None and not _viewport.intersects(bounds):
+                    return
 
             if isinstance(renderable, PrimitiveGroup):
                 if renderable.identifier == self.selected_group:
@@ -118,14 +130,15 @@ class Canvas:
                 for index, child in enumerate(renderable):
                     is_selected = is_in_selected_group and index in self.selected_renderables
                     is_intersected = is_in_selected_group and index == self.intersected_renderable
-                    render_renderable(child, draw_list, offset, _child_of_selected_group=_child_of_selected_group, _selected=is_selected, _intersected=is_intersected, _render_order=_render_order, _render_identifiers=_render_identifiers)
+                    render_renderable(child, draw_list, offset, _child_of_selected_group=_child_of_selected_group, _selected=is_selected, _intersected=is_intersected, _render_order=_render_order, _render_identifiers=_render_identifiers, _render_primitives=_render_primitives, _viewport=_viewport)
 
                 if _render_order == 1 and is_in_selected_group or _render_order == 2:
                     self.render_order(renderable, draw_list, offset)
 
             if not _root:
                 factor = 1.0 if _child_of_selected_group else 0.5
-                renderable.render(draw_list, offset, self.scale, factor)
+                if _render_primitives:
+                    renderable.render(draw_list, offset, self.scale, factor)
 
                 if _render_identifiers:
                     self.render_identifier(renderable, draw_list, offset, factor)
@@ -142,9 +155,54 @@ class Canvas:
 
         _render_order = kwargs['render_order'] if 'render_order' in kwargs else False
         _render_identifiers = kwargs['render_identifiers'] if 'render_identifiers' in kwargs else False
-        render_renderable(self.primitives, draw_list, offset, _root=True, _render_order=_render_order, _render_identifiers=_render_identifiers)
+        _viewport = kwargs['viewport'] if 'viewport' in kwargs else None
+        _batch = kwargs['batch'] if 'batch' in kwargs else True
+
+        # Virtual groups generate their children on demand, so only they know what is worth drawing
+        if isinstance(self.primitives, VirtualPrimitiveGroup):
+            self.primitives.render_visible(draw_list, offset, self.scale, _viewport)
+            return
+
+        if not _batch:
+            render_renderable(self.primitives, draw_list, offset, _root=True, _render_order=_render_order, _render_identifiers=_render_identifiers, _viewport=_viewport)
+            return
+
+        self.batch.update(self.primitives, self.selected_group)
+        self.batch.submit(draw_list, offset, self.scale, _viewport)
+
+        if _render_identifiers or _render_order == 2:
+            render_renderable(self.primitives, draw_list, offset, _root=True, _render_order=_render_order, _render_identifiers=_render_identifiers, _render_primitives=False, _viewport=_viewport)
+        else:
+            self.render_overlays(draw_list, offset, _render_order)
+
+    def render_overlays(self, draw_list: Any, offset: Point, render_order: int = 0):
+        # Selection, intersection and order overlays only concern the direct children of the selected group
+        group = self.primitives.find(self.selected_group)
+        if not isinstance(group, PrimitiveGroup):
+            return
+
+        if self.intersected_renderable is not None and self.intersected_renderable < len(group):
+            group[self.intersected_renderable].bounds().render(draw_list, offset, self.scale, Canvas.handle_size)
+
+        for index in self.selected_renderables:
+            if index >= len(group):
+                continue
+
+            renderable = group[index]
+            renderable.bounds().render(draw_list, offset, self.scale)
+            if self.selected_renderables.is_single_selection():
+                for handle in renderable.handles():
+                    handle.render(draw_list, offset, self.scale)
+
+        if render_order == 1:
+            self.render_order(group, draw_list, offset)
 
     def render_identifier(self, renderable: Renderable, draw_list: Any, offset: Point, factor: float = 1.0):
+        # Labels of primitives too small to tell apart on screen are only clutter
+        bounds = renderable.bounds()
+        if bounds is not None and max(bounds.width(), bounds.height()) * self.scale < Canvas.label_pixels:
+            return
+
         position = renderable.position()
         draw_list.add_text(
             position.x * self.scale + offset.x,
@@ -177,6 +235,12 @@ class Canvas:
             draw_list.add_convex_poly_filled(points, imgui.get_color_u32_rgba(*default.colors[default.color]["arrow"]))
 
 
+    def viewport(self, offset: Point, size: Point) -> Bounds:
+        # World space rectangle visible in a canvas region of the given size, with the origin at offset from its corner
+        return Bounds(
+            Point(-offset.x / self.scale, (offset.y - size.y) / self.scale),
+            Point((size.x - offset.x) / self.scale, offset.y / self.scale))
+
     def render_grid(self, draw_list, offset: Point, position_min: Point, position_max: Point, grid_step=64):
         for x in util.frange(math.fmod(offset.x, grid_step * self.scale), position_max.x - position_min.x, grid_step * self.scale):
             color = imgui.get_color_u32_rgba(*default.colors[default.color]["grid"])
@@ -217,10 +281,7 @@ class Canvas:
             print("Selected group not found {} {}".format(self.selected_group, self.primitives.identifier))
             return
 
-        for index, primitive in enumerate(reversed(group)):
-            if self.intersected_point in primitive.bounds():
-                self.intersected_renderable = len(group) - index - 1
-                break
+        self.intersected_renderable = group.intersect(self.intersected_point)
 
     def mouse_drag(self, position: Point):
         if self.selected_renderables.empty():
@@ -338,6 +399,6 @@ class Canvas:
     def selection_to_front(self):
         group = self.primitives.find(self.selected_group)
         for primitive in sorted(self.selected_renderables, reverse=True):
-            group.primitives.insert(0, group.primitives.pop(primitive))
+            group.insert(0, group.pop(primitive))
 
         self.reset_selection()
\ No newline at end of file
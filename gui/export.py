@@ -0,0 +1,84 @@
+from __future__ import annotations
+from typing import *
+
+from gui.graphics import Bounds, Point
+from gui.primitives import PrimitiveGroup, Primitive
+
+
+class Exporter:
+    """
+    Streams the primitives of a group tree to a file, one line per primitive, optionally restricted to a viewport.
+    """
+    extension = ""
+    indent = "\t\t"
+
+    def header(self, bounds: Bounds) -> str:
+        return ""
+
+    def footer(self) -> str:
+        return ""
+
+    def primitive(self, primitive: Primitive) -> str:
+        pass
+
+    def primitives(self, root: PrimitiveGroup, viewport: Optional[Bounds] = None) -> Iterator[Primitive]:
+        stack = [iter(root)]
+        while len(stack) > 0:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            elif isinstance(child, PrimitiveGroup):
+                stack.append(iter(child))
+            elif viewport is None or viewport.intersects(child.bounds()):
+                yield child
+
+    def write(self, path: str, root: PrimitiveGroup, viewport: Optional[Bounds] = None) -> int:
+        bounds = viewport
+        if bounds is None:
+            bounds = root.bounds() if len(root) > 0 else Bounds(Point(0, 0), Point(0, 0))
+
+        count = 0
+        with open(path, "w") as file:
+            file.write(self.header(bounds))
+            for primitive in self.primitives(root, viewport):
+                line = self.primitive(primitive)
+                if len(line) == 0:
+                    continue
+
+                file.write(self.indent)
+                file.write(line)
+                file.write("\n")
+                count += 1
+            file.write(self.footer())
+
+        return count
+
+
+class TikzExporter(Exporter):
+    extension = ".tex"
+
+    def header(self, bounds: Bounds) -> str:
+        return "\\resizebox{1.0\\textwidth}{!}{\n\t\\begin{tikzpicture}\n"
+
+    def footer(self) -> str:
+        return "\t\\end{tikzpicture}\n}\n"
+
+    def primitive(self, primitive: Primitive) -> str:
+        return primitive.tikz()
+
+
+class SvgExporter(Exporter):
+    extension = ".svg"
+
+    def header(self, bounds: Bounds) -> str:
+        # The canvas y axis points up, the svg one down
+        return "".join([
+            "<svg xmlns=\"http://www.w3.org/2000/svg\" viewBox=\"{} {} {} {}\">\n".format(bounds.min_x(), -bounds.max_y(), bounds.width(), bounds.height()),
+            "\t<defs><marker id=\"arrow\" viewBox=\"0 0 10 10\" refX=\"10\" refY=\"5\" markerWidth=\"8\" markerHeight=\"8\" orient=\"auto\"><path d=\"M 0 0 L 10 5 L 0 10 z\"/></marker></defs>\n",
+            "\t<g transform=\"scale(1, -1)\">\n"])
+
+    def footer(self) -> str:
+        return "\t</g>\n</svg>\n"
+
+    def primitive(self, primitive: Primitive) -> str:
+        return primitive.svg()
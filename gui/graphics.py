@@ -93,6 +93,9 @@ class Bounds:
 
         return Bounds(min, max)
 
+    def intersects(self, other) -> bool:
+        return self.min.x <= other.max.x and other.min.x <= self.max.x and self.min.y <= other.max.y and other.min.y <= self.max.y
+
     def expanded(self, other):
         return Bounds(
             self.min.min(other.min),
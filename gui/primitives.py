@@ -1,9 +1,11 @@
 from __future__ import annotations
 from typing import *
 from abc import *
+from io import StringIO
 import math
 
 from gui.graphics import Point, Bounds
+from gui.spatial import SpatialIndex
 from misc.util import *
 from misc import default
 
@@ -11,6 +13,14 @@ class Renderable(ABC):
 
     def __init__(self, identifier: ReferenceFactory.Reference):
         self._identifier = identifier
+        self.parent_group: Optional[PrimitiveGroup] = None
+
+        # Geometry caches, _dirty is set while none of them has been computed since the last change
+        self._position: Optional[Point] = None
+        self._bounds: Optional[Bounds] = None
+        self._handles: Optional[List[Point]] = None
+        self._dirty: bool = True
+        self._version: int = 0
 
     @property
     def identifier(self) -> ReferenceFactory.Reference:
@@ -23,16 +33,57 @@ class Renderable(ABC):
     def master(self):
         return self
 
+    @property
+    def version(self) -> int:
+        # Bumped whenever a change reaches this renderable, which is always the case once its geometry was read
+        return self._version
+
+    def invalidate(self):
+        self._position = None
+        self._bounds = None
+        self._handles = None
+
+    def signatures(self) -> Dict[Tuple[str, int], int]:
+        return dict()
+
+    def changed(self):
+        self._dirty = True
+        self._version += 1
+        self.invalidate()
+        if self.parent_group is not None:
+            self.parent_group.child_changed(self)
+
     def move(self, delta: Point):
         pass
 
     def position(self) -> Point:
-        return Point(0, 0)
+        if self._position is None:
+            self._position = self._calculate_position()
+            self._dirty = False
+
+        return self._position
 
     def bounds(self) -> Bounds:
+        if self._bounds is None:
+            self._bounds = self._calculate_bounds()
+            self._dirty = False
+
+        return self._bounds
+
+    def handles(self) -> List[Point]:
+        if self._handles is None:
+            self._handles = self._calculate_handles()
+            self._dirty = False
+
+        return self._handles
+
+    def _calculate_position(self) -> Point:
+        return Point(0, 0)
+
+    def _calculate_bounds(self) -> Bounds:
         return Bounds(Point(0, 0), Point(0, 0))
 
-    def handles(self) -> [Point]:
+    def _calculate_handles(self) -> List[Point]:
         return []
 
     def handle(self, index: int, position: Point):
@@ -41,10 +92,22 @@ class Renderable(ABC):
     def render(self, draw_list, offset: Point, scale: float, factor: float = 1.0):
         pass
 
+    def tikz(self) -> str:
+        return ""
+
+    def svg(self) -> str:
+        return ""
+
     @abstractmethod
-    def dsl(self, _depth: int = 0, _identifier: bool = False) -> str:
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False):
         pass
 
+    def dsl(self, _depth: int = 0, _identifier: bool = False) -> str:
+        sink = StringIO()
+        self.write_dsl(sink, _depth, _identifier)
+
+        return sink.getvalue()
+
     def __len__(self) -> int:
         return 1
 
@@ -53,6 +116,11 @@ class Primitive(Renderable):
     Parameter = Union[int, float, str]
     Parameters = List[Parameter]
 
+    # Index of the optional color parameter
+    color_index: Optional[int] = None
+    # Number of leading parameters that are coordinates
+    coordinate_count: int = 2
+
     def __init__(self, identifier: ReferenceFactory.Reference, name: Optional[str], arity: int, *parameters: Primitive.Parameter):
         super(Primitive, self).__init__(identifier)
 
@@ -65,6 +133,7 @@ class Primitive(Renderable):
 
     def __setitem__(self, key: int, value: Primitive.Parameter):
         self.parameters[key] = value
+        self.changed()
 
     def __str__(self) -> str:
         return "{}{}{}".format(
@@ -78,18 +147,56 @@ class Primitive(Renderable):
     def __len__(self) -> int:
         return self.arity
 
-    def dsl(self, _depth: int = 0, _identifier: bool = False) -> str:
-        return "{}{}{}{}{}".format(
-            "\t" * _depth,
-            "{}{}".format(default.tokens[default.identifier], self.identifier) if _identifier else "",
-            self.name,
-            format_list(self.parameters, str, default.tokens[default.primitive_begin], default.tokens[default.value_separator], default.tokens[default.primitive_end]),
-            default.tokens[default.primitive_separator])
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False):
+        sink.write("\t" * _depth)
+        if _identifier:
+            sink.write(default.tokens[default.identifier])
+            sink.write(str(self.identifier))
+        sink.write(self.name)
+        write_list(sink, self.parameters, format_number, default.tokens[default.primitive_begin], default.tokens[default.value_separator], default.tokens[default.primitive_end])
+        sink.write(default.tokens[default.primitive_separator])
 
     @property
     def master(self) -> Primitive:
         return self
 
+    @property
+    def signature(self) -> Tuple[str, int]:
+        return self.name, self.arity
+
+    def signatures(self) -> Dict[Tuple[str, int], int]:
+        return { self.signature: 1 }
+
+    def parameter_kind(self, index: int) -> str:
+        if index == self.color_index:
+            return "color"
+        if index < self.coordinate_count:
+            return "coordinate"
+
+        return "size"
+
+    def color_rgba(self) -> Tuple[float, float, float, float]:
+        if self.color_index is not None and self.arity > self.color_index:
+            return parse_color_rgba(self[self.color_index], 1.0)
+
+        return default.r, default.g, default.b, default.a
+
+    def color_rgb255(self) -> Tuple[int, int, int, float]:
+        r, g, b, a = self.color_rgba()
+
+        def f(c):
+            return min(max(0, int(c * 255.0)), 255)
+
+        return f(r), f(g), f(b), a
+
+    def tikz_color(self, attribute: str) -> str:
+        return "{}={{rgb, 255: red, {}; green, {}; blue, {}}}, draw opacity={}".format(attribute, *self.color_rgb255())
+
+    def svg_color(self, attribute: str) -> str:
+        r, g, b, a = self.color_rgb255()
+
+        return "{}=\"rgb({}, {}, {})\" {}-opacity=\"{}\"".format(attribute, r, g, b, attribute, a)
+
     def as_list(self) -> Primitive.Parameters:
         return [self.name] + self.parameters
 
@@ -124,6 +231,12 @@ class PrimitiveGroup(Renderable):
         self._master: Optional[Primitive] = None
         self._min_arity: Optional[int] = None
         self._max_arity: Optional[int] = None
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._order: Optional[Dict[int, int]] = dict()
+        # Identifier to node and depth for the whole tree, only kept by the root and built on the first lookup
+        self._registry: Optional[Dict[ReferenceFactory.Reference, Tuple[PrimitiveGroup.Parameter, int]]] = None
+        # Number of primitives per signature in this subtree
+        self._signatures: Dict[Tuple[str, int], int] = dict()
 
         for primitive in primitives:
             self.append(primitive)
@@ -146,12 +259,26 @@ class PrimitiveGroup(Renderable):
     def __reversed__(self):
         return self.primitives.__reversed__()
 
-    def dsl(self, _depth: int = 0, _identifier: bool = False) -> str:
-        return "{}{}\n{}\n{}".format(
-            "\t" * _depth,
-            default.tokens[default.primitive_group_begin],
-            "\n".join([primitive.dsl(_depth + 1, _identifier) for primitive in self.primitives]),
-            "\t" * _depth + default.tokens[default.primitive_group_end])
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False):
+        sink.write("\t" * _depth)
+        sink.write(default.tokens[default.primitive_group_begin])
+        sink.write("\n")
+        self.write_children_dsl(sink, _depth + 1, _identifier)
+        sink.write("\n")
+        sink.write("\t" * _depth)
+        sink.write(default.tokens[default.primitive_group_end])
+
+    def write_children_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False):
+        for index, primitive in enumerate(self.primitives):
+            if index > 0:
+                sink.write("\n")
+            primitive.write_dsl(sink, _depth, _identifier)
+
+    def children_dsl(self, _depth: int = 0, _identifier: bool = False) -> str:
+        sink = StringIO()
+        self.write_children_dsl(sink, _depth, _identifier)
+
+        return sink.getvalue()
 
     @property
     def master(self) -> Optional[Primitive]:
@@ -188,14 +315,12 @@ class PrimitiveGroup(Renderable):
             self._update_min_arity(primitive.master.arity)
             self._update_max_arity(primitive.master.arity)
 
-    def remove(self, *primitives: PrimitiveGroup.Parameter):
-        for primitive in primitives:
-            self.primitives.remove(primitive)
-
+    def _recalculate(self):
         self._master: Optional[Primitive] = None
         self._min_arity = None
         self._max_arity = None
         self._arity = 0
+        self._order = None
 
         for primitive in self.primitives:
             if self._arity == 0:
@@ -205,6 +330,116 @@ class PrimitiveGroup(Renderable):
             self._update_max_arity(primitive.master.arity)
             self._arity += 1
 
+    def _attach(self, parameter: PrimitiveGroup.Parameter):
+        parameter.parent_group = self
+        if self._spatial_index is not None:
+            self._spatial_index.insert(parameter)
+
+        if isinstance(parameter, PrimitiveGroup):
+            parameter._registry = None
+        root = self.root()
+        if root._registry is not None:
+            root._register(parameter, self.level() + 1)
+        self._count_signatures(parameter.signatures(), 1)
+
+    def _detach(self, parameter: PrimitiveGroup.Parameter):
+        if parameter.parent_group is self:
+            parameter.parent_group = None
+        if self._spatial_index is not None:
+            self._spatial_index.remove(parameter)
+
+        root = self.root()
+        if root._registry is not None:
+            root._unregister(parameter)
+        self._count_signatures(parameter.signatures(), -1)
+
+    def _count_signatures(self, signatures: Dict[Tuple[str, int], int], sign: int):
+        group = self
+        while group is not None:
+            for signature, count in signatures.items():
+                total = group._signatures.get(signature, 0) + sign * count
+                if total == 0:
+                    del group._signatures[signature]
+                else:
+                    group._signatures[signature] = total
+            group = group.parent_group
+
+    def _register(self, node: PrimitiveGroup.Parameter, depth: int):
+        # Depth first and first come first served, like the recursive walk the lookups replace
+        stack = [(node, depth)]
+        while len(stack) > 0:
+            node, depth = stack.pop()
+            self._registry.setdefault(node.identifier, (node, depth))
+            if isinstance(node, PrimitiveGroup):
+                stack.extend((child, depth + 1) for child in reversed(node.primitives))
+
+    def _unregister(self, node: PrimitiveGroup.Parameter):
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            entry = self._registry.get(node.identifier)
+            if entry is not None and entry[0] is node:
+                del self._registry[node.identifier]
+            if isinstance(node, PrimitiveGroup):
+                stack.extend(node.primitives)
+
+    def registry(self) -> Dict[ReferenceFactory.Reference, Tuple[PrimitiveGroup.Parameter, int]]:
+        root = self.root()
+        if root._registry is None:
+            root._registry = dict()
+            root._register(root, 0)
+
+        return root._registry
+
+    def root(self) -> PrimitiveGroup:
+        group = self
+        while group.parent_group is not None:
+            group = group.parent_group
+
+        return group
+
+    def level(self) -> int:
+        # Depth of this group below its root
+        level = 0
+        group = self.parent_group
+        while group is not None:
+            level += 1
+            group = group.parent_group
+
+        return level
+
+    def signatures(self) -> Dict[Tuple[str, int], int]:
+        return self._signatures
+
+    def _lookup(self, item: ReferenceFactory.Reference) -> Optional[Tuple[PrimitiveGroup.Parameter, int]]:
+        if item == self.identifier:
+            return self, 0
+
+        entry = self.registry().get(item)
+        if entry is None:
+            return None
+
+        node, depth = entry
+        if self.parent_group is None:
+            return entry
+
+        # Only nodes below this group count when it is not the root
+        ancestor = node.parent_group
+        while ancestor is not None and ancestor is not self:
+            ancestor = ancestor.parent_group
+        if ancestor is None:
+            return None
+
+        return node, depth - self.level()
+
+    def remove(self, *primitives: PrimitiveGroup.Parameter):
+        for primitive in primitives:
+            self.primitives.remove(primitive)
+            self._detach(primitive)
+
+        self._recalculate()
+        self.changed()
+
     def append(self, parameter: PrimitiveGroup.Parameter):
         if self.arity == 0:
             self._master = parameter.master
@@ -212,51 +447,110 @@ class PrimitiveGroup(Renderable):
         self._update_min_arity(parameter.master.arity)
         self._update_max_arity(parameter.master.arity)
 
+        if self._order is not None:
+            self._order[id(parameter)] = len(self.primitives)
         self.primitives.append(parameter)
         self._arity += 1
 
-    def find(self, item: ReferenceFactory.Reference) -> Optional[PrimitiveGroup.Parameter]:
-        if item == self.identifier:
-            return self
+        self._attach(parameter)
+        self.changed()
 
-        for primitive in self.primitives:
-            if primitive.identifier == item:
-                return primitive
+    def insert(self, index: int, parameter: PrimitiveGroup.Parameter):
+        self.primitives.insert(index, parameter)
+        self._attach(parameter)
 
-            if isinstance(primitive, PrimitiveGroup):
-                result = primitive.find(item)
+        self._recalculate()
+        self.changed()
 
-                if result is not None:
-                    return result
+    def pop(self, index: int = -1) -> PrimitiveGroup.Parameter:
+        parameter = self.primitives.pop(index)
+        self._detach(parameter)
 
-        return None
+        self._recalculate()
+        self.changed()
 
-    def depth(self, item: ReferenceFactory.Reference) -> Optional[int]:
-        if item == self.identifier:
-            return 0
+        return parameter
 
-        for primitive in self.primitives:
-            if primitive.identifier == item:
-                return 1
+    def splice(self, start: int, end: int, parameters: PrimitiveGroup.Parameters):
+        # Replaces the children in [start, end) at a cost proportional to the children that come and go
+        removed = self.primitives[start:end]
+        self.primitives[start:end] = parameters
+        for parameter in removed:
+            self._detach(parameter)
+        for parameter in parameters:
+            self._attach(parameter)
 
-            if isinstance(primitive, PrimitiveGroup):
-                result = primitive.depth(item)
+        self._arity = len(self.primitives)
+        self._master = self.primitives[0].master if self._arity > 0 else None
+        if self._order is not None and start == end == self._arity - len(parameters):
+            for index, parameter in enumerate(parameters):
+                self._order[id(parameter)] = start + index
+        else:
+            self._order = None
 
-                if result is not None:
-                    return result + 1
+        # Removing children only moves the arity bounds when they were not all equal
+        if self._arity == 0 or (self._min_arity != self._max_arity and any(parameter.master.arity in (self._min_arity, self._max_arity) for parameter in removed)):
+            self._recalculate_arity()
+        for parameter in parameters:
+            self._update_min_arity(parameter.master.arity)
+            self._update_max_arity(parameter.master.arity)
 
-        return None
+        self.changed()
 
-    def parent(self, item: ReferenceFactory.Reference) -> Optional[PrimitiveGroup.Parameter]:
-        for primitive in self.primitives:
-            if primitive.identifier == item:
-                return self
+    def child_changed(self, child: PrimitiveGroup.Parameter):
+        if self._spatial_index is not None:
+            self._spatial_index.update(child)
+
+        # A dirty group has computed nothing from its children since its last change, and neither have its ancestors
+        # through it, so the change only goes up while the groups are clean
+        if not self._dirty:
+            self.changed()
+
+    def handles(self) -> List[Point]:
+        # Groups have no handles of their own, reading them reads none of the children and leaves the group dirty
+        return self._calculate_handles()
 
-            if isinstance(primitive, PrimitiveGroup):
-                result = primitive.find(item)
+    def spatial_index(self) -> SpatialIndex:
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex()
+            for primitive in self.primitives:
+                self._spatial_index.insert(primitive)
 
-                if result is not None:
-                    return result
+        return self._spatial_index
+
+    def order(self, child: PrimitiveGroup.Parameter) -> int:
+        if self._order is None:
+            self._order = { id(primitive): index for index, primitive in enumerate(self.primitives) }
+
+        return self._order[id(child)]
+
+    def intersect(self, point: Point) -> Optional[int]:
+        # Index of the topmost child containing the point
+        hits = [self.order(child) for child in self.spatial_index().query_point(point)]
+        if len(hits) == 0:
+            return None
+
+        return max(hits)
+
+    def query(self, bounds: Bounds) -> PrimitiveGroup.Parameters:
+        return sorted(self.spatial_index().query_rect(bounds), key=self.order)
+
+    def find(self, item: ReferenceFactory.Reference) -> Optional[PrimitiveGroup.Parameter]:
+        entry = self._lookup(item)
+
+        return entry[0] if entry is not None else None
+
+    def depth(self, item: ReferenceFactory.Reference) -> Optional[int]:
+        entry = self._lookup(item)
+
+        return entry[1] if entry is not None else None
+
+    def parent(self, item: ReferenceFactory.Reference) -> Optional[PrimitiveGroup.Parameter]:
+        entry = self._lookup(item)
+        if entry is None or entry[0] is self:
+            return None
+
+        return entry[0].parent_group
 
     def copy(self, reference_factory: ReferenceFactory) -> PrimitiveGroup.Parameter:
         primitives = [primitive.copy(reference_factory) for primitive in self.primitives]
@@ -267,14 +561,14 @@ class PrimitiveGroup(Renderable):
         for primitive in self.primitives:
             primitive.move(position)
 
-    def position(self) -> Point:
+    def _calculate_position(self) -> Point:
         position = Point(0, 0)
         for primitive in self.primitives:
             position += primitive.position()
 
         return position / self.arity
 
-    def bounds(self) -> Bounds:
+    def _calculate_bounds(self) -> Bounds:
         bounds = None
         for primitive in self.primitives:
             if bounds is None:
@@ -289,9 +583,13 @@ class PrimitiveGroup(Renderable):
     def tikz(self):
         return "\n".join([primitive.tikz() for primitive in self.primitives])
 
+    def svg(self):
+        return "\n".join([primitive.svg() for primitive in self.primitives])
+
 class Rect(Primitive):
     width = 50
     height = 50
+    color_index = 4
 
     def __init__(self, identifier: ReferenceFactory.Reference, arity: int, *parameters: Primitive.Parameter):
         super(Rect, self).__init__(identifier, Rect.static_name(), arity, *parameters)
@@ -321,7 +619,7 @@ class Rect(Primitive):
         self[0] += delta.x
         self[1] += delta.y
 
-    def position(self) -> Point:
+    def _calculate_position(self) -> Point:
         # width, height = self.get_size()
         #
         # x = self[0] + width / 2
@@ -330,14 +628,14 @@ class Rect(Primitive):
 
         return Point(self[0], self[1])
 
-    def bounds(self) -> Bounds:
+    def _calculate_bounds(self) -> Bounds:
         width, height = self.get_size()
 
         # return Bounds(Point(self[0], self[1]), Point(self[0] + width, self[1] + height))
 
         return Bounds(Point(self[0] - width / 2.0, self[1] - height / 2.0), Point(self[0] + width / 2.0, self[1] + height / 2.0))
 
-    def handles(self) -> List[Point]:
+    def _calculate_handles(self) -> List[Point]:
         width, height = self.get_size()
 
         # return [Point(self[0] + width, self[1] + height)]
@@ -370,27 +668,26 @@ class Rect(Primitive):
                                   color)
 
     def tikz(self) -> str:
-        if self.arity == 5:
-            r, g, b, a = parse_color_rgba(self[4], 1.0)
-        else:
-            r, g, b, a = default.r, default.g, default.b, default.a
-
-        def f(c):
-            return min(max(0, int(c * 255.0)), 255)
-
         bounds = self.bounds()
-        return "\\draw [fill={{rgb, 255: red, {}; green, {}; blue, {}}}, draw opacity={}] ({}, {}) rectangle ({}, {});".format(
-            f(r),
-            f(g),
-            f(b),
-            a,
+        return "\\draw [{}] ({}, {}) rectangle ({}, {});".format(
+            self.tikz_color("fill"),
             bounds.min_x(),
             bounds.min_y(),
             bounds.max_x(),
-            bounds.max_y()
-        )
+            bounds.max_y())
+
+    def svg(self) -> str:
+        bounds = self.bounds()
+        return "<rect x=\"{}\" y=\"{}\" width=\"{}\" height=\"{}\" {}/>".format(
+            bounds.min_x(),
+            bounds.min_y(),
+            bounds.width(),
+            bounds.height(),
+            self.svg_color("fill"))
 
 class Line(Primitive):
+    color_index = 4
+    coordinate_count = 4
 
     def __init__(self, identifier: ReferenceFactory.Reference, arity: int, *parameters: Primitive.Parameter):
         super(Line, self).__init__(identifier, Line.static_name(), arity, *parameters)
@@ -409,20 +706,23 @@ class Line(Primitive):
         self[2] += delta.x
         self[3] += delta.y
 
-    def position(self) -> Point:
+    def _calculate_position(self) -> Point:
         min_x, max_x = minmax(self[0], self[2])
         min_y, max_y = minmax(self[1], self[3])
         dx, dy = max_x - min_x, max_y - min_y
 
         return Point(min_x + dx / 2.0, min_y + dy / 2.0)
 
-    def bounds(self) -> Bounds:
+    def _calculate_bounds(self) -> Bounds:
         min_x, max_x = minmax(self[0], self[2])
         min_y, max_y = minmax(self[1], self[3])
         return Bounds(Point(min_x, min_y), Point(max_x, max_y))
 
-    def handles(self) -> List[Point]:
-        return [Point(self[0], self[1]), Point(self[2], self[3])]
+    def endpoints(self) -> Tuple[Point, Point]:
+        return Point(self[0], self[1]), Point(self[2], self[3])
+
+    def _calculate_handles(self) -> List[Point]:
+        return list(self.endpoints())
 
     def handle(self, index: int, position: Point):
         if index == 0:
@@ -445,30 +745,19 @@ class Line(Primitive):
                            color)
 
     def tikz(self):
-        if self.arity == 5:
-            r, g, b, a = parse_color_rgba(self[4], 1.0)
-        else:
-            r, g, b, a = default.r, default.g, default.b, default.a
+        start, end = self.endpoints()
+        return "\\draw [{}] ({}, {}) -- ({}, {});".format(self.tikz_color("color"), start.x, start.y, end.x, end.y)
 
-        def f(c):
-            return min(max(0, int(c * 255.0)), 255)
-
-        bounds = self.bounds()
-        return "\\draw [color={{rgb, 255: red, {}; green, {}; blue, {}}}, draw opacity={}] ({}, {}) -- ({}, {});".format(
-            f(r),
-            f(g),
-            f(b),
-            a,
-            bounds.min_x(),
-            bounds.min_y(),
-            bounds.max_x(),
-            bounds.max_y()
-        )
+    def svg(self):
+        start, end = self.endpoints()
+        return "<line x1=\"{}\" y1=\"{}\" x2=\"{}\" y2=\"{}\" {}/>".format(start.x, start.y, end.x, end.y, self.svg_color("stroke"))
 
 class Vector(Primitive):
+    color_index = 4
 
     def __init__(self, identifier: ReferenceFactory.Reference, arity: int, *parameters: Primitive.Parameter):
         super(Vector, self).__init__(identifier, Vector.static_name(), arity, *parameters)
+        self._endpoints: Optional[Tuple[Point, Point]] = None
 
     @staticmethod
     def static_name() -> str:
@@ -482,16 +771,27 @@ class Vector(Primitive):
         self[0] += delta.x
         self[1] += delta.y
 
-    def position(self) -> Point:
+    def _calculate_position(self) -> Point:
         return Point(self[0], self[1])
 
-    def bounds(self) -> Bounds:
-        return Bounds(
-            Point(self[0], self[1]),
-            Point(self[0] + self[3] * math.cos(math.radians(self[2])), self[1] + self[3] * math.sin(math.radians(self[2]))))
+    def invalidate(self):
+        super(Vector, self).invalidate()
+        self._endpoints = None
 
-    def handles(self) -> List[Point]:
-        return [Point(self[0], self[1]), Point(self[0] + self[3] * math.cos(math.radians(self[2])), self[1] + self[3] * math.sin(math.radians(self[2])))]
+    def endpoints(self) -> Tuple[Point, Point]:
+        if self._endpoints is None:
+            angle = math.radians(self[2])
+            self._endpoints = Point(self[0], self[1]), Point(self[0] + self[3] * math.cos(angle), self[1] + self[3] * math.sin(angle))
+            self._dirty = False
+
+        return self._endpoints
+
+    def _calculate_bounds(self) -> Bounds:
+        start, end = self.endpoints()
+        return Bounds(start.min(end), start.max(end))
+
+    def _calculate_handles(self) -> List[Point]:
+        return list(self.endpoints())
 
     def handle(self, index: int, position: Point):
         if index == 0:
@@ -510,34 +810,29 @@ class Vector(Primitive):
         else:
             color = imgui.get_color_u32_rgba(default.r * factor, default.g * factor, default.b * factor, default.a)
 
-        draw_list.add_line(self[0] * scale + offset.x,
-                           self[1] * -scale + offset.y,
-                           self[0] * scale + self[3] * math.cos(math.radians(self[2])) * scale + offset.x,
-                           self[1] * -scale + self[3] * math.sin(math.radians(self[2])) * -scale + offset.y,
+        start, end = self.endpoints()
+        draw_list.add_line(start.x * scale + offset.x,
+                           start.y * -scale + offset.y,
+                           end.x * scale + offset.x,
+                           end.y * -scale + offset.y,
                            color)
 
     def tikz(self):
-        if self.arity == 5:
-            r, g, b, a = parse_color_rgba(self[4], 1.0)
-        else:
-            r, g, b, a = default.r, default.g, default.b, default.a
+        start, end = self.endpoints()
+        return "\\draw [-{{Triangle[width=8,length=10]}}][{}] ({}, {}) -- ({}, {});".format(self.tikz_color("color"), start.x, start.y, end.x, end.y)
 
-        def f(c):
-            return min(max(0,int(c * 255.0)), 256)
-
-        return "\\draw [-{{Triangle[width=8,length=10]}}][color={{rgb, 255: red, {}; green, {}; blue, {}}}, draw opacity={}] ({}, {}) -- ({}, {});".format(
-            f(r),
-            f(g),
-            f(b),
-            a,
-            self.position().x,
-            self.position().y,
-            self[0] + self[3] * math.cos(math.radians(self[2])),
-            self[1] + self[3] * math.sin(math.radians(self[2]))
-        )
+    def svg(self):
+        start, end = self.endpoints()
+        return "<line x1=\"{}\" y1=\"{}\" x2=\"{}\" y2=\"{}\" {} marker-end=\"url(#arrow)\"/>".format(start.x, start.y, end.x, end.y, self.svg_color("stroke"))
 
 class Circle(Primitive):
     radius = 25
+    color_index = 3
+
+    # Tessellation keeps the on screen length of every segment around segment_length pixels
+    segment_length = 4.0
+    min_segments = 6
+    max_segments = 64
 
     def __init__(self, identifier: ReferenceFactory.Reference, arity: int, *parameters: Primitive.Parameter):
         super(Circle, self).__init__(identifier, Circle.static_name(), arity, *parameters)
@@ -554,21 +849,24 @@ class Circle(Primitive):
         self[0] += delta.x
         self[1] += delta.y
 
-    def position(self) -> Point:
+    def _calculate_position(self) -> Point:
         return Point(self[0], self[1])
 
-    def bounds(self) -> Bounds:
+    def get_radius(self) -> Primitive.Parameter:
         if self.arity < 3:
-            radius = 25
-        else:
-            radius = self[2]
+            return Circle.radius
+
+        return self[2]
+
+    def _calculate_bounds(self) -> Bounds:
+        radius = self.get_radius()
 
         min_x, min_y = self[0] - radius, self[1] - radius
         max_x, max_y = self[0] + radius, self[1] + radius
 
         return Bounds(Point(min_x, min_y), Point(max_x, max_y))
 
-    def handles(self) -> List[Point]:
+    def _calculate_handles(self) -> List[Point]:
         if self.arity < 3:
             return []
 
@@ -588,37 +886,22 @@ class Circle(Primitive):
         else:
             color = imgui.get_color_u32_rgba(default.r * factor, default.g * factor, default.b * factor, default.a)
 
-        if self.arity < 3:
-            radius = 25
-        else:
-            radius = self[2]
+        radius = self.get_radius()
 
         draw_list.add_circle_filled(self[0] * scale + offset.x,
                                     self[1] * -scale + offset.y,
                                     radius * scale,
                                     color,
-                                    30)
+                                    Circle.segments(radius * scale))
 
-    def tikz(self):
-        if self.arity == 4:
-            r, g, b, a = parse_color_rgba(self[3], 1.0)
-        else:
-            r, g, b, a = default.r, default.g, default.b, default.a
+    @staticmethod
+    def segments(screen_radius: float) -> int:
+        segments = math.ceil(2.0 * math.pi * abs(screen_radius) / Circle.segment_length)
 
-        def f(c):
-            return min(max(0,int(c * 255.0)), 255)
+        return int(clamp(segments, Circle.min_segments, Circle.max_segments))
 
-        if self.arity < 3:
-            radius = 25
-        else:
-            radius = self[2]
-
-        return "\\draw [fill={{rgb, 255: red, {}; green, {}; blue, {}}}, draw opacity={}] ({}, {}) circle ({});".format(
-            f(r),
-            f(g),
-            f(b),
-            a,
-            self.position().x,
-            self.position().y,
-            radius
-        )
\ No newline at end of file
+    def tikz(self):
+        return "\\draw [{}] ({}, {}) circle ({});".format(self.tikz_color("fill"), self[0], self[1], self.get_radius())
+
+    def svg(self):
+        return "<circle cx=\"{}\" cy=\"{}\" r=\"{}\" {}/>".format(self[0], self[1], self.get_radius(), self.svg_color("fill"))
@@ -1,6 +1,8 @@
 from gui.primitives import *
 from gui.graphics import BUTTON_LEFT, BUTTON_RIGHT, Point
 from gui.canvas import Canvas
+from gui.export import Exporter, SvgExporter, TikzExporter
+from gui.worker import SearchWorker
 from imgui.integrations.glfw import GlfwRenderer
 from datetime import datetime
 from os import listdir
@@ -9,9 +11,14 @@ import OpenGL.GL as gl
 import imgui
 import glfw
 
+from parsing.binary_scene import BinaryScene
+from parsing.compressor import Compressor
 from parsing.lexer import Lexer
 from parsing.pattern_parser import PatternParser
 from parsing.primitive_parser import PrimitiveParser
+from pattern.extrapolation import Extrapolation
+from pattern.statistics import PatternStatistics
+from pattern.virtual import VirtualPrimitiveGroup
 from pattern.pattern import *
 
 class Screen:
@@ -48,14 +55,32 @@ class Screen:
         self.round = 1
         self.tolerance = Tolerance(0, 0.1)
         self.found_patterns: Optional[InstancePattern] = None
-        self.available_patterns: List[ParameterPattern] = [ConstantPattern, LinearPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+        self.extrapolation = Extrapolation()
+        self.worker = SearchWorker()
+        # Which patterns usually win, so the search fits them first
+        self.statistics = PatternStatistics("./res/statistics.json")
+        self.worker.search.statistics = self.statistics
+        # Seconds a search may take before it settles for what it found, partial results are refined with twice the budget
+        # up to max_budget, and a search that is still partial with max_budget stays partial
+        self.search_budget = 0.5
+        self.max_budget = 8.0
+        self.budget: Optional[float] = None
+        self.partial = False
+        # Outputs larger than this are generated on demand, and the output text only shows a window of them
+        self.virtual_threshold = 100000
+        self.text_offset = 0
+        self.text_window = 1000
+        self.available_patterns: List[ParameterPattern] = [ConstantPattern, LinearPattern, PolynomialPattern, GeometricPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
         self.selected_patterns = [True for _ in self.available_patterns]
         self.render_order = 0
         self.render_identifiers = False
         self.extract_constants = False
+        self.compression: Optional[Compressor.Result] = None
         self.use_sizes = True
 
         self.camera_offset = Point(64 * 4.5, 64 * 2.65)
+        self.ocanvas_size = Point(0, 0)
+        self.export_viewport = False
         self.scale_index = 0
 
         self.itext_to_icanvas()
@@ -154,8 +179,12 @@ class Screen:
                 if len(self.filename_cache) == 0:
                     self.filename_cache = datetime.now().strftime("%m%d%Y_%H%%S")
                 path = self.default_path + self.filename_cache
-                file = open(path, "w")
-                file.write(self.itext)
+                if path.endswith(BinaryScene.extension):
+                    BinaryScene.write(path, self.icanvas.primitives, self.named_primitives)
+                else:
+                    file = open(path, "w")
+                    file.write(self.itext)
+                    file.close()
                 self.filename_cache = ""
 
                 self.show_file_saver = False
@@ -179,12 +208,17 @@ class Screen:
             imgui.pop_item_width()
             imgui.separator()
             if changed:
-                file = open(self.default_path + files[selected_file_index])
-                text = file.read()
-                file.close()
-
-                self.itext = text
-                self.itext_to_all()
+                path = self.default_path + files[selected_file_index]
+                if path.endswith(BinaryScene.extension):
+                    self.binary_to_icanvas(path)
+                    self.icanvas_to_all()
+                else:
+                    file = open(path)
+                    text = file.read()
+                    file.close()
+
+                    self.itext = text
+                    self.itext_to_all()
 
             if imgui.button("Choose example", -1):
                 self.text_cache = None
@@ -263,42 +297,71 @@ class Screen:
         util.imgui_property("Group", imgui.text, str(self.icanvas.selected_group))
         savings = "N/A" if len(self.opatterns) == 0 or len(self.otext) == 0 else round((1.0 - float(len(self.opatterns)) / float(len(self.otext))) * 100.0, 2)
         util.imgui_property("Space saving", imgui.text, str(savings))
-
+        constant_savings = "N/A" if self.compression is None else round(self.compression.saving * 100.0, 2)
+        util.imgui_property("Constant saving", imgui.text, str(constant_savings))
+        search_status = "Searching ({} groups)".format(self.worker.progress) if self.worker.busy else "Partial" if self.partial else "Done"
+        util.imgui_property("Search", imgui.text, search_status)
+        report = self.worker.search.report
+        util.imgui_property("Fits skipped", imgui.text, "{} of {}".format(report.skipped, report.fits + report.skipped))
+
+        # Extrapolation counts only regenerate the output, everything else also searches the input again
+        extrapolation_changed = False
         any_changed = False
         util.imgui_title("Extrapolations", True)
         if self.found_patterns is not None:
             for i in range(self.found_patterns.level):
-                changed, self.extrapolations[i] = util.imgui_property("Depth {}".format(i + 1), imgui.drag_int, "##Extrapolation{}".format(i + 1), self.extrapolations[i], 0.2, 1, 1000)
-                any_changed |= changed
+                changed, self.extrapolations[i] = util.imgui_property("Depth {}".format(i + 1), imgui.drag_int, "##Extrapolation{}".format(i + 1), self.extrapolations[i], 0.2, 1, 1000000)
+                extrapolation_changed |= changed
+            if isinstance(self.ocanvas.primitives, VirtualPrimitiveGroup):
+                changed, self.text_offset = util.imgui_property("Text offset", imgui.drag_int, "##text_offset", self.text_offset, 1.0, 0, max(0, len(self.ocanvas.primitives) - 1))
+                if changed:
+                    self.ocanvas_to_otext()
         else:
             util.imgui_property("N/A", imgui.text_unformatted, "N/A")
 
+        # The input is unchanged, so the search only accepts, ranks and rounds its cached fits again
+        search_changed = False
         util.imgui_title("Tolerance", True)
         changed, self.tolerance.absolute = util.imgui_property("Absolute", imgui.drag_float, "##absolute", self.tolerance.absolute, 0.1, 0, 20.0)
-        any_changed |= changed
+        search_changed |= changed
         changed, self.tolerance.relative = util.imgui_property("Relative", imgui.drag_float, "##relative", self.tolerance.relative, 0.01, 0, 1.0)
-        any_changed |= changed
+        search_changed |= changed
 
         util.imgui_title("Misc", True)
         changed, self.round = util.imgui_property("Rounding", imgui.drag_int, "##Round", self.round, 0.1, 0, 10)
-        any_changed |= changed
+        search_changed |= changed
         changed, self.extract_constants = util.imgui_property("Extract constants", imgui.checkbox, "##constants", self.extract_constants)
         any_changed |= changed
         changed, self.use_sizes = util.imgui_property("Use sizes", imgui.checkbox, "##sizes", self.use_sizes)
         any_changed |= changed
+        changed, self.search_budget = util.imgui_property("Search budget", imgui.drag_float, "##budget", self.search_budget, 0.01, 0, 10.0)
+        any_changed |= changed
 
         util.imgui_title("Patterns", True)
         for index, pattern in enumerate(self.available_patterns):
             changed, self.selected_patterns[index] = util.imgui_property(str(pattern), imgui.checkbox, "##{}".format(str(pattern)), self.selected_patterns[index])
-            any_changed |= changed
+            search_changed |= changed
+
+        util.imgui_title("Export", True)
+        _, self.export_viewport = util.imgui_property("Viewport only", imgui.checkbox, "##export_viewport", self.export_viewport)
 
         util.imgui_properties_end()
 
+        if imgui.button("Tune tolerance"):
+            self.icanvas_to_found_patterns(_tune=True)
+        imgui.same_line()
         if imgui.button("Tikz"):
-            self.tikz()
+            self.export(TikzExporter())
+        imgui.same_line()
+        if imgui.button("SVG"):
+            self.export(SvgExporter())
 
         if any_changed:
             self.icanvas_to_all()
+        elif search_changed:
+            self.icanvas_to_found_patterns()
+        elif extrapolation_changed:
+            self.found_patterns_to_ocanvas()
 
         for entry in self.console:
             imgui.text_colored('{} (x{})'.format(entry[0], entry[1]), *entry[2])
@@ -350,7 +413,8 @@ class Screen:
 
     def render_otext(self):
         imgui.push_font(self.consolas)
-        changed, value = imgui.input_text_multiline("##otext", self.otext, len(self.otext) + 1000, -1, -1)
+        flags = imgui.INPUT_TEXT_READ_ONLY if isinstance(self.ocanvas.primitives, VirtualPrimitiveGroup) else 0
+        changed, value = imgui.input_text_multiline("##otext", self.otext, len(self.otext) + 1000, -1, -1, flags)
         if changed:
             self.otext = value
             self.otext_to_ocanvas()
@@ -379,6 +443,7 @@ class Screen:
         position_min = Point(*imgui.get_cursor_screen_pos())
         size = imgui.get_content_region_available()
         position_max = Point(position_min.x + size.x, position_min.y + size.y)
+        self.ocanvas_size = Point(size.x, size.y)
 
         self.ocanvas.render_canvas(draw_list, position_min, position_max)
         self.ocanvas.render_grid(draw_list, self.camera_offset, position_min, position_max)
@@ -387,7 +452,7 @@ class Screen:
         _mouse_position_in_canvas = Point(io.mouse_pos.x - origin.x, io.mouse_pos.y - origin.y)
 
         try:
-            self.ocanvas.render(draw_list, origin, render_order=0)
+            self.ocanvas.render(draw_list, origin, render_order=0, viewport=self.ocanvas.viewport(self.camera_offset, self.ocanvas_size))
             # self.icanvas.render(draw_list, origin, render_order=self.render_order)
         except Exception as error:
             self.handle_error(error)
@@ -490,7 +555,7 @@ class Screen:
         self.icanvas.render_grid(draw_list, self.camera_offset, position_min, position_max)
 
         # Render atoms
-        self.icanvas.render(draw_list, origin, render_order=self.render_order, render_identifiers=self.render_identifiers)
+        self.icanvas.render(draw_list, origin, render_order=self.render_order, render_identifiers=self.render_identifiers, viewport=self.icanvas.viewport(self.camera_offset, Point(size.x, size.y)))
 
         # Render cursor
         if hovered:
@@ -512,6 +577,7 @@ class Screen:
     def update(self):
         glfw.poll_events()
         self.impl.process_inputs()
+        self.worker_to_found_patterns()
 
         if imgui.is_key_pressed(glfw.KEY_ESCAPE):
             glfw.set_window_should_close(self.window, True)
@@ -545,17 +611,22 @@ class Screen:
         if imgui.get_io().mouse_wheel != 0 and imgui.get_io().want_capture_mouse:
             if imgui.get_io().key_ctrl:
                 self.scale_index += 0.1 * imgui.get_io().mouse_wheel
-                new_scale = self.scale_index + 1 if self.scale_index > 0 else math.exp(self.scale_index)
-                self.icanvas.scale = new_scale
-                self.ocanvas.scale = new_scale
+                self.set_scale(self.scale_index + 1 if self.scale_index > 0 else math.exp(self.scale_index))
             else:
                 depth = self.icanvas.primitives.depth(self.icanvas.selected_group)
                 if depth is not None and len(self.extrapolations) > depth:
-                    self.extrapolations[depth] = int(max(0, self.extrapolations[depth] + imgui.get_io().mouse_wheel))
+                    extrapolation = int(max(0, self.extrapolations[depth] + imgui.get_io().mouse_wheel))
+                    if extrapolation != self.extrapolations[depth]:
+                        self.extrapolations[depth] = extrapolation
+                        self.found_patterns_to_ocanvas()
 
-            self.found_patterns_to_ocanvas()
+    def set_scale(self, scale: float):
+        # View state is read by the canvases every frame, so changing it never regenerates the output
+        self.icanvas.scale = scale
+        self.ocanvas.scale = scale
 
     def close(self):
+        self.statistics.save()
         self.impl.shutdown()
         glfw.terminate()
 
@@ -568,6 +639,16 @@ class Screen:
         except Exception as error:
             self.handle_error(error)
 
+    def binary_to_icanvas(self, path: str):
+        self.icanvas.reset()
+        try:
+            scene = BinaryScene(path)
+            self.icanvas.primitives = scene.group(self.icanvas.reference_factory)
+            self.named_primitives_text = BinaryScene.declarations(scene.named_primitives())
+            self.icanvas.selected_group = self.icanvas.primitives.identifier
+        except Exception as error:
+            self.handle_error(error)
+
     def otext_to_ocanvas(self):
         self.ocanvas.reset()
         parser = PrimitiveParser(self.otext)
@@ -579,21 +660,43 @@ class Screen:
 
 
     def icanvas_to_itext(self):
-        self.itext = "\n".join([primitive.dsl() for primitive in self.icanvas.primitives])
+        self.itext = self.icanvas.primitives.children_dsl()
 
     def ocanvas_to_otext(self):
-        self.otext = "\n".join([primitive.dsl() for primitive in self.ocanvas.primitives])
+        if isinstance(self.ocanvas.primitives, VirtualPrimitiveGroup):
+            self.otext = self.ocanvas.primitives.window_dsl(self.text_offset, self.text_offset + self.text_window)
+        else:
+            self.otext = self.ocanvas.primitives.children_dsl()
+
+    def icanvas_to_found_patterns(self, _budget: Optional[float] = None, _tune: bool = False):
+        # The worker searches a snapshot of the input, the last completed result stays on screen until it is done. Only
+        # refinements pass a budget, every other search starts over from search_budget. Tuning runs without a budget and
+        # replaces the tolerance with the one it selects.
+        self.budget = None if _tune else _budget if _budget is not None else self.search_budget if self.search_budget > 0 else None
+        request = SearchWorker.Request(self.worker.snapshot.copy(self.icanvas.primitives), self.named_primitives, [p for i, p in enumerate(self.available_patterns) if self.selected_patterns[i]], self.tolerance, _round=None if self.round == 0 else self.round, _size_pattern=self.use_sizes, _extract_constants=self.extract_constants, _budget=self.budget, _tune=_tune)
+        self.worker.submit(request)
+
+    def worker_to_found_patterns(self):
+        result = self.worker.poll()
+        if result is None:
+            return
+
+        if result.error is not None:
+            self.handle_error(result.error)
+            return
 
-    def icanvas_to_found_patterns(self):
-        self.found_patterns = Pattern.search_group_recursive(self.icanvas.primitives, self.named_primitives, [p for i, p in enumerate(self.available_patterns) if self.selected_patterns[i]], self.tolerance, ReferenceFactory(), _round=None if self.round == 0 else self.round, _size_pattern=self.use_sizes)
+        self.found_patterns = result.found_patterns
+        self.opatterns = result.opatterns
+        self.compression = result.compression
+        self.partial = result.partial
+        if result.tolerance is not None:
+            self.tolerance = result.tolerance
         if self.found_patterns is not None and len(self.extrapolations) < self.found_patterns.level:
             self.extrapolations.extend([1] * (self.found_patterns.level - len(self.extrapolations)))
 
-    def found_patterns_to_opatterns(self):
-        if self.found_patterns is not None:
-            self.opatterns = self.found_patterns.dsl()
-        else:
-            self.opatterns = ""
+        self.found_patterns_to_ocanvas()
+        if self.partial and self.budget is not None and self.budget < self.max_budget:
+            self.icanvas_to_found_patterns(_budget=min(self.budget * 2, self.max_budget))
 
     def opatterns_to_found_patterns(self):
         parser = PatternParser(self.opatterns)
@@ -604,27 +707,41 @@ class Screen:
             self.handle_error(error)
 
     def found_patterns_to_ocanvas(self):
-        self.ocanvas.reset()
-
         if self.found_patterns is None:
+            self.ocanvas.reset()
+            self.ocanvas_to_otext()
             self.handle_error("No patterns found")
             return
 
         master = self.icanvas.primitives.master
         if master is None:
+            self.ocanvas.reset()
+            self.ocanvas_to_otext()
             self.handle_error("No master in icanvas")
             return
 
         try:
-            primitives = Pattern.next([master], self.found_patterns, self.named_primitives, self.extrapolations[:self.found_patterns.level], self.ocanvas.reference_factory)
-
-            for primitive in primitives:
-                if primitive is not None:
-                    self.ocanvas.primitives.append(primitive)
+            extrapolations = self.extrapolations[:self.found_patterns.level]
+            # The virtual output keeps its generated chunks until the patterns or extrapolations change
+            if isinstance(self.ocanvas.primitives, VirtualPrimitiveGroup) and self.ocanvas.primitives.generates(master, self.found_patterns, self.named_primitives, extrapolations):
+                return
+
+            virtual = VirtualPrimitiveGroup(-1, master, self.found_patterns, self.named_primitives, extrapolations, self.ocanvas.reference_factory)
+            if len(virtual) > self.virtual_threshold:
+                self.extrapolation.reset()
+                self.ocanvas.reset()
+                self.ocanvas.primitives = virtual
+                self.ocanvas_to_otext()
+                return
+
+            if isinstance(self.ocanvas.primitives, VirtualPrimitiveGroup):
+                self.ocanvas.reset()
+            self.extrapolation.apply(self.ocanvas.primitives, master, self.found_patterns, self.named_primitives, extrapolations, self.ocanvas.reference_factory)
+            self.otext = self.extrapolation.text()
         except Exception as error:
+            self.extrapolation.reset()
             self.handle_error(error)
-
-        self.ocanvas_to_otext()
+            self.ocanvas_to_otext()
 
     def parse_named_primitives(self):
         parser = PrimitiveParser(self.named_primitives_text)
@@ -634,18 +751,7 @@ class Screen:
             self.handle_error(error)
 
     def expand_named_primitives(self):
-        def get_unique_primitives(group: PrimitiveGroup) -> Set[Tuple[str, int]]:
-            unique_primitives = set()
-            for primitive in group:
-                if isinstance(primitive, Primitive):
-                    unique_primitives.add((primitive.name, primitive.arity))
-                elif isinstance(primitive, PrimitiveGroup):
-                    unique_primitives = unique_primitives | get_unique_primitives(primitive)
-
-            return unique_primitives
-
-        unique_primitives = get_unique_primitives(self.icanvas.primitives)
-        for unique_primitive in unique_primitives:
+        for unique_primitive in self.icanvas.primitives.signatures():
             if unique_primitive not in self.named_primitives:
                 self.named_primitives[unique_primitive] = list(range(unique_primitive[1]))
 
@@ -654,26 +760,18 @@ class Screen:
         self.parse_named_primitives()
         self.expand_named_primitives()
         self.icanvas_to_found_patterns()
-        self.found_patterns_to_opatterns()
-        self.opatterns_extract_constants()
-        self.found_patterns_to_ocanvas()
 
     def itext_to_all(self):
         self.itext_to_icanvas()
         self.icanvas_to_found_patterns()
-        self.found_patterns_to_opatterns()
-        self.opatterns_extract_constants()
-        self.found_patterns_to_ocanvas()
 
     def opatterns_to_all(self):
+        # Edited patterns win over a search that is still running
+        self.worker.cancel()
+        self.partial = False
         self.opatterns_to_found_patterns()
         self.found_patterns_to_ocanvas()
 
-    def opatterns_extract_constants(self):
-        if self.extract_constants:
-            constants, counter = Lexer.extract_constants(self.opatterns)
-            self.opatterns = self.replace_constants(self.opatterns, constants, counter)
-
     def handle_error(self, error):
         error_str = str(error)
         if len(self.console) == 0 or self.console[-1][0] != error_str:
@@ -681,31 +779,11 @@ class Screen:
         else:
             self.console[-1][1] += 1
 
-    def replace_constants(self, string: str, constants: List[Lexer.Token], counter: Dict[str, int]) -> str:
-        new_vars: Dict[str, str] = dict()
-
-        for token in reversed(constants):
-            value = string[token.start : token.start + token.length]
-            if counter[value] < 2:
-                continue
-
-            if value not in new_vars.keys():
-                new_vars[value] = "v{}".format(len(new_vars))
-
-            string = string[:token.start] + new_vars[value] + string[token.start + token.length:]
-
-        new_var_code = ""
-        for value, variable in new_vars.items():
-            new_var_code += "${} = {}\n".format(variable, value)
-
-        return new_var_code + string
-
-    def tikz(self):
-        from tkinter import Tk
-        r = Tk()
-        r.withdraw()
-        r.clipboard_clear()
-        result = "\\resizebox{1.0\\textwidth}{!}{\n\t\\begin{tikzpicture}\n\t\t" + "\n\t\t".join([primitive.tikz() for primitive in self.ocanvas.primitives]) + "\n\t\\end{tikzpicture}\n}"
-        r.clipboard_append(result)
-        r.update()  # now it stays on the clipboard after the window is closed
-        r.destroy()
+    def export(self, exporter: Exporter):
+        viewport = self.ocanvas.viewport(self.camera_offset, self.ocanvas_size) if self.export_viewport else None
+        path = self.default_path + datetime.now().strftime("%m%d%Y_%H%M%S") + exporter.extension
+        try:
+            count = exporter.write(path, self.ocanvas.primitives, viewport)
+            self.console.append(["Exported {} primitives to {}".format(count, path), 1, (1.0, 1.0, 1.0, 1.0)])
+        except Exception as error:
+            self.handle_error(error)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from typing import *
+import math
+
+from gui.graphics import Bounds, Point
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the bounds of a set of items, answering point and rectangle queries by visiting only the cells
+    they overlap. Items spanning more than max_cells cells are kept in a separate list that every query checks.
+    Updates are lazy: invalidated items are re-inserted on the next query.
+    """
+    Cell = Tuple[int, int]
+
+    cell_size = 64
+    max_cells = 64
+
+    def __init__(self, cell_size: float = cell_size):
+        self.cell_size = cell_size
+        self.cells: Dict[SpatialIndex.Cell, Set[int]] = dict()
+        self.large: Set[int] = set()
+        self.items: Dict[int, Any] = dict()
+        self.bounds: Dict[int, Bounds] = dict()
+        self.stale: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: Any) -> bool:
+        return id(item) in self.items
+
+    def cell(self, point: Point) -> SpatialIndex.Cell:
+        return math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size)
+
+    def cell_range(self, bounds: Bounds) -> Tuple[SpatialIndex.Cell, SpatialIndex.Cell]:
+        return self.cell(bounds.min), self.cell(bounds.max)
+
+    @staticmethod
+    def cell_count(cell_range: Tuple[SpatialIndex.Cell, SpatialIndex.Cell]) -> int:
+        (min_x, min_y), (max_x, max_y) = cell_range
+
+        return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+    def insert(self, item: Any):
+        key = id(item)
+        if key in self.items:
+            self.remove(item)
+
+        self.items[key] = item
+        bounds = item.bounds()
+        if bounds is None:
+            return
+
+        self.bounds[key] = bounds
+        cell_range = self.cell_range(bounds)
+        if SpatialIndex.cell_count(cell_range) > self.max_cells:
+            self.large.add(key)
+            return
+
+        (min_x, min_y), (max_x, max_y) = cell_range
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self.cells.setdefault((x, y), set()).add(key)
+
+    def remove(self, item: Any):
+        key = id(item)
+        if key not in self.items:
+            return
+
+        del self.items[key]
+        self.stale.discard(key)
+        bounds = self.bounds.pop(key, None)
+        if bounds is None:
+            return
+
+        if key in self.large:
+            self.large.remove(key)
+            return
+
+        (min_x, min_y), (max_x, max_y) = self.cell_range(bounds)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                cell = self.cells.get((x, y))
+                if cell is not None:
+                    cell.discard(key)
+                    if len(cell) == 0:
+                        del self.cells[(x, y)]
+
+    def update(self, item: Any):
+        if id(item) in self.items:
+            self.stale.add(id(item))
+
+    def refresh(self):
+        for key in list(self.stale):
+            self.insert(self.items[key])
+        self.stale.clear()
+
+    def query_point(self, point: Point) -> List[Any]:
+        self.refresh()
+
+        keys = set(self.large)
+        keys.update(self.cells.get(self.cell(point), ()))
+
+        return [self.items[key] for key in keys if point in self.bounds[key]]
+
+    def query_rect(self, bounds: Bounds) -> List[Any]:
+        self.refresh()
+
+        cell_range = self.cell_range(bounds)
+        if SpatialIndex.cell_count(cell_range) > len(self.bounds):
+            keys = set(self.bounds.keys())
+        else:
+            keys = set(self.large)
+            (min_x, min_y), (max_x, max_y) = cell_range
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    keys.update(self.cells.get((x, y), ()))
+
+        return [self.items[key] for key in keys if bounds.intersects(self.bounds[key])]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+from typing import *
+import threading
+
+from gui.primitives import PrimitiveGroup, Primitive
+from misc.util import Cancelled, CancellationToken, ReferenceFactory, Tolerance
+from parsing.compressor import Compressor
+from pattern.incremental import IncrementalSearch
+from pattern.pattern import InstancePattern, ParameterPattern, PrimitivePattern
+from pattern.tuning import ToleranceTuner
+
+
+class Snapshot:
+    """
+    Copies of a primitive tree that the search can read while the original is being edited.
+
+    Groups whose version did not change since the previous snapshot are shared with it, so the incremental search
+    recognizes them. Only edited groups and their ancestors are copied again.
+    """
+
+    class Group(PrimitiveGroup):
+        # The search may still be reading children shared with the previous snapshot, so attaching them leaves their
+        # parent and registry alone. Groups are copied bottom up, so counting signatures in this group is enough.
+        def _attach(self, parameter: PrimitiveGroup.Parameter):
+            self._count_signatures(parameter.signatures(), 1)
+
+    def __init__(self):
+        self.reference_factory: ReferenceFactory = ReferenceFactory()
+        self.groups: Dict[int, Tuple[PrimitiveGroup, int, PrimitiveGroup]] = dict()
+
+    def copy(self, root: PrimitiveGroup) -> PrimitiveGroup:
+        groups: Dict[int, Tuple[PrimitiveGroup, int, PrimitiveGroup]] = dict()
+
+        def copy_group(group: PrimitiveGroup) -> PrimitiveGroup:
+            entry = self.groups.get(id(group))
+            if entry is not None and entry[0] is group and entry[1] == group.version:
+                shared = entry[2]
+                stack = [(group, shared)]
+                while len(stack) > 0:
+                    original, copy = stack.pop()
+                    groups[id(original)] = (original, original.version, copy)
+                    stack.extend((child, self.groups[id(child)][2]) for child in original if id(child) in self.groups and self.groups[id(child)][0] is child)
+                return shared
+
+            children = [copy_group(child) if isinstance(child, PrimitiveGroup) else child.copy(self.reference_factory) for child in group]
+            copy = Snapshot.Group(self.reference_factory.new(), *children)
+            groups[id(group)] = (group, group.version, copy)
+
+            return copy
+
+        snapshot = copy_group(root)
+        self.groups = groups
+        # Versions only move on once the geometry has been read since the last edit
+        root.bounds()
+
+        return snapshot
+
+
+class SearchWorker:
+    """
+    Runs the search, DSL and constant extraction steps of the pipeline on a background thread.
+
+    Only the latest request matters: submitting a request cancels the search in progress and replaces a request that
+    did not start yet, and results of superseded requests are dropped. A request with a budget returns a partial result
+    once it runs out, which a request for the same input refines. A tuning request searches a grid of tolerances
+    instead, and returns the patterns and tolerance ToleranceTuner selects. Because of the interpreter lock, the worker
+    keeps the interface responsive but does not make a single search faster.
+    """
+
+    class Request:
+        def __init__(self, root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int] = None, _size_pattern: bool = True, _extract_constants: bool = False, _budget: Optional[float] = None, _tune: bool = False):
+            self.root = root
+            self.named_primitives = dict(named_primitives)
+            self.available_patterns = list(available_patterns)
+            self.tolerance = Tolerance(tolerance.absolute, tolerance.relative)
+            self.round = _round
+            self.size_pattern = _size_pattern
+            self.extract_constants = _extract_constants
+            self.budget = _budget
+            self.tune = _tune
+            self.generation: int = 0
+
+    class Result:
+        def __init__(self, generation: int, found_patterns: Optional[InstancePattern] = None, opatterns: str = "", compression: Optional[Compressor.Result] = None, error: Optional[Exception] = None, partial: bool = False, tolerance: Optional[Tolerance] = None):
+            self.generation = generation
+            self.found_patterns = found_patterns
+            self.opatterns = opatterns
+            self.compression = compression
+            self.error = error
+            # Some patterns were settled for when the budget ran out
+            self.partial = partial
+            # Tolerance a tuning request selected
+            self.tolerance = tolerance
+
+    def __init__(self):
+        self.search = IncrementalSearch()
+        self.snapshot = Snapshot()
+        self.generation: int = 0
+        # Groups searched for the request in progress
+        self.progress: int = 0
+
+        self._condition = threading.Condition()
+        self._request: Optional[SearchWorker.Request] = None
+        self._result: Optional[SearchWorker.Result] = None
+        self._token: Optional[CancellationToken] = None
+        self._running: bool = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def busy(self) -> bool:
+        with self._condition:
+            return self._request is not None or self._running
+
+    def submit(self, request: SearchWorker.Request) -> int:
+        with self._condition:
+            self.generation += 1
+            request.generation = self.generation
+            self._request = request
+            self._result = None
+            if self._token is not None:
+                self._token.cancel()
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+        return request.generation
+
+    def cancel(self):
+        with self._condition:
+            self.generation += 1
+            self._request = None
+            self._result = None
+            if self._token is not None:
+                self._token.cancel()
+
+    def poll(self) -> Optional[SearchWorker.Result]:
+        with self._condition:
+            result, self._result = self._result, None
+
+            return result
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[SearchWorker.Result]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._result is not None or self._request is None and not self._running, timeout)
+            result, self._result = self._result, None
+
+            return result
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._request is not None)
+                request, self._request = self._request, None
+                self._token = CancellationToken(request.budget)
+                token = self._token
+                self._running = True
+                self.progress = 0
+
+            try:
+                result = self.process(request, token)
+            except Cancelled:
+                result = None
+            except Exception as error:
+                result = SearchWorker.Result(request.generation, error=error)
+
+            with self._condition:
+                self._running = False
+                self._token = None
+                if result is not None and result.generation == self.generation:
+                    self._result = result
+                self._condition.notify_all()
+
+    def process(self, request: SearchWorker.Request, token: CancellationToken) -> SearchWorker.Result:
+        def progress(group: PrimitiveGroup, pattern: Optional[InstancePattern]):
+            self.progress += 1
+
+        tolerance = None
+        if request.tune:
+            point = ToleranceTuner.select(ToleranceTuner().tune(request.root, request.named_primitives, request.available_patterns, _round=request.round, _size_pattern=request.size_pattern, _token=token))
+            found_patterns = point.pattern if point is not None else None
+            tolerance = point.tolerance if point is not None else None
+        else:
+            found_patterns = self.search.search_group_recursive(request.root, request.named_primitives, request.available_patterns, request.tolerance, _round=request.round, _size_pattern=request.size_pattern, _token=token, _progress=progress)
+        partial = token.expired
+        opatterns = found_patterns.dsl() if found_patterns is not None else ""
+
+        compression = None
+        if request.extract_constants:
+            compression = Compressor.compress(opatterns)
+            opatterns = compression.code
+        token.check()
+
+        return SearchWorker.Result(request.generation, found_patterns, opatterns, compression, partial=partial, tolerance=tolerance)
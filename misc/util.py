@@ -1,4 +1,7 @@
-from typing import Set
+from typing import Optional, Set, TextIO
+import decimal
+import threading
+import time
 
 import imgui
 import numpy as np
@@ -85,6 +88,31 @@ class Tolerance:
         self.absolute = absolute
         self.relative = relative
 
+class Cancelled(Exception):
+    pass
+
+class CancellationToken:
+    # Shared between the thread that cancels and the thread that checks, which raises Cancelled at its next check.
+    # Running out of budget does not raise, it tells the search to settle for what it found so far.
+    def __init__(self, _budget: Optional[float] = None):
+        self._event = threading.Event()
+        self.deadline: Optional[float] = None if _budget is None else time.perf_counter() + _budget
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
 def equal_tolerant(x: float, y: float, tolerance: Tolerance):
     if tolerance is None:
         return x == y
@@ -157,6 +185,37 @@ def format_list(_list, _format=str, _begin='[', _separator=',', _end=']', _outer
 
     return (_separator + _inner_space).join(list(map(_format, _list))).join([_begin + _outer_space, _outer_space + _end])
 
+def format_number(value) -> str:
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    if isinstance(value, float):
+        text = repr(value)
+        # The lexer has no exponent notation, write small and large floats positionally
+        if "e" in text and np.isfinite(value):
+            text = format(decimal.Decimal(text), "f")
+            if "." not in text:
+                text += ".0"
+
+        return text
+
+    return str(value)
+
+def write_list(sink: TextIO, _list, _format=str, _begin='[', _separator=',', _end=']', _outer_space='', _inner_space=' '):
+    sink.write(_begin)
+    if len(_list) == 0:
+        sink.write(_end)
+        return
+
+    sink.write(_outer_space)
+    for index, item in enumerate(_list):
+        if index > 0:
+            sink.write(_separator)
+            sink.write(_inner_space)
+        sink.write(_format(item))
+    sink.write(_outer_space)
+    sink.write(_end)
+
 def imgui_property(text, widget=None, *args):
     imgui.text_unformatted(text)
     imgui.next_column()
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import numpy as np
+
+from gui.primitives import *
+from misc import default, util
+from parsing.primitive_parser import PrimitiveParser
+
+
+class BinaryScene:
+    """
+    Columnar binary storage for primitive group trees, opened through np.memmap.
+
+    The file starts with a fixed header of section sizes, followed by 8 byte aligned sections:
+    group parents and masters, node kinds, references and parents in depth first order, primitive names, arities
+    and parameter offsets, parameter values and kinds, the named primitives as names, selector offsets, selectors and
+    selector kinds, and finally a string dictionary shared by names, string parameters and named selectors. Integer
+    parameters are stored as the bits of an int64 in the float64 value column.
+    """
+    magic = b"GXSCENE\x02"
+    extension = ".gxs"
+
+    _primitive = 0
+    _group = 1
+
+    _int = 0
+    _float = 1
+    _str = 2
+
+    # Section name, dtype and the header count it is sized by
+    sections = [
+        ("group_parents", np.int32, "groups"),
+        ("group_masters", np.int32, "groups"),
+        ("node_kinds", np.uint8, "nodes"),
+        ("node_references", np.int32, "nodes"),
+        ("node_parents", np.int32, "nodes"),
+        ("names", np.int32, "primitives"),
+        ("arities", np.int32, "primitives"),
+        ("offsets", np.int64, "offsets"),
+        ("values", np.float64, "parameters"),
+        ("kinds", np.uint8, "parameters"),
+        ("named_names", np.int32, "named"),
+        ("named_offsets", np.int64, "named_offsets"),
+        ("selectors", np.int64, "selectors"),
+        ("selector_kinds", np.uint8, "selectors"),
+        ("string_offsets", np.int64, "string_offsets"),
+        ("strings", np.uint8, "string_bytes"),
+    ]
+    counts = ["groups", "nodes", "primitives", "offsets", "parameters", "named", "named_offsets", "selectors", "string_offsets", "string_bytes"]
+    header_size = len(magic) + 8 * len(counts)
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(BinaryScene.magic)]) != BinaryScene.magic:
+            raise Exception("Not a binary scene: {}".format(path))
+
+        header = np.frombuffer(self.data, dtype=np.int64, count=len(BinaryScene.counts), offset=len(BinaryScene.magic))
+        self.header: Dict[str, int] = { name: int(count) for name, count in zip(BinaryScene.counts, header) }
+
+        offset = BinaryScene.header_size
+        self.columns: Dict[str, np.ndarray] = dict()
+        for name, dtype, count in BinaryScene.sections:
+            size = self.header[count] * np.dtype(dtype).itemsize
+            self.columns[name] = self.data[offset:offset + size].view(dtype)
+            offset += BinaryScene.aligned(size)
+
+        self._strings: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return self.header["primitives"]
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            blob = bytes(self.columns["strings"])
+            offsets = self.columns["string_offsets"]
+            self._strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+        return self._strings
+
+    def parameters(self, index: int) -> Primitive.Parameters:
+        start, end = self.columns["offsets"][index], self.columns["offsets"][index + 1]
+
+        return self.decode(self.columns["values"][start:end].tolist(), self.columns["values"][start:end].view(np.int64).tolist(), self.columns["kinds"][start:end].tolist())
+
+    def decode(self, values: List[float], integers: List[int], kinds: List[int]) -> Primitive.Parameters:
+        parameters: Primitive.Parameters = []
+        for value, integer, kind in zip(values, integers, kinds):
+            if kind == BinaryScene._int:
+                parameters.append(integer)
+            elif kind == BinaryScene._float:
+                parameters.append(value)
+            else:
+                parameters.append(self.strings[integer])
+
+        return parameters
+
+    def primitive(self, index: int, reference_factory: ReferenceFactory) -> Optional[Primitive]:
+        name = self.strings[self.columns["names"][index]]
+
+        return Primitive.from_list(reference_factory.new(), name, self.parameters(index))
+
+    def group(self, reference_factory: ReferenceFactory) -> PrimitiveGroup:
+        groups = [PrimitiveGroup(reference_factory.new()) for _ in range(self.header["groups"])]
+        children: List[List[PrimitiveGroup.Parameter]] = [[] for _ in groups]
+        primitives: Dict[int, Primitive] = dict()
+
+        # Bulk conversion of the columns is much cheaper than indexing the memory map per primitive
+        names = self.columns["names"].tolist()
+        offsets = self.columns["offsets"].tolist()
+        values = self.columns["values"].tolist()
+        integers = self.columns["values"].view(np.int64).tolist()
+        kinds = self.columns["kinds"].tolist()
+
+        for kind, reference, parent in zip(self.columns["node_kinds"].tolist(), self.columns["node_references"].tolist(), self.columns["node_parents"].tolist()):
+            if kind == BinaryScene._group:
+                children[parent].append(groups[reference])
+            else:
+                start, end = offsets[reference], offsets[reference + 1]
+                primitive = Primitive.from_list(reference_factory.new(), self.strings[names[reference]], self.decode(values[start:end], integers[start:end], kinds[start:end]))
+                if primitive is not None:
+                    primitives[int(reference)] = primitive
+                    children[parent].append(primitive)
+
+        # Groups are numbered depth first, so every child group is complete before its parent appends it
+        for index in reversed(range(len(groups))):
+            for child in children[index]:
+                groups[index].append(child)
+
+            master = int(self.columns["group_masters"][index])
+            if master in primitives:
+                groups[index].master = primitives[master]
+
+        return groups[0]
+
+    def named_primitives(self) -> Dict[Tuple[str, int], List[Union[str, int]]]:
+        named_primitives: Dict[Tuple[str, int], List[Union[str, int]]] = dict()
+        offsets = self.columns["named_offsets"].tolist()
+        selectors = self.columns["selectors"].tolist()
+        kinds = self.columns["selector_kinds"].tolist()
+        for index, name in enumerate(self.columns["named_names"].tolist()):
+            start, end = offsets[index], offsets[index + 1]
+            variables = [selector if kind == BinaryScene._int else self.strings[selector] for selector, kind in zip(selectors[start:end], kinds[start:end])]
+            named_primitives[(self.strings[name], len(variables))] = variables
+
+        return named_primitives
+
+    def text(self) -> str:
+        declarations = BinaryScene.declarations(self.named_primitives())
+
+        return "\n".join(([declarations] if len(declarations) > 0 else []) + [self.group(ReferenceFactory()).children_dsl()])
+
+    @staticmethod
+    def declarations(named_primitives: Dict[Tuple[str, int], List[Union[str, int]]]) -> str:
+        # Named primitives that only number their parameters are what the parser assumes anyway, so they are left out
+        lines = []
+        for (name, arity), variables in named_primitives.items():
+            if variables != list(range(arity)):
+                lines.append("{}{}{}".format(default.tokens[default.variable], name, util.format_list(variables, str, default.tokens[default.primitive_begin], default.tokens[default.value_separator], default.tokens[default.primitive_end])))
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def aligned(size: int) -> int:
+        return (size + 7) // 8 * 8
+
+    @staticmethod
+    def write(path: str, root: PrimitiveGroup, named_primitives: Optional[Dict[Tuple[str, int], List[Union[str, int]]]] = None):
+        group_parents: List[int] = []
+        group_masters: List[int] = []
+        node_kinds: List[int] = []
+        node_references: List[int] = []
+        node_parents: List[int] = []
+        names: List[int] = []
+        arities: List[int] = []
+        offsets: List[int] = [0]
+        integers: List[int] = []
+        floats: List[float] = []
+        kinds: List[int] = []
+        strings: Dict[str, int] = dict()
+
+        def string(value: str) -> int:
+            if value not in strings:
+                strings[value] = len(strings)
+
+            return strings[value]
+
+        def write_primitive(primitive: Primitive) -> int:
+            for parameter in primitive.parameters:
+                if isinstance(parameter, (int, np.integer)):
+                    integers.append(int(parameter))
+                    floats.append(0.0)
+                    kinds.append(BinaryScene._int)
+                elif isinstance(parameter, (float, np.floating)):
+                    integers.append(0)
+                    floats.append(float(parameter))
+                    kinds.append(BinaryScene._float)
+                else:
+                    integers.append(string(str(parameter)))
+                    floats.append(0.0)
+                    kinds.append(BinaryScene._str)
+
+            names.append(string(primitive.name))
+            arities.append(primitive.arity)
+            offsets.append(len(kinds))
+
+            return len(names) - 1
+
+        def write_group(group: PrimitiveGroup, parent: int) -> int:
+            index = len(group_parents)
+            group_parents.append(parent)
+            group_masters.append(-1)
+
+            for child in group:
+                node_parents.append(index)
+                if isinstance(child, PrimitiveGroup):
+                    node_kinds.append(BinaryScene._group)
+                    node_references.append(-1)
+                    node = len(node_references) - 1
+                    node_references[node] = write_group(child, index)
+                else:
+                    node_kinds.append(BinaryScene._primitive)
+                    node_references.append(write_primitive(child))
+                    if child is group.master:
+                        group_masters[index] = node_references[-1]
+
+            return index
+
+        write_group(root, -1)
+
+        named_names: List[int] = []
+        named_offsets: List[int] = [0]
+        selectors: List[int] = []
+        selector_kinds: List[int] = []
+        for (name, _), variables in (named_primitives if named_primitives is not None else dict()).items():
+            for variable in variables:
+                if isinstance(variable, str):
+                    selectors.append(string(variable))
+                    selector_kinds.append(BinaryScene._str)
+                else:
+                    selectors.append(int(variable))
+                    selector_kinds.append(BinaryScene._int)
+
+            named_names.append(string(name))
+            named_offsets.append(len(selectors))
+
+        kinds_column = np.array(kinds, dtype=np.uint8)
+        values_column = np.where(kinds_column == BinaryScene._float, np.array(floats, dtype=np.float64).view(np.int64), np.array(integers, dtype=np.int64)).view(np.float64)
+
+        encoded = [value.encode("utf-8") for value in strings.keys()]
+        string_offsets = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+
+        columns = {
+            "group_parents": np.array(group_parents, dtype=np.int32),
+            "group_masters": np.array(group_masters, dtype=np.int32),
+            "node_kinds": np.array(node_kinds, dtype=np.uint8),
+            "node_references": np.array(node_references, dtype=np.int32),
+            "node_parents": np.array(node_parents, dtype=np.int32),
+            "names": np.array(names, dtype=np.int32),
+            "arities": np.array(arities, dtype=np.int32),
+            "offsets": np.array(offsets, dtype=np.int64),
+            "values": values_column,
+            "kinds": kinds_column,
+            "named_names": np.array(named_names, dtype=np.int32),
+            "named_offsets": np.array(named_offsets, dtype=np.int64),
+            "selectors": np.array(selectors, dtype=np.int64),
+            "selector_kinds": np.array(selector_kinds, dtype=np.uint8),
+            "string_offsets": string_offsets,
+            "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        header = np.array([len(group_parents), len(node_kinds), len(names), len(offsets), len(kinds), len(named_names), len(named_offsets), len(selectors), len(string_offsets), int(string_offsets[-1])], dtype=np.int64)
+
+        with open(path, "wb") as file:
+            file.write(BinaryScene.magic)
+            file.write(header.tobytes())
+            for name, dtype, _ in BinaryScene.sections:
+                data = columns[name].astype(dtype, copy=False).tobytes()
+                file.write(data)
+                file.write(b"\0" * (BinaryScene.aligned(len(data)) - len(data)))
+
+    @staticmethod
+    def from_text(path: str, code: str):
+        root, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        BinaryScene.write(path, root, named_primitives)
+
+    @staticmethod
+    def to_text(path: str) -> str:
+        return BinaryScene(path).text()
@@ -0,0 +1,79 @@
+from typing import *
+
+from parsing.lexer import Lexer
+from misc import default
+
+class Compressor:
+    # Tokens the pattern parser matches literally, substituting them would break parsing
+    reserved = { default.none }
+
+    class Result:
+        def __init__(self, code: str, constants: Dict[str, str], original_size: int):
+            self.code = code
+            self.constants = constants
+            self.original_size = original_size
+
+        def __repr__(self):
+            return 'constants: {}, size: {} -> {}'.format(self.constants, self.original_size, self.compressed_size)
+
+        @property
+        def compressed_size(self) -> int:
+            return len(self.code)
+
+        @property
+        def ratio(self) -> float:
+            if self.original_size == 0:
+                return 1.0
+
+            return float(self.compressed_size) / float(self.original_size)
+
+        @property
+        def saving(self) -> float:
+            return 1.0 - self.ratio
+
+    @staticmethod
+    def variable(index: int) -> str:
+        return "v{}".format(index)
+
+    @staticmethod
+    def header(variable: str, value: str) -> str:
+        return "{}{} {} {}\n".format(default.tokens[default.variable], variable, default.tokens[default.assigment], value)
+
+    @staticmethod
+    def saving(value: str, count: int, variable: str) -> int:
+        return count * (len(value) - len(variable)) - len(Compressor.header(variable, value))
+
+    @staticmethod
+    def select(counter: Dict[str, int]) -> Dict[str, str]:
+        # Constants that save the most get the shortest variable names
+        candidates = sorted(
+            [(value, count) for value, count in counter.items() if count > 1 and value not in Compressor.reserved],
+            key=lambda candidate: candidate[1] * len(candidate[0]),
+            reverse=True)
+
+        constants: Dict[str, str] = dict()
+        for value, count in candidates:
+            variable = Compressor.variable(len(constants))
+            if Compressor.saving(value, count, variable) > 0:
+                constants[value] = variable
+
+        return constants
+
+    @staticmethod
+    def compress(code: str) -> Result:
+        tokens, counter = Lexer.extract_constants(code)
+        constants = Compressor.select(counter)
+
+        pieces = [Compressor.header(variable, value) for value, variable in constants.items()]
+        current = 0
+        for token in tokens:
+            value = code[token.start : token.start + token.length]
+            if value not in constants:
+                continue
+
+            pieces.append(code[current : token.start])
+            pieces.append(constants[value])
+            current = token.start + token.length
+        pieces.append(code[current:])
+
+        return Compressor.Result("".join(pieces), constants, len(code))
@@ -1,6 +1,6 @@
 from parsing.lexer import Lexer
-from pattern.pattern import *
 from pattern.patterns import *
+from pattern.pattern import *
 
 class PatternParser:
 
@@ -63,6 +63,8 @@ class PatternParser:
                 value = self.substitute_variable(value)
 
                 def check_int(s):
+                    if not isinstance(s, str):
+                        return False
                     if s[0] in ('-', '+'):
                         return s[1:].isdigit()
                     return s.isdigit()
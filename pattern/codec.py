@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+from parsing.pattern_parser import PatternParser
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+
+
+class SceneCodec:
+    """
+    Lossless scene storage as an instance pattern plus a sparse residual table.
+
+    Every group predicts the masters of its children with its pattern, starting from the predicted master of the
+    group itself. Leaves whose prediction differs from the input store either the differing parameters or, when the
+    name or arity differs, the full primitive.
+    """
+    Shape = List[Optional["SceneCodec.Shape"]]
+    Column = Tuple[str, int, int]
+    Corrections = Dict[int, Primitive.Parameter]
+
+    class Encoding:
+        def __init__(self):
+            self.named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors] = dict()
+            self.start: Optional[Primitive] = None
+            self.shape: SceneCodec.Shape = []
+            self.integral: Set[SceneCodec.Column] = set()
+            self.pattern: str = ""
+            self.replacements: Dict[int, Primitive] = dict()
+            self.corrections: Dict[int, SceneCodec.Corrections] = dict()
+
+        def __len__(self) -> int:
+            return len(self.replacements) + sum(len(corrections) for corrections in self.corrections.values())
+
+        def dump(self) -> str:
+            lines = []
+            for (name, _), selectors in self.named_primitives.items():
+                lines.append("{}{}".format(default.tokens[default.variable], util.format_list(selectors, str, name + default.tokens[default.primitive_begin], default.tokens[default.value_separator], default.tokens[default.primitive_end])))
+            if self.start is not None:
+                lines.append("{}{}".format(SceneCodec.start_token, self.start.dsl()))
+            lines.append("{}{}".format(SceneCodec.shape_token, SceneCodec.dump_shape(self.shape)))
+            lines.append("{}{}".format(SceneCodec.integral_token, ",".join(sorted("{}/{}/{}".format(*column) for column in self.integral))))
+            lines.append(self.pattern)
+            lines.append(SceneCodec.residual_token)
+            for leaf, primitive in sorted(self.replacements.items()):
+                lines.append("{} {}".format(leaf, primitive.dsl()))
+            for leaf, corrections in sorted(self.corrections.items()):
+                for index, value in sorted(corrections.items()):
+                    lines.append("{}{}{} {}".format(leaf, default.tokens[default.selector], index, value))
+
+            return "\n".join(lines)
+
+        @staticmethod
+        def load(code: str) -> SceneCodec.Encoding:
+            encoding = SceneCodec.Encoding()
+            lines = code.split("\n")
+
+            line_index = 0
+            while line_index < len(lines):
+                line = lines[line_index]
+                if line.startswith(default.tokens[default.variable]):
+                    encoding.named_primitives.update(PrimitiveParser(line).parse_named_primitives())
+                elif line.startswith(SceneCodec.start_token):
+                    group, _ = PrimitiveParser(line[len(SceneCodec.start_token):]).parse(ReferenceFactory())
+                    encoding.start = group[0]
+                elif line.startswith(SceneCodec.shape_token):
+                    encoding.shape = SceneCodec.load_shape(line[len(SceneCodec.shape_token):])
+                elif line.startswith(SceneCodec.integral_token):
+                    for column in filter(None, line[len(SceneCodec.integral_token):].split(",")):
+                        name, arity, index = column.split("/")
+                        encoding.integral.add((name, int(arity), int(index)))
+                else:
+                    break
+
+                line_index += 1
+
+            pattern_lines = []
+            while line_index < len(lines) and lines[line_index] != SceneCodec.residual_token:
+                pattern_lines.append(lines[line_index])
+                line_index += 1
+            encoding.pattern = "\n".join(pattern_lines)
+
+            for line in lines[line_index + 1:]:
+                if len(line) == 0:
+                    continue
+
+                key, value = line.split(" ", 1)
+                if default.tokens[default.selector] in key:
+                    leaf, index = map(int, key.split(default.tokens[default.selector]))
+                    encoding.corrections.setdefault(leaf, dict())[index] = SceneCodec.parse_parameter(value)
+                else:
+                    group, _ = PrimitiveParser(value).parse(ReferenceFactory())
+                    encoding.replacements[int(key)] = group[0]
+
+            return encoding
+
+    start_token = "!"
+    shape_token = "^"
+    integral_token = "="
+    residual_token = "%"
+    repeat_token = "*"
+
+    @staticmethod
+    def encode(root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, _size_pattern: bool = True, _pattern: Optional[InstancePattern] = None) -> SceneCodec.Encoding:
+        encoding = SceneCodec.Encoding()
+        encoding.named_primitives = dict(named_primitives)
+        encoding.shape = SceneCodec.shape(root)
+        encoding.integral = SceneCodec.integral_columns(root)
+        encoding.start = root.master.copy(ReferenceFactory()) if root.master is not None else None
+
+        found_pattern = _pattern
+        if found_pattern is None:
+            found_pattern = Pattern.search_group_recursive(root, named_primitives, available_patterns, tolerance, ReferenceFactory(), _size_pattern=_size_pattern)
+        if found_pattern is not None:
+            encoding.pattern = found_pattern.dsl()
+
+        # Residuals are taken against the pattern as the decoder will parse it, not against the found pattern
+        leaves = SceneCodec.leaves(root)
+        predictions = SceneCodec.predict(encoding)
+        for leaf, (prediction, primitive) in enumerate(zip(predictions, leaves)):
+            if prediction is None or prediction.name != primitive.name or prediction.arity != primitive.arity:
+                encoding.replacements[leaf] = primitive.copy(ReferenceFactory())
+                continue
+
+            corrections = { index: parameter for index, parameter in enumerate(primitive.parameters) if not SceneCodec.same(prediction[index], parameter) }
+            if len(corrections) > 0:
+                encoding.corrections[leaf] = corrections
+
+        return encoding
+
+    @staticmethod
+    def decode(encoding: SceneCodec.Encoding, reference_factory: Optional[ReferenceFactory] = None) -> PrimitiveGroup:
+        if reference_factory is None:
+            reference_factory = ReferenceFactory()
+        predictions = iter(SceneCodec.predict(encoding))
+        leaf_counter = [0]
+
+        def build(shape: SceneCodec.Shape) -> PrimitiveGroup:
+            group = PrimitiveGroup(reference_factory.new())
+            for child in shape:
+                if child is not None:
+                    group.append(build(child))
+                    continue
+
+                leaf = leaf_counter[0]
+                leaf_counter[0] += 1
+                prediction = next(predictions)
+                if leaf in encoding.replacements:
+                    primitive = encoding.replacements[leaf]
+                    group.append(Primitive.from_list(reference_factory.new(), primitive.name, list(primitive.parameters)))
+                    continue
+
+                parameters = list(prediction.parameters)
+                for index, value in encoding.corrections.get(leaf, dict()).items():
+                    parameters[index] = value
+                group.append(Primitive.from_list(reference_factory.new(), prediction.name, parameters))
+
+            return group
+
+        return build(encoding.shape)
+
+    @staticmethod
+    def predict(encoding: SceneCodec.Encoding) -> List[Optional[Primitive]]:
+        pattern = PatternParser(encoding.pattern).parse(ReferenceFactory()) if len(encoding.pattern) > 0 else None
+        reference_factory = ReferenceFactory()
+        predictions: List[Optional[Primitive]] = []
+
+        def normalized(primitive: Optional[Primitive]) -> Optional[Primitive]:
+            if primitive is None:
+                return None
+
+            parameters = []
+            for index, parameter in enumerate(primitive.parameters):
+                if isinstance(parameter, np.generic):
+                    parameter = parameter.item()
+                if isinstance(parameter, float) and parameter.is_integer() and (primitive.name, primitive.arity, index) in encoding.integral:
+                    parameter = int(parameter)
+                parameters.append(parameter)
+
+            return Primitive(primitive.identifier, primitive.name, primitive.arity, *parameters)
+
+        def walk(shape: SceneCodec.Shape, pattern: Optional[InstancePattern], start: Optional[Primitive]):
+            masters: List[Optional[Primitive]] = [None] * len(shape)
+            intergroup_pattern = pattern.intergroup_pattern if isinstance(pattern, GroupPattern) else pattern
+            if start is not None and isinstance(intergroup_pattern, PrimitivePattern):
+                try:
+                    masters = Pattern.next([start], intergroup_pattern, encoding.named_primitives, [len(shape)], reference_factory)
+                except KeyError:
+                    # The pattern extrapolates a primitive the named primitives do not know, nothing below is predicted
+                    # and the encoder stores every leaf as a replacement
+                    masters = [None] * len(shape)
+
+            for index, child in enumerate(shape):
+                master = normalized(masters[index]) if index < len(masters) else None
+                if child is None:
+                    predictions.append(master)
+                elif isinstance(pattern, GroupPattern) and len(pattern) > 0:
+                    walk(child, pattern[index % len(pattern)], master)
+                else:
+                    walk(child, None, master)
+
+        walk(encoding.shape, pattern, normalized(encoding.start))
+
+        return predictions
+
+    @staticmethod
+    def same(x: Primitive.Parameter, y: Primitive.Parameter) -> bool:
+        return type(x) is type(y) and x == y
+
+    @staticmethod
+    def parse_parameter(value: str) -> Primitive.Parameter:
+        for parse in [int, float]:
+            try:
+                return parse(value)
+            except ValueError:
+                pass
+
+        return value
+
+    @staticmethod
+    def leaves(group: PrimitiveGroup) -> List[Primitive]:
+        result = []
+        for child in group:
+            if isinstance(child, PrimitiveGroup):
+                result += SceneCodec.leaves(child)
+            else:
+                result.append(child)
+
+        return result
+
+    @staticmethod
+    def integral_columns(group: PrimitiveGroup) -> Set[SceneCodec.Column]:
+        columns: Set[SceneCodec.Column] = set()
+        floating: Set[SceneCodec.Column] = set()
+        for primitive in SceneCodec.leaves(group):
+            for index, parameter in enumerate(primitive.parameters):
+                column = (primitive.name, primitive.arity, index)
+                if isinstance(parameter, int):
+                    columns.add(column)
+                else:
+                    floating.add(column)
+
+        return columns - floating
+
+    @staticmethod
+    def shape(group: PrimitiveGroup) -> SceneCodec.Shape:
+        return [SceneCodec.shape(child) if isinstance(child, PrimitiveGroup) else None for child in group]
+
+    @staticmethod
+    def dump_shape(shape: SceneCodec.Shape) -> str:
+        """
+        Run length encoded shape, a number counts consecutive primitives and a braced shape followed by *n repeats a
+        group n times, e.g. 2{3}*4 is two primitives followed by four groups of three primitives.
+        """
+        begin = default.tokens[default.primitive_group_begin]
+        end = default.tokens[default.primitive_group_end]
+
+        entries: List[Tuple[str, int]] = []
+        for child in shape:
+            entry = None if child is None else begin + SceneCodec.dump_shape(child) + end
+            if len(entries) > 0 and entries[-1][0] == entry:
+                entries[-1] = (entry, entries[-1][1] + 1)
+            else:
+                entries.append((entry, 1))
+
+        result = ""
+        for entry, count in entries:
+            if entry is None:
+                result += " {} ".format(count)
+            else:
+                result += entry if count == 1 else "{}{}{}".format(entry, SceneCodec.repeat_token, count)
+
+        return " ".join(result.split())
+
+    @staticmethod
+    def load_shape(code: str) -> SceneCodec.Shape:
+        begin = default.tokens[default.primitive_group_begin]
+        end = default.tokens[default.primitive_group_end]
+
+        stack: List[SceneCodec.Shape] = [[]]
+        index = 0
+        while index < len(code):
+            character = code[index]
+            if character.isdigit() or character == SceneCodec.repeat_token:
+                repeat = character == SceneCodec.repeat_token
+                start = index + 1 if repeat else index
+                index = start
+                while index < len(code) and code[index].isdigit():
+                    index += 1
+                count = int(code[start:index])
+
+                if repeat:
+                    stack[-1].extend(stack[-1][-1:] * (count - 1))
+                else:
+                    stack[-1].extend([None] * count)
+                continue
+
+            if character == begin:
+                stack.append([])
+            elif character == end:
+                child = stack.pop()
+                stack[-1].append(child)
+
+            index += 1
+
+        return stack[0]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from pattern.pattern import *
+
+
+class Extrapolation:
+    """
+    Output of Pattern.next kept in sync with a primitive group, so that changing extrapolation counts only generates or
+    drops the difference.
+
+    The nodes mirror the recursion of Pattern.next: a primitive pattern node keeps the primitives it generated, a group
+    pattern node keeps the starts of its children and one node per child. The group and the DSL lines of its children
+    are edited in place, in output order. A different group, start, pattern or set of named primitives rebuilds
+    everything.
+    """
+
+    class Node:
+        def __init__(self, pattern: InstancePattern, start: Primitive):
+            self.pattern: InstancePattern = pattern
+            self.start: Primitive = start
+            # Generated primitives, or the starts of the children of a group pattern
+            self.primitives: List[Optional[Primitive]] = []
+            self.totals: Dict[PrimitivePattern.Selector, int] = dict()
+            self.children: List[Extrapolation.Node] = []
+            self.extrapolations: Optional[List[int]] = None
+            # Number of output primitives of this subtree
+            self.size: int = 0
+
+    def __init__(self):
+        self.group: Optional[PrimitiveGroup] = None
+        self.root: Optional[Extrapolation.Node] = None
+        self.start_version: int = 0
+        self.named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors] = dict()
+        self.reference_factory: ReferenceFactory = ReferenceFactory()
+        self.lines: List[str] = []
+
+    def reset(self):
+        self.group = None
+        self.root = None
+        self.lines = []
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def apply(self, group: PrimitiveGroup, start: Primitive, pattern: InstancePattern, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], extrapolations: List[int], reference_factory: ReferenceFactory):
+        assert pattern.level == len(extrapolations)
+
+        if group is not self.group or self.root is None or self.root.pattern is not pattern or self.root.start is not start or start.version != self.start_version or named_primitives != self.named_primitives or reference_factory is not self.reference_factory:
+            self.reset()
+            for primitive in group:
+                reference_factory.release(primitive.identifier)
+            group.splice(0, len(group), [])
+            self.group = group
+            self.root = Extrapolation.Node(pattern, start)
+            self.start_version = start.version
+            self.named_primitives = dict(named_primitives)
+            self.reference_factory = reference_factory
+
+        self.update(self.root, extrapolations, 0)
+
+    def update(self, node: Extrapolation.Node, extrapolations: List[int], offset: int):
+        pattern = node.pattern
+        if isinstance(pattern, NonePattern):
+            if len(node.primitives) == 0:
+                # The start primitive itself, copied when it is still owned by another group
+                primitive = node.start if node.start.parent_group is None else node.start.copy(self.reference_factory)
+                node.primitives.append(primitive)
+                self.edit(offset, 0, [primitive])
+                node.size = 1
+
+        elif isinstance(pattern, PrimitivePattern):
+            removed, added = self.resize(node, pattern, extrapolations[0])
+            removed = [primitive for primitive in removed if primitive is not None]
+            added = [primitive for primitive in added if primitive is not None]
+            node.size -= len(removed)
+            self.edit(offset + node.size, len(removed), added)
+            node.size += len(added)
+
+        elif isinstance(pattern, GroupPattern):
+            if pattern.intergroup_pattern is None:
+                node.primitives = [node.start]
+            else:
+                self.resize(node, pattern.intergroup_pattern, extrapolations[0])
+
+            while len(node.children) > len(node.primitives):
+                child = node.children.pop()
+                node.size -= child.size
+                self.edit(offset + node.size, child.size, [])
+
+            # The children only depend on the deeper counts and their index
+            if extrapolations[1:] != node.extrapolations:
+                position = offset
+                for index, child in enumerate(node.children):
+                    size = child.size
+                    self.update(child, self.child_extrapolations(pattern, extrapolations, index), position)
+                    node.size += child.size - size
+                    position += child.size
+
+            for index in range(len(node.children), len(node.primitives)):
+                child = Extrapolation.Node(pattern[index % len(pattern.intragroup_patterns)], node.primitives[index])
+                node.children.append(child)
+                self.update(child, self.child_extrapolations(pattern, extrapolations, index), offset + node.size)
+                node.size += child.size
+
+            node.extrapolations = extrapolations[1:]
+
+        else:
+            raise Exception()
+
+    def resize(self, node: Extrapolation.Node, pattern: PrimitivePattern, count: int) -> Tuple[List[Optional[Primitive]], List[Optional[Primitive]]]:
+        # Grows or shrinks the primitives of a node to count, returning the removed and added ones
+        size = len(node.primitives)
+        if count > size:
+            added = pattern.next_range(node.start, size, count, self.named_primitives, self.reference_factory, _totals=node.totals)
+            node.primitives += added
+
+            return [], added
+
+        removed = node.primitives[count:]
+        del node.primitives[count:]
+        for nth in range(count, size):
+            for selector in self.named_primitives[pattern.next_signature(node.start, nth)]:
+                node.totals[selector] -= 1
+
+        return removed, []
+
+    @staticmethod
+    def child_extrapolations(pattern: GroupPattern, extrapolations: List[int], index: int) -> List[int]:
+        # Same adjustment by the size pattern as Pattern.next
+        result = extrapolations[1:]
+        result[0] += int(pattern.intragroup_size_pattern.next(pattern.intragroup_sizes[0], index) - 1)
+
+        return result
+
+    def edit(self, position: int, removed: int, added: List[Primitive]):
+        if removed == 0 and len(added) == 0:
+            return
+
+        for primitive in self.group[position:position + removed]:
+            self.reference_factory.release(primitive.identifier)
+        self.group.splice(position, position + removed, added)
+        self.lines[position:position + removed] = [primitive.dsl() for primitive in added]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import *
+import copy
+import threading
+
+import numpy as np
+
+from gui.primitives import Primitive
+from misc.util import CancellationToken, Tolerance
+from pattern.patterns import Acceptance, ParameterFlags, ParameterPattern, SequenceFeatures
+
+
+class FitCache:
+    """
+    Unrounded results of fit for one list of parameters per pattern, with the tolerance comparisons they depend on.
+
+    Under another tolerance a result is handed out again as long as its acceptance holds, with its confidence calculated
+    again from the stored error. Only patterns for which a comparison turns out differently are fitted again, and the
+    new fit is kept next to the others, so switching between tolerances only fits once per set of outcomes. Rounding
+    is applied when a result is handed out, so a different rounding never needs a fit. Searches on several threads may
+    share a cache, each fit is made under its lock, so a pattern is fitted once and the others wait for it.
+    """
+
+    class Fit:
+        def __init__(self, candidate: Optional[ParameterPattern], acceptance: Acceptance, tolerance: Tolerance):
+            self.candidate = candidate
+            self.acceptance = acceptance
+            self.tolerance = tolerance
+            # Last finished result, with the rounding it was finished with
+            self.result: Optional[Tuple[Optional[int], Optional[ParameterPattern]]] = None
+
+        def accepted(self, parameters: np.ndarray[Primitive.Parameter], tolerance: Tolerance, _round: Optional[int]) -> Optional[ParameterPattern]:
+            if self.candidate is None:
+                return None
+
+            if (tolerance.absolute, tolerance.relative) != (self.tolerance.absolute, self.tolerance.relative):
+                candidate = copy.copy(self.candidate)
+                candidate.tolerance = tolerance
+                if self.acceptance.error is not None:
+                    candidate.confidence = ParameterPattern.error_confidence(self.acceptance.error, tolerance)
+                self.candidate, self.tolerance, self.result = candidate, tolerance, None
+
+            if self.result is None or self.result[0] != _round:
+                self.result = (_round, self.candidate.finish(parameters, _round))
+
+            return self.result[1]
+
+    class Store:
+        # Caches per selector and list of parameters, for searches of different trees or under different settings. Results
+        # are shared between searches, but not between the selectors of one primitive pattern, which writes selectors
+        # with the very same pattern as one.
+        def __init__(self):
+            self.caches: Dict[Tuple[Union[str, int], Tuple[Primitive.Parameter, ...]], FitCache] = dict()
+            self._lock = threading.Lock()
+
+        def __len__(self) -> int:
+            return len(self.caches)
+
+        def get(self, selector: Union[str, int], parameters: Primitive.Parameters) -> FitCache:
+            with self._lock:
+                return self.caches.setdefault((selector, tuple(parameters)), FitCache())
+
+    # Fits kept per pattern, the oldest one is dropped first
+    max_fits = 8
+
+    def __init__(self):
+        self.fits: Dict[ParameterPattern, List[FitCache.Fit]] = dict()
+        self._lock = threading.Lock()
+
+    def apply(self, pattern: ParameterPattern, parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance, _round: Optional[int] = None, _token: Optional[CancellationToken] = None, _features: Optional[SequenceFeatures] = None) -> Tuple[Optional[ParameterPattern], bool]:
+        # The result and whether the pattern was fitted for it
+        with self._lock:
+            return self._apply(pattern, parameters, flags, tolerance, _round, _token, _features)
+
+    def _apply(self, pattern: ParameterPattern, parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance, _round: Optional[int], _token: Optional[CancellationToken], _features: Optional[SequenceFeatures]) -> Tuple[Optional[ParameterPattern], bool]:
+        # Fits whose comparisons all turn out the same under the tolerance take the same path, so any of them will do
+        fits = self.fits.setdefault(pattern, [])
+        for fit in fits:
+            if fit.acceptance.holds(tolerance):
+                return fit.accepted(parameters, tolerance, _round), False
+
+        acceptance = Acceptance()
+        fit = FitCache.Fit(pattern.fit_coarse(parameters, flags, tolerance, _token=_token, _acceptance=acceptance, _features=_features), acceptance, tolerance)
+
+        # A fit cut short by the budget is not kept
+        if _token is None or not _token.expired:
+            fits.append(fit)
+            if len(fits) > FitCache.max_fits:
+                fits.pop(0)
+
+        return fit.accepted(parameters, tolerance, _round), True
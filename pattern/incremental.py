@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from misc.util import CancellationToken
+from pattern.pattern import *
+
+
+class IncrementalSearch:
+    """
+    Pattern.search_group_recursive that keeps the search state of every group, so that searching again after an edit
+    only revisits the edited groups and their ancestors.
+
+    After every search all geometry of the tree is computed, so any later edit bumps the version of the edited node and
+    of all its ancestors. Groups with an unchanged version reuse their pattern. Changed groups collect their parameters
+    again, but only refit the selectors whose parameters, and the size pattern whose sizes, actually changed. A different
+    tolerance, rounding or set of patterns revisits every group, but the fits of every selector are kept in a FitCache,
+    so mostly they are only accepted, ranked and rounded again. Different named primitives start over. A cancelled
+    search keeps what it finished, and a search that ran out of budget keeps the fits that completed in time.
+    """
+
+    class Selector:
+        def __init__(self, parameters: Primitive.Parameters, pattern: Optional[ParameterPattern], fits: FitCache, ranking: Tuple):
+            self.parameters = parameters
+            self.pattern = pattern
+            self.fits = fits
+            self.ranking = ranking
+
+    class Entry:
+        def __init__(self, group: PrimitiveGroup):
+            self.group: PrimitiveGroup = group
+            self.version: int = -1
+            self.pattern: Optional[InstancePattern] = None
+            self.arities: Optional[Tuple[PrimitivePattern.Arities, PrimitivePattern.Arities]] = None
+            self.parameters: Dict[PrimitivePattern.Selector, IncrementalSearch.Selector] = dict()
+            self.sizes: Optional[Tuple[List[int], Optional[ParameterPattern]]] = None
+            # Identifiers of the groups below, whose entries are kept as long as this one is
+            self.descendants: List[int] = []
+
+    def __init__(self):
+        self.entries: Dict[int, IncrementalSearch.Entry] = dict()
+        self.settings: Optional[Tuple] = None
+        # Settings that only change which of the cached fits wins
+        self.ranking: Optional[Tuple] = None
+        self.reference_factory: ReferenceFactory = ReferenceFactory()
+        # Number of parameter lists fitted, and of parameter patterns fitted and skipped for them, for profiling
+        self.fits: int = 0
+        self.report: Pattern.Report = Pattern.Report()
+        # Fit order of the parameter patterns, which does not change what is found
+        self.statistics: Optional[PatternStatistics] = None
+
+        self._visited: Set[int] = set()
+        self._token: Optional[CancellationToken] = None
+        self._progress: Optional[Pattern.Progress] = None
+
+    def reset(self):
+        self.entries.clear()
+        self.settings = None
+        self.ranking = None
+
+    def search_group_recursive(self, root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int] = None, _size_pattern: bool = True, _token: Optional[CancellationToken] = None, _progress: Optional[Pattern.Progress] = None) -> Optional[InstancePattern]:
+        if root is None:
+            return None
+
+        settings = (_size_pattern, { key: tuple(selectors) for key, selectors in named_primitives.items() })
+        if settings != self.settings:
+            self.reset()
+            self.settings = settings
+        ranking = (tuple(available_patterns), tolerance.absolute, tolerance.relative, _round)
+        if ranking != self.ranking:
+            for entry in self.entries.values():
+                entry.version = -1
+            self.ranking = ranking
+
+        self._visited = set()
+        self._token = _token
+        self._progress = _progress
+        pattern = self.search(root, named_primitives, available_patterns, tolerance, _round, _size_pattern)
+        self.entries = { key: entry for key, entry in self.entries.items() if key in self._visited }
+        root.bounds()
+
+        return pattern
+
+    def search(self, group: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int], _size_pattern: bool) -> Optional[InstancePattern]:
+        entry = self.entries.get(id(group))
+        if entry is None or entry.group is not group:
+            entry = IncrementalSearch.Entry(group)
+            self.entries[id(group)] = entry
+
+        self._visited.add(id(group))
+        if entry.version == group.version:
+            self._visited.update(entry.descendants)
+            return entry.pattern
+
+        if self._token is not None:
+            self._token.check()
+
+        primitive_pattern = self.search_group(entry, named_primitives, available_patterns, tolerance, _round)
+        pattern = primitive_pattern
+
+        entry.descendants = []
+        subpatterns = []
+        for instance in group:
+            if isinstance(instance, Primitive):
+                subpatterns.append((NonePattern(self.reference_factory.new()), 1))
+            elif isinstance(instance, PrimitiveGroup):
+                subpattern = self.search(instance, named_primitives, available_patterns, tolerance, _round, _size_pattern)
+                entry.descendants.append(id(instance))
+                entry.descendants += self.entries[id(instance)].descendants
+                if subpattern is None:
+                    pattern = None
+                    break
+
+                subpatterns.append((subpattern, len(instance)))
+            else:
+                raise Exception("Unknown type in group")
+
+        if pattern is not None and any(not isinstance(subpattern, NonePattern) for subpattern, _ in subpatterns):
+            pattern = GroupPattern(primitive_pattern, self.reference_factory.new())
+            pattern.append(*subpatterns, _size_pattern=_size_pattern, _fit_sizes=False)
+
+            sizes = pattern.intragroup_sizes
+            if entry.sizes is None or entry.sizes[0] != sizes:
+                entry.sizes = (list(sizes), GroupPattern.fit_sizes(sizes, _size_pattern))
+            pattern.intragroup_size_pattern = entry.sizes[1]
+
+        entry.pattern = pattern
+        # Expiry is permanent, so a group that finished in time has no settled fits below it
+        if self._token is None or not self._token.expired:
+            entry.version = group.version
+
+        if self._progress is not None:
+            self._progress(group, pattern)
+
+        return pattern
+
+    def search_group(self, entry: IncrementalSearch.Entry, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int]) -> Union[PrimitivePattern, NonePattern]:
+        # Pattern.search_group, refitting only what changed since the previous search of this group
+        arity_list, parameter_dict = Pattern.group_parameters(entry.group, named_primitives)
+        if entry.arities is None or entry.arities[0] != arity_list:
+            entry.arities = (arity_list, Pattern.fit_arities(arity_list))
+
+        kinds = Pattern.selector_kinds(entry.group, named_primitives) if self.statistics is not None else dict()
+        parameters = dict()
+        settled = set()
+        for selector, selector_parameters in parameter_dict.items():
+            cached = entry.parameters.get(selector)
+            if cached is not None and cached.parameters == selector_parameters and cached.ranking == self.ranking:
+                parameters[selector] = cached
+            else:
+                fits = cached.fits if cached is not None and cached.parameters == selector_parameters else FitCache()
+                found_pattern = Pattern.search_parameters(selector_parameters, available_patterns, tolerance, _round, self._token, self.report, self.statistics, kinds.get(selector), fits)
+                parameters[selector] = IncrementalSearch.Selector(selector_parameters, found_pattern, fits, self.ranking)
+                self.fits += 1
+                # A fit that ended after the budget ran out may have settled, so it is searched again next time
+                if self._token is not None and self._token.expired:
+                    settled.add(selector)
+        entry.parameters = { selector: cached for selector, cached in parameters.items() if selector not in settled }
+
+        primitive_pattern = PrimitivePattern(arities=entry.arities[1], identifier=self.reference_factory.new())
+        for selector, cached in parameters.items():
+            if cached.pattern is None:
+                return NonePattern()
+
+            primitive_pattern.append(selector, cached.pattern)
+
+        return primitive_pattern
@@ -34,6 +34,20 @@ class MPattern:
         def __repr__(self):
             return "Periodic"
 
+    class PolynomialPattern(type):
+        def __str__(self):
+            return repr(self)
+
+        def __repr__(self):
+            return "Polynomial"
+
+    class GeometricPattern(type):
+        def __str__(self):
+            return repr(self)
+
+        def __repr__(self):
+            return "Geometric"
+
     class CircularPattern(type):
         def __str__(self):
             return repr(self)
@@ -1,8 +1,11 @@
 from __future__ import annotations
+from io import StringIO
 
 from pattern.patterns import *
 from gui.primitives import PrimitiveGroup, Primitive
-from misc.util import ReferenceFactory
+from misc.util import CancellationToken, ReferenceFactory
+from pattern.fits import FitCache
+from pattern.statistics import PatternStatistics
 
 class InstancePattern:
 
@@ -29,9 +32,21 @@ class InstancePattern:
         pass
 
     @abstractmethod
-    def dsl(self, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False) -> str:
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False):
         pass
 
+    def dsl(self, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False) -> str:
+        sink = StringIO()
+        self.write_dsl(sink, _depth, _identifier, _confidence, _tolerance)
+
+        return sink.getvalue()
+
+    def write_identifier(self, sink: TextIO, _depth: int, _identifier: bool):
+        sink.write("\t" * _depth)
+        if _identifier:
+            sink.write(default.tokens[default.identifier])
+            sink.write(str(self.identifier))
+
     def __len__(self) -> int:
         return 1
 
@@ -53,10 +68,9 @@ class NonePattern(InstancePattern):
     def print(self, depth: int = 0, _format: Union[str, repr] = str):
         print("\t" * depth + _format(self))
 
-    def dsl(self, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False) -> str:
-        return "{}{}{}".format(
-            "\t" * _depth, "{}{}".format(default.tokens[default.identifier], self.identifier) if _identifier else "",
-            default.none)
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False):
+        self.write_identifier(sink, _depth, _identifier)
+        sink.write(default.none)
 
 
 class PrimitivePattern(InstancePattern):
@@ -90,7 +104,7 @@ class PrimitivePattern(InstancePattern):
 
         return result
 
-    def dsl(self, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False) -> str:
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False):
         patterns = dict()
         for selector, pattern in self.patterns.items():
             if pattern not in patterns:
@@ -98,18 +112,20 @@ class PrimitivePattern(InstancePattern):
 
             patterns[pattern].append(selector)
 
-        result = "{}{}{}{}".format(
-            "\t" * _depth,
-            "{}{}".format(default.tokens[default.identifier], self.identifier) if _identifier else "",
-            "{}{}".format(default.tokens[default.arities], util.format_list(self.arities, str, "", default.tokens[default.value_separator], "", _inner_space="")) if self.arities is not None else "",
-            util.format_list(
-                ["{}{}{}".format(util.format_list(selectors, str, '', ',', '', '', ''), default.tokens[default.selector], pattern.dsl(_confidence, _tolerance)) for pattern, selectors in patterns.items()],
-                str,
-                default.tokens[default.primitive_pattern_begin],
-                default.tokens[default.value_separator],
-                default.tokens[default.primitive_pattern_end]))
+        self.write_identifier(sink, _depth, _identifier)
+        if self.arities is not None:
+            sink.write(default.tokens[default.arities])
+            util.write_list(sink, self.arities, str, "", default.tokens[default.value_separator], "", _inner_space="")
 
-        return result
+        sink.write(default.tokens[default.primitive_pattern_begin])
+        for index, (pattern, selectors) in enumerate(patterns.items()):
+            if index > 0:
+                sink.write(default.tokens[default.value_separator])
+                sink.write(" ")
+            util.write_list(sink, selectors, str, '', ',', '', '', '')
+            sink.write(default.tokens[default.selector])
+            pattern.write_dsl(sink, _confidence, _tolerance)
+        sink.write(default.tokens[default.primitive_pattern_end])
 
 
     def print(self, depth: int = 0, _format: Union[str, repr] = str):
@@ -141,43 +157,71 @@ class PrimitivePattern(InstancePattern):
             totals[selector] = sum(counts[selector])
 
         def next_primitive(nth: int):
+            def parameter_nth(selector: PrimitivePattern.Selector) -> int:
+                size = len(counts[selector])
+                div, rem = nth // size, nth % size
+                return totals[selector] * div + sum(counts[selector][:rem])
+
             name, arity = primitives[nth]
-            parameters = [None for _ in range(arity)]
-            for selector, pattern in self.patterns.items():
-                if selector == default.name:
-                    continue
+            return self.next_primitive(start, name, arity, parameter_nth, named_primitives, reference_factory)
 
-                if isinstance(selector, int):
-                    index = selector
+        if isinstance(nths, int):
+            return [next_primitive(nths)]
 
-                    if index >= arity:
-                        continue
-                else:
-                    selectors = named_primitives[primitives[nth]]
-                    if selector not in selectors:
-                        continue
+        return [next_primitive(nth) for nth in nths]
 
-                    index = selectors.index(selector)
-                    if index >= arity:
-                        continue
+    def next_signature(self, start: Primitive, nth: int) -> Tuple[str, int]:
+        return self.patterns[default.name].next(start.name, nth), self.arities[nth % len(self.arities)]
 
-                start_selectors = named_primitives[(start.name, start.arity)]
-                if index >= start.arity or selector not in start_selectors:
-                    pattern_start = None
-                else:
-                    pattern_start = start[index]
+    def next_primitive(self, start: Primitive, name: str, arity: int, parameter_nth: Callable[[PrimitivePattern.Selector], int], named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], reference_factory: ReferenceFactory) -> Optional[Primitive]:
+        parameters = [None for _ in range(arity)]
+        for selector, pattern in self.patterns.items():
+            if selector == default.name:
+                continue
 
-                size = len(counts[selector])
-                div, rem = nth // size, nth % size
-                parameter_nth = totals[selector] * div + sum(counts[selector][:rem])
-                parameters[index] = pattern.next(pattern_start, parameter_nth) if pattern is not None else pattern_start
+            if isinstance(selector, int):
+                index = selector
+
+                if index >= arity:
+                    continue
+            else:
+                selectors = named_primitives[(name, arity)]
+                if selector not in selectors:
+                    continue
 
-            return Primitive.from_list(reference_factory.new(), name, parameters)
+                index = selectors.index(selector)
+                if index >= arity:
+                    continue
 
-        if isinstance(nths, int):
-            return [next_primitive(nths)]
+            start_selectors = named_primitives[(start.name, start.arity)]
+            if index >= start.arity or selector not in start_selectors:
+                pattern_start = None
+            else:
+                pattern_start = start[index]
+
+            parameters[index] = pattern.next(pattern_start, parameter_nth(selector)) if pattern is not None else pattern_start
+
+        return Primitive.from_list(reference_factory.new(), name, parameters)
+
+    def next_range(self, start: Primitive, begin: int, end: int, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], reference_factory: ReferenceFactory, _totals: Optional[Dict[PrimitivePattern.Selector, int]] = None) -> List[Optional[Primitive]]:
+        """
+        The primitives at positions begin up to end of next(start, list(range(end)), ...). _totals counts, per selector,
+        the primitives before begin that have it and is updated in place, so consecutive ranges only cost their length.
+        """
+        if _totals is None:
+            _totals = dict()
+            for nth in range(begin):
+                for selector in named_primitives[self.next_signature(start, nth)]:
+                    _totals[selector] = _totals.get(selector, 0) + 1
+
+        result = []
+        for nth in range(begin, end):
+            name, arity = self.next_signature(start, nth)
+            result.append(self.next_primitive(start, name, arity, lambda selector: _totals.get(selector, 0), named_primitives, reference_factory))
+            for selector in named_primitives[(name, arity)]:
+                _totals[selector] = _totals.get(selector, 0) + 1
 
-        return [next_primitive(nth) for nth in nths]
+        return result
 
 
 class GroupPattern(InstancePattern):
@@ -219,20 +263,24 @@ class GroupPattern(InstancePattern):
         if value >= 0:
             self._level = value
 
-    def dsl(self, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False) -> str:
-        result = "{}{}{}{}{}{} {}\n{}\n{}".format(
-            "\t" * _depth,
-            "{}{}".format(default.tokens[default.identifier], self.identifier) if _identifier else "",
-            # "{}{}".format(default.tokens[default.sizes], util.format_list(self.intragroup_sizes, str, "", default.tokens[default.value_separator], "", _inner_space="")),
-            "{}{}".format(default.tokens[default.sizes], self.intragroup_size_pattern.dsl()),
-            default.tokens[default.group_pattern_parent_begin],
-            self.intergroup_pattern.dsl(0, _identifier, _confidence, _tolerance),
-            default.tokens[default.group_pattern_parent_end],
-            default.tokens[default.group_pattern_children_begin],
-            "{}\n".format(default.tokens[default.value_separator]).join([intragroup_pattern.dsl(_depth + 1, _identifier, _confidence, _tolerance) for intragroup_pattern in self.intragroup_patterns]),
-            "\t" * _depth + default.tokens[default.group_pattern_children_end])
-
-        return result
+    def write_dsl(self, sink: TextIO, _depth: int = 0, _identifier: bool = False, _confidence: bool = False, _tolerance: bool = False):
+        self.write_identifier(sink, _depth, _identifier)
+        sink.write(default.tokens[default.sizes])
+        self.intragroup_size_pattern.write_dsl(sink)
+        sink.write(default.tokens[default.group_pattern_parent_begin])
+        self.intergroup_pattern.write_dsl(sink, 0, _identifier, _confidence, _tolerance)
+        sink.write(default.tokens[default.group_pattern_parent_end])
+        sink.write(" ")
+        sink.write(default.tokens[default.group_pattern_children_begin])
+        sink.write("\n")
+        for index, intragroup_pattern in enumerate(self.intragroup_patterns):
+            if index > 0:
+                sink.write(default.tokens[default.value_separator])
+                sink.write("\n")
+            intragroup_pattern.write_dsl(sink, _depth + 1, _identifier, _confidence, _tolerance)
+        sink.write("\n")
+        sink.write("\t" * _depth)
+        sink.write(default.tokens[default.group_pattern_children_end])
 
 
     def print(self, depth: int = 0, _format: Union[str, repr] = str):
@@ -244,7 +292,7 @@ class GroupPattern(InstancePattern):
             child.print(depth + 1, _format)
         print("\t" * depth + "}")
 
-    def append(self, *intragroup_patterns: Tuple[InstancePattern, int], _size_pattern: bool = True):
+    def append(self, *intragroup_patterns: Tuple[InstancePattern, int], _size_pattern: bool = True, _fit_sizes: bool = True):
         for intragroup_pattern, intragroup_size in intragroup_patterns:
             if len(self.intragroup_patterns) == 0:
                 self.level = intragroup_pattern.level + 1
@@ -254,30 +302,51 @@ class GroupPattern(InstancePattern):
             self.intragroup_patterns.append(intragroup_pattern)
             self.intragroup_sizes.append(intragroup_size)
 
-            self.intragroup_size_pattern = PeriodicPattern.apply(np.array(self.intragroup_sizes), ParameterFlags(self.intragroup_sizes), Tolerance(0, 0), 0)
-            if _size_pattern:
-                for pattern in [ConstantPattern, LinearPattern]:
-                    result = pattern.apply(np.array(self.intragroup_sizes), ParameterFlags(self.intragroup_sizes), Tolerance(0, 0), 0)
-                    if result is not None and result.confidence == 1.0:
-                        self.intragroup_size_pattern = result
-                        break
-
             intragroup_pattern.parent = self
 
+        if _fit_sizes:
+            self.intragroup_size_pattern = GroupPattern.fit_sizes(self.intragroup_sizes, _size_pattern)
+
+    @staticmethod
+    def fit_sizes(sizes: List[int], _size_pattern: bool = True) -> Optional[ParameterPattern]:
+        parameters, flags = np.array(sizes), ParameterFlags(sizes)
+        features = SequenceFeatures(parameters)
+        size_pattern = PeriodicPattern.apply(parameters, flags, Tolerance(0, 0), 0, _features=features)
+        if _size_pattern:
+            for pattern in [ConstantPattern, LinearPattern]:
+                result = pattern.apply(parameters, flags, Tolerance(0, 0), 0, _features=features)
+                if result is not None and result.confidence == 1.0:
+                    return result
+
+        return size_pattern
+
     def next(self, start: Primitive, nths: Union[int, List[int]], named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors],  reference_factory: ReferenceFactory) -> List[Primitive]:
         pass
 
 
 class Pattern:
+    # Called with every group whose subtree was searched and the pattern found for it
+    Progress = Callable[[PrimitiveGroup, Optional[InstancePattern]], None]
+
+    class Report:
+        # Parameter patterns fitted, skipped because they could not outrank the best fit, and reused from a fit cache
+        def __init__(self):
+            self.fits: int = 0
+            self.skipped: int = 0
+            self.reused: int = 0
+
     @staticmethod
     def from_list(name: str, parameters: Primitive.Parameters) -> Optional[ParameterPattern]:
-        for pattern in [ConstantPattern, LinearPattern, SinusoidalPattern]:
+        for pattern in [ConstantPattern, LinearPattern, GeometricPattern, SinusoidalPattern]:
             if name == pattern.name():
                 return pattern(*parameters)
 
         if name == PeriodicPattern.name():
             return PeriodicPattern(parameters)
 
+        if name == PolynomialPattern.name():
+            return PolynomialPattern(parameters)
+
         if name == BFSOperatorPattern.name():
             operators = []
             for parameter in parameters:
@@ -333,11 +402,14 @@ class Pattern:
             raise Exception()
 
     @staticmethod
-    def search_group_recursive(root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, reference_factory: ReferenceFactory, _round: Optional[int] = None, _size_pattern: bool = True) -> Optional[InstancePattern]:
+    def search_group_recursive(root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, reference_factory: ReferenceFactory, _round: Optional[int] = None, _size_pattern: bool = True, _token: Optional[CancellationToken] = None, _progress: Optional[Pattern.Progress] = None, _report: Optional[Pattern.Report] = None, _statistics: Optional[PatternStatistics] = None, _fits: Optional[FitCache.Store] = None) -> Optional[InstancePattern]:
+        # Once the budget of the token runs out, every selector settles for the best pattern found so far. Cancelling the
+        # token raises Cancelled. Progress is reported for every group whose subtree was searched. Searches that share a
+        # store of fits only fit the parameters again that none of them fitted under a compatible tolerance.
         if root is None:
             return None
 
-        primitive_pattern = Pattern.search_group(root, named_primitives, available_patterns, tolerance, reference_factory, _round)
+        primitive_pattern = Pattern.search_group(root, named_primitives, available_patterns, tolerance, reference_factory, _round, _token, _report, _statistics, _fits)
         pattern = primitive_pattern
 
         subpatterns = []
@@ -345,8 +417,10 @@ class Pattern:
             if isinstance(instance, Primitive):
                 subpatterns.append((NonePattern(reference_factory.new()), 1))
             elif isinstance(instance, PrimitiveGroup):
-                subpattern = Pattern.search_group_recursive(instance, named_primitives, available_patterns, tolerance, reference_factory, _round, _size_pattern)
+                subpattern = Pattern.search_group_recursive(instance, named_primitives, available_patterns, tolerance, reference_factory, _round, _size_pattern, _token, _progress, _report, _statistics, _fits)
                 if subpattern is None:
+                    if _progress is not None:
+                        _progress(root, None)
                     return None
 
                 subpatterns.append((subpattern, len(instance)))
@@ -357,14 +431,35 @@ class Pattern:
             pattern = GroupPattern(primitive_pattern, reference_factory.new())
             pattern.append(*subpatterns, _size_pattern=_size_pattern)
 
+        if _progress is not None:
+            _progress(root, pattern)
+
         return pattern
 
     @staticmethod
-    def search_group(group: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, reference_factory: ReferenceFactory, _round: Optional[int] = None) -> Optional[Union[PrimitivePattern, NonePattern]]:
+    def search_group(group: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], tolerance: Tolerance, reference_factory: ReferenceFactory, _round: Optional[int] = None, _token: Optional[CancellationToken] = None, _report: Optional[Pattern.Report] = None, _statistics: Optional[PatternStatistics] = None, _fits: Optional[FitCache.Store] = None) -> Optional[Union[PrimitivePattern, NonePattern]]:
         if group is None:
             print("Group is none")
             return None
 
+        arity_list, parameter_dict = Pattern.group_parameters(group, named_primitives)
+        arity_list = Pattern.fit_arities(arity_list)
+        primitive_pattern = PrimitivePattern(arities=arity_list, identifier=reference_factory.new())
+        kinds = Pattern.selector_kinds(group, named_primitives) if _statistics is not None else dict()
+
+        for selector, parameters in parameter_dict.items():
+            found_pattern = Pattern.search_parameters(parameters, available_patterns, tolerance, _round, _token, _report, _statistics, kinds.get(selector), _fits.get(selector, parameters) if _fits is not None else None)
+
+            if found_pattern is None:
+                return NonePattern()
+
+            primitive_pattern.append(selector, found_pattern)
+
+        return primitive_pattern
+
+    @staticmethod
+    def group_parameters(group: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors]) -> Tuple[PrimitivePattern.Arities, Dict[PrimitivePattern.Selector, Primitive.Parameters]]:
+        # Arities of the masters of the children and their parameters per selector
         arity_list = []
         parameter_dict: Dict[PrimitivePattern.Selector, Primitive.Parameters] = { default.name: [] }
         for primitive in group:
@@ -380,57 +475,98 @@ class Pattern:
 
             parameter_dict[default.name].append(primitive.master.name)
 
+        return arity_list, parameter_dict
+
+    @staticmethod
+    def selector_kinds(group: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors]) -> Dict[PrimitivePattern.Selector, str]:
+        # Kind of the parameters of every selector, as the first master that has the selector sees them
+        kinds: Dict[PrimitivePattern.Selector, str] = { default.name: default.name }
+        for primitive in group:
+            key = primitive.master.name, primitive.master.arity
+            selectors = named_primitives[key] if key in named_primitives else list(range(primitive.master.arity))
+            for index, selector in enumerate(selectors):
+                if selector not in kinds:
+                    kinds[selector] = primitive.master.parameter_kind(index)
+
+        return kinds
+
+    @staticmethod
+    def fit_arities(arity_list: PrimitivePattern.Arities) -> PrimitivePattern.Arities:
         if len(arity_list) > 0:
             flags = ParameterFlags(arity_list)
             arity_pattern: Optional[PeriodicPattern] = PeriodicPattern.apply(np.array(arity_list, dtype=flags.dtype), flags)
             if arity_pattern is not None:
-                arity_list = [int(i) for i in arity_pattern.pattern]
-
-        primitive_pattern = PrimitivePattern(arities=arity_list, identifier=reference_factory.new())
-
-        for selector, parameters in parameter_dict.items():
-            found_pattern = Pattern.search_parameters(parameters, available_patterns, tolerance, _round)
+                return [int(i) for i in arity_pattern.pattern]
 
-            if found_pattern is None:
-                return NonePattern()
-
-            primitive_pattern.append(selector, found_pattern)
-
-        return primitive_pattern
+        return arity_list
 
     @staticmethod
-    def search_parameters(parameters: Primitive.Parameters, available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def search_parameters(parameters: Primitive.Parameters, available_patterns: List[ParameterPattern], tolerance: Tolerance, _round: Optional[int] = None, _token: Optional[CancellationToken] = None, _report: Optional[Pattern.Report] = None, _statistics: Optional[PatternStatistics] = None, _kind: Optional[str] = None, _fits: Optional[FitCache] = None) -> Optional[ParameterPattern]:
         parameter_count = len(parameters)
         flags = ParameterFlags(parameters)
 
-        ranked_patterns: List[Tuple[float, ParameterPattern]] = []
-        for available_pattern in available_patterns:
-            if parameter_count < available_pattern.minimum_parameters():
-                continue
+        # Likely winners, or else cheap patterns, are fitted first, and patterns that cannot outrank the best one so far,
+        # even with full confidence, are not fitted at all. Ties go to the pattern that comes first in available_patterns.
+        if _token is not None and _token.expired:
+            # Out of budget, the first pattern that fits is good enough, so the order of available_patterns is kept
+            ordered_patterns = available_patterns
+        elif _statistics is not None and _kind is not None:
+            ordered_patterns = _statistics.order(_kind, parameter_count, available_patterns)
+        else:
+            ordered_patterns = sorted(available_patterns, key=lambda available_pattern: available_pattern.cost())
+        indices = { available_pattern: index for index, available_pattern in enumerate(available_patterns) }
+        candidates = [(indices[available_pattern], available_pattern) for available_pattern in ordered_patterns if parameter_count >= available_pattern.minimum_parameters()]
 
-            input_parameters = np.array(parameters, flags.dtype)
-            if not flags.has_str():
-                adjusted_tolerance = Tolerance(np.ptp(input_parameters) * tolerance.absolute, tolerance.relative)
+        if len(candidates) == 0:
+            return None
+
+        # The same array and features go to every pattern fitted
+        input_parameters = np.array(parameters, flags.dtype)
+        features = SequenceFeatures(input_parameters)
+        if not flags.has_str():
+            adjusted_tolerance = Tolerance(features.ptp * tolerance.absolute, tolerance.relative)
+        else:
+            adjusted_tolerance = default.tolerance
+
+        best: Optional[Tuple[float, int, ParameterPattern]] = None
+        for index, available_pattern in candidates:
+            if best is not None:
+                bound = available_pattern.weight() * ParameterPattern.maximum_confidence
+                if bound < best[0] or bound == best[0] and index > best[1]:
+                    if _report is not None:
+                        _report.skipped += 1
+                    continue
+
+            if _token is not None and _token.expired:
+                _token.check()
+                # Out of budget, settle for the best pattern so far or the first one that fits
+                if best is not None:
+                    break
+
+            if _fits is not None:
+                result, fitted = _fits.apply(available_pattern, input_parameters, flags, adjusted_tolerance, _round, _token, features)
             else:
-                adjusted_tolerance = default.tolerance
-            result = available_pattern.apply(input_parameters, flags, adjusted_tolerance, _round)
-            if result is not None:
-                # return result
-                if result.confidence == 100.0:
-                    return result
+                result, fitted = available_pattern.apply(input_parameters, flags, adjusted_tolerance, _round, _token=_token, _features=features), True
+            if _report is not None:
+                if fitted:
+                    _report.fits += 1
                 else:
-                    ranked_patterns.append((result.weight() * result.confidence, result))
+                    _report.reused += 1
 
-        ranked_patterns.sort(key=lambda pattern: pattern[0], reverse=True)
+            if result is not None:
+                score = result.score()
+                if best is None or score > best[0] or score == best[0] and index < best[1]:
+                    best = (score, index, result)
 
-        if len(ranked_patterns) == 0:
-            return None
+        # Patterns settled for when the budget ran out did not necessarily win
+        if _statistics is not None and _kind is not None and best is not None and (_token is None or not _token.expired):
+            _statistics.record(_kind, parameter_count, best[2])
 
-        return ranked_patterns[0][1]
+        return best[2] if best is not None else None
 
     @staticmethod
-    def search(start_primitive: Primitive, root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], extrapolations: List[int], tolerance: Tolerance, reference_factory: ReferenceFactory = ReferenceFactory(), _round: Optional[int] = None, _size_pattern: bool = True) -> Tuple[Optional[InstancePattern], Optional[List[Primitive]]]:
-        patterns = Pattern.search_group_recursive(root, named_primitives, available_patterns, tolerance, reference_factory, _round, _size_pattern)
+    def search(start_primitive: Primitive, root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], extrapolations: List[int], tolerance: Tolerance, reference_factory: ReferenceFactory = ReferenceFactory(), _round: Optional[int] = None, _size_pattern: bool = True, _token: Optional[CancellationToken] = None) -> Tuple[Optional[InstancePattern], Optional[List[Primitive]]]:
+        patterns = Pattern.search_group_recursive(root, named_primitives, available_patterns, tolerance, reference_factory, _round, _size_pattern, _token)
         if patterns is None:
             return None, None
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import *
 from abc import *
+from functools import cached_property
 import math
 
 import numpy as np
@@ -61,10 +62,157 @@ class ParameterFlags:
             self.dtype = object
 
 
+class Acceptance:
+    """
+    Tolerance comparisons made by an apply, and the mean squared error its confidence came from.
+
+    An apply that makes the same comparisons comes to the same result, so as long as every comparison turns out the same
+    under another tolerance, the result of the apply holds for it too, with its confidence calculated again from the
+    error. Comparisons are made as numpy.isclose makes them.
+    """
+
+    def __init__(self):
+        self.comparisons: List[Tuple[float, float, bool]] = []
+        self.error: Optional[float] = None
+        # Comparisons with infinities are left to numpy, and not replayed
+        self.replayable: bool = True
+
+    @staticmethod
+    def compare(difference: float, magnitude: float, tolerance: Tolerance) -> bool:
+        return difference <= tolerance.absolute + tolerance.relative * magnitude
+
+    def equal(self, x: Primitive.Parameter, y: Primitive.Parameter, tolerance: Tolerance) -> bool:
+        if math.isinf(x) or math.isinf(y):
+            return x == y
+
+        difference, magnitude = abs(float(x) - float(y)), abs(float(y))
+        result = Acceptance.compare(difference, magnitude, tolerance)
+        self.comparisons.append((difference, magnitude, result))
+
+        return result
+
+    def all_close(self, parameters: np.ndarray[Primitive.Parameter], value: Primitive.Parameter, tolerance: Tolerance, _features: Optional[SequenceFeatures] = None) -> bool:
+        # numpy.allclose against a single value, which is the mean of the parameters if their features are given
+        if len(parameters) == 0:
+            return True
+        if (_features.infinite if _features is not None else np.any(np.isinf(parameters))) or math.isinf(value):
+            self.replayable = False
+            return bool(np.allclose(parameters, value, rtol=tolerance.relative, atol=tolerance.absolute))
+
+        difference = _features.deviation if _features is not None else float(np.max(np.abs(parameters - value)))
+        magnitude = abs(float(value))
+        result = Acceptance.compare(difference, magnitude, tolerance)
+        self.comparisons.append((difference, magnitude, result))
+
+        return result
+
+    def all_close_to(self, parameters: np.ndarray[Primitive.Parameter], values: np.ndarray[Primitive.Parameter], tolerance: Tolerance) -> bool:
+        # numpy.allclose against values. A comparison with a larger difference and a smaller magnitude than another one is
+        # stricter under any tolerance, so only the comparisons that none is stricter than are made and kept.
+        if len(parameters) == 0:
+            return True
+
+        with np.errstate(invalid="ignore", over="ignore"):
+            differences, magnitudes = np.abs(parameters - values).astype(float), np.abs(values).astype(float)
+        if not np.all(np.isfinite(differences)) or not np.all(np.isfinite(magnitudes)):
+            self.replayable = False
+            return bool(np.allclose(parameters, values, rtol=tolerance.relative, atol=tolerance.absolute))
+
+        order = np.lexsort((-differences, magnitudes))
+        differences, magnitudes = differences[order], magnitudes[order]
+        strictest = differences > np.concatenate([[-1.0], np.maximum.accumulate(differences)[:-1]])
+
+        result = True
+        for difference, magnitude in zip(differences[strictest].tolist(), magnitudes[strictest].tolist()):
+            close = Acceptance.compare(difference, magnitude, tolerance)
+            self.comparisons.append((difference, magnitude, close))
+            result = result and close
+
+        return result
+
+    def all_same(self, parameters: np.ndarray[Primitive.Parameter], tolerance: Tolerance) -> bool:
+        # util.all_same
+        return all(self.equal(parameters[0], parameter, tolerance) for parameter in parameters)
+
+    def holds(self, tolerance: Tolerance) -> bool:
+        return self.replayable and all(Acceptance.compare(difference, magnitude, tolerance) == result for difference, magnitude, result in self.comparisons)
+
+
+class SequenceFeatures:
+    """
+    Data derived from one array of parameters that several fitters need, each computed once when first asked for.
+
+    Pattern.search_parameters hands the same features to every pattern it fits to a list of parameters, so the mean,
+    differences and ratios are not computed again for every pattern. The numeric features are only asked for when the
+    parameters hold no strings.
+    """
+
+    def __init__(self, parameters: np.ndarray[Primitive.Parameter]):
+        self.parameters = parameters
+
+    @cached_property
+    def indices(self) -> np.ndarray[int]:
+        return np.arange(len(self.parameters))
+
+    @cached_property
+    def mean(self) -> Primitive.Parameter:
+        return np.mean(self.parameters)
+
+    @cached_property
+    def ptp(self) -> Primitive.Parameter:
+        return np.ptp(self.parameters)
+
+    @cached_property
+    def deviation(self) -> float:
+        # Largest distance to the mean, as Acceptance.all_close compares it
+        return float(np.max(np.abs(self.parameters - self.mean)))
+
+    @cached_property
+    def infinite(self) -> bool:
+        return bool(np.any(np.isinf(self.parameters)))
+
+    @cached_property
+    def zero(self) -> bool:
+        return bool(np.any(self.parameters == 0))
+
+    @cached_property
+    def differences(self) -> np.ndarray[Primitive.Parameter]:
+        return np.ediff1d(self.parameters)
+
+    @cached_property
+    def differences_features(self) -> SequenceFeatures:
+        return SequenceFeatures(self.differences)
+
+    @cached_property
+    def ratios(self) -> np.ndarray[Primitive.Parameter]:
+        return self.parameters[1:] / self.parameters[:-1]
+
+    def generate(self, operator: Type) -> np.ndarray[Primitive.Parameter]:
+        # Operator.generate on the parameters, reusing the differences and ratios
+        if operator is Operator.Min:
+            return self.differences
+        if operator is Operator.Div:
+            return self.ratios
+
+        return operator.generate(self.parameters)
+
+
 class ParameterPattern:
+    # Confidences are exp(-mse), so a perfect fit has confidence 1
+    maximum_confidence = 1.0
+    # Numeric parameters at least this long are fitted on a prefix first, see fit_coarse
+    coarse_length = 4096
+    coarse_prefix = 256
+    # Least squares fits try their values rounded to this many decimals first, which are exact for exact parameters
+    snap_decimals = 9
+    # Weight of fits below exact_confidence, for patterns that approximate rather than reproduce their parameters
+    approximate_weight: Optional[float] = None
+    exact_confidence = 1.0 - 1e-9
+
     def __init__(self, confidence: float, tolerance: Tolerance):
         self.confidence = confidence
         self.tolerance = tolerance
+
     @staticmethod
     @abstractmethod
     def name() -> str:
@@ -77,7 +225,58 @@ class ParameterPattern:
 
     @staticmethod
     @abstractmethod
-    def apply(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        # Estimated relative cost of apply, cheaper patterns are fitted first
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        # The pattern with unrounded values, as apply finds it before finishing it
+        pass
+
+    @abstractmethod
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        # A copy with rounded values, or None if it does not hold for the parameters once rounded
+        pass
+
+    @classmethod
+    def fit_coarse(cls, parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        # fit, but long numeric parameters are fitted on a prefix first. If the values of that pattern are all close to the
+        # parameters, it is taken with its confidence over all parameters, so fitting all of them is only needed when the
+        # pattern does not continue after the prefix. The acceptance holds the comparisons of both steps.
+        features = _features if _features is not None else SequenceFeatures(parameters)
+        if flags.has_str() or len(parameters) < ParameterPattern.coarse_length or features.infinite:
+            return cls.fit(parameters, flags, tolerance, _token=_token, _acceptance=_acceptance, _features=features)
+
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+        prefix = parameters[:ParameterPattern.coarse_prefix]
+        candidate = cls.fit(prefix, flags, tolerance, _token=_token, _acceptance=acceptance)
+        if candidate is not None:
+            with np.errstate(invalid="ignore", over="ignore"):
+                values = candidate.sequence(len(parameters))
+            if acceptance.all_close_to(parameters, values, tolerance):
+                candidate.confidence = ParameterPattern.calculate_confidence(parameters, values, tolerance, acceptance)
+                return candidate
+
+        return cls.fit(parameters, flags, tolerance, _token=_token, _acceptance=acceptance, _features=features)
+
+    @classmethod
+    def apply(cls, parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        pattern = cls.fit_coarse(parameters, flags, tolerance, _token=_token, _acceptance=_acceptance, _features=_features)
+
+        return pattern.finish(parameters, _round) if pattern is not None else None
+
+    def reproduces(self, parameters: np.ndarray[Primitive.Parameter]) -> bool:
+        # numpy.allclose of the parameters and the values of the pattern, under its tolerance
+        with np.errstate(invalid="ignore", over="ignore"):
+            values = self.sequence(len(parameters))
+
+        return bool(np.allclose(parameters.astype(float), values, rtol=self.tolerance.relative, atol=self.tolerance.absolute))
+
+    @abstractmethod
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        # The first count values, as fit compares them to the parameters, at once
         pass
 
     @abstractmethod
@@ -88,9 +287,19 @@ class ParameterPattern:
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         pass
 
+    def write_dsl(self, sink: TextIO, _confidence: bool = False, _tolerance: bool = False):
+        sink.write(self.dsl(_confidence, _tolerance))
+
     @staticmethod
-    def calculate_confidence(parameters: np.ndarray[Primitive.Parameter], true_parameters: np.array, tolerance: Tolerance):
+    def calculate_confidence(parameters: np.ndarray[Primitive.Parameter], true_parameters: np.array, tolerance: Tolerance, _acceptance: Optional[Acceptance] = None):
         mse = mean_squared_error(true_parameters, parameters)
+        if _acceptance is not None:
+            _acceptance.error = mse
+
+        return ParameterPattern.error_confidence(mse, tolerance)
+
+    @staticmethod
+    def error_confidence(mse: float, tolerance: Tolerance):
         normalized_mse = mse / (1.0 + tolerance.absolute)
         return np.exp(-normalized_mse)
 
@@ -104,10 +313,18 @@ class ParameterPattern:
 
         return parameter
 
+    @staticmethod
     @abstractmethod
-    def weight(self) -> float:
+    def weight() -> float:
         pass
 
+    def score(self) -> float:
+        # Ranks the fits of a search, weight() times the maximum confidence bounds it
+        if self.approximate_weight is not None and self.confidence < ParameterPattern.exact_confidence:
+            return min(self.weight(), self.approximate_weight) * self.confidence
+
+        return self.weight() * self.confidence
+
     def __eq__(self, other) -> bool:
         if isinstance(other, self.__class__):
             return self.__dict__ == other.__dict__
@@ -131,7 +348,7 @@ class ConstantPattern(ParameterPattern, metaclass=MPattern.ConstantPattern):
         return "{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            self.value,
+            util.format_number(self.value),
             default.tokens[default.parameter_pattern_end])
 
     def __repr__(self) -> str:
@@ -144,14 +361,15 @@ class ConstantPattern(ParameterPattern, metaclass=MPattern.ConstantPattern):
     def __hash__(self):
         return hash((self.name(), self.value))
 
-    def weight(self) -> float:
+    @staticmethod
+    def weight() -> float:
         return 1.8
 
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         return "{}{}{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            self.value,
+            util.format_number(self.value),
             "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
             "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
             default.tokens[default.parameter_pattern_end])
@@ -165,13 +383,19 @@ class ConstantPattern(ParameterPattern, metaclass=MPattern.ConstantPattern):
         return 1
 
     @staticmethod
-    def apply(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        return 1.0
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
         if flags.has_str():
             value = parameters[0]
             result = np.all(parameters == value)
         else:
-            value = np.mean(parameters)
-            result = np.allclose(parameters, value, rtol=tolerance.relative, atol=tolerance.absolute)
+            features = _features if _features is not None else SequenceFeatures(parameters)
+            value = features.mean
+            result = acceptance.all_close(parameters, value, tolerance, features)
 
         if not result:
             return None
@@ -180,9 +404,15 @@ class ConstantPattern(ParameterPattern, metaclass=MPattern.ConstantPattern):
             confidence = 1.0
         else:
             true_parameters = np.full(parameters.shape, value, dtype=flags.dtype)
-            confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance)
+            confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, acceptance)
 
-        return ConstantPattern(ParameterPattern.rounded(value, _round), confidence, tolerance)
+        return ConstantPattern(value, confidence, tolerance)
+
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        return ConstantPattern(ParameterPattern.rounded(self.value, _round), self.confidence, self.tolerance)
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return np.full(count, self.value)
 
     def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
         if start is None:
@@ -216,15 +446,16 @@ class LinearPattern(ParameterPattern, metaclass=MPattern.LinearPattern):
     def __hash__(self):
         return hash((self.name(), self.start, self.delta))
 
-    def weight(self) -> float:
+    @staticmethod
+    def weight() -> float:
         return 1.3
 
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         return "{}{}{}{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            self.start,
-            "{} {}".format(default.tokens[default.value_separator], self.delta),
+            util.format_number(self.start),
+            "{} {}".format(default.tokens[default.value_separator], util.format_number(self.delta)),
             "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
             "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
             default.tokens[default.parameter_pattern_end])
@@ -238,22 +469,34 @@ class LinearPattern(ParameterPattern, metaclass=MPattern.LinearPattern):
         return 2
 
     @staticmethod
-    def apply(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        return 1.0
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
         if flags.has_str():
             return None
 
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+        features = _features if _features is not None else SequenceFeatures(parameters)
         start = parameters[0]
-        difference = np.ediff1d(parameters)
-        value = np.mean(difference)
-        result = np.allclose(difference, value, atol=tolerance.absolute, rtol=tolerance.relative)
+        difference = features.differences
+        value = features.differences_features.mean
+        result = acceptance.all_close(difference, value, tolerance, features.differences_features)
 
         if not result:
             return None
 
-        true_parameters = np.array([start + i * value for i in range(len(parameters))])
-        confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance)
+        true_parameters = start + features.indices * value
+        confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, acceptance)
 
-        return LinearPattern(ParameterPattern.rounded(start, _round), ParameterPattern.rounded(value, _round), confidence, tolerance)
+        return LinearPattern(start, value, confidence, tolerance)
+
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        return LinearPattern(ParameterPattern.rounded(self.start, _round), ParameterPattern.rounded(self.delta, _round), self.confidence, self.tolerance)
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return self.start + np.arange(count) * self.delta
 
     def next(self, start: Primitive.Parameter, nth: int) -> Primitive.Parameter:
         if start is None:
@@ -270,7 +513,7 @@ class PeriodicPattern(ParameterPattern, metaclass=MPattern.PeriodicPattern):
     def __str__(self):
         return "{}{}".format(
             self.name(),
-            util.format_list(self.pattern, str, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
+            util.format_list(self.pattern, util.format_number, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
 
     def __repr__(self):
         return "{}[pattern={}, confidence={}, tolerance={}]".format(
@@ -282,14 +525,15 @@ class PeriodicPattern(ParameterPattern, metaclass=MPattern.PeriodicPattern):
     def __hash__(self):
         return hash((self.name(), tuple(self.pattern)))
 
-    def weight(self) -> float:
+    @staticmethod
+    def weight() -> float:
         return 1.2
 
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         return "{}{}{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            util.format_list(self.pattern, str, '', default.tokens[default.value_separator], ''),
+            util.format_list(self.pattern, util.format_number, '', default.tokens[default.value_separator], ''),
             "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
             "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
             default.tokens[default.parameter_pattern_end])
@@ -303,12 +547,18 @@ class PeriodicPattern(ParameterPattern, metaclass=MPattern.PeriodicPattern):
         return 2
 
     @staticmethod
-    def apply(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        return 2.0
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+
         def equal(x, y):
             if flags.has_str():
                 return x == y
             else:
-                return util.equal_tolerant(x, y, tolerance)
+                return acceptance.equal(x, y, tolerance)
 
         multiplicity = 1
         match_index = 0
@@ -336,9 +586,15 @@ class PeriodicPattern(ParameterPattern, metaclass=MPattern.PeriodicPattern):
         else:
             true_parameters = (pattern * (multiplicity + 1))[:len(parameters)]
 
-            confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance)
+            confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, acceptance)
+
+        return PeriodicPattern(pattern, confidence, tolerance)
 
-        return PeriodicPattern(ParameterPattern.rounded(pattern, _round), confidence, tolerance)
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        return PeriodicPattern(ParameterPattern.rounded(self.pattern, _round), self.confidence, self.tolerance)
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return np.array(self.pattern)[np.arange(count) % len(self.pattern)]
 
     def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
         if any(isinstance(i, str) for i in [start, *self.pattern]):
@@ -361,6 +617,14 @@ class Operator:
         def next(delta: Primitive.Parameter, parameter: Primitive.Parameter) -> Primitive.Parameter:
             return delta - parameter
 
+        @staticmethod
+        def accumulate(first: Primitive.Parameter, deltas: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
+            # Every next at once: the alternating sum of the deltas
+            signs = np.where(np.arange(len(deltas)) % 2 == 0, -1, 1)
+            values = np.concatenate([[first], first + np.cumsum(signs * deltas)])
+
+            return values * np.where(np.arange(len(values)) % 2 == 0, 1, -1)
+
     class Min(object, metaclass=MOperator.Min):
         @staticmethod
         def generate(parameters: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
@@ -370,6 +634,10 @@ class Operator:
         def next(delta: Primitive.Parameter, parameter: Primitive.Parameter) -> np.ndarray[Primitive.Parameter]:
             return delta + parameter
 
+        @staticmethod
+        def accumulate(first: Primitive.Parameter, deltas: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
+            return np.concatenate([[first], first + np.cumsum(deltas)])
+
     class Mul(object, metaclass=MOperator.Mul):
         @staticmethod
         def generate(parameters: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
@@ -379,6 +647,19 @@ class Operator:
         def next(delta: Primitive.Parameter, parameter: Primitive.Parameter) -> Primitive.Parameter:
             return delta / parameter
 
+        @staticmethod
+        def accumulate(first: Primitive.Parameter, deltas: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
+            # Every other value is the one before it times a ratio of consecutive deltas
+            values = np.empty(len(deltas) + 1)
+            values[0] = first
+            if len(deltas) > 0:
+                values[1] = deltas[0] / first
+            even, odd = deltas[1::2] / deltas[0::2][:len(deltas[1::2])], deltas[2::2] / deltas[1::2][:len(deltas[2::2])]
+            values[2::2] = values[0] * np.cumprod(even)
+            values[3::2] = values[1] * np.cumprod(odd) if len(deltas) > 0 else []
+
+            return values
+
     class Div(object, metaclass=MOperator.Div):
         @staticmethod
         def generate(parameters: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
@@ -388,6 +669,10 @@ class Operator:
         def next(delta: Primitive.Parameter, parameter: Primitive.Parameter) -> np.ndarray[Primitive.Parameter]:
             return delta * parameter
 
+        @staticmethod
+        def accumulate(first: Primitive.Parameter, deltas: np.ndarray[Primitive.Parameter]) -> np.ndarray[Primitive.Parameter]:
+            return np.concatenate([[first], first * np.cumprod(deltas)])
+
     Operators = List[Union[Plus, Min, Mul, Div]]
 
 
@@ -404,7 +689,7 @@ class BFSOperatorPattern(ParameterPattern, metaclass=MPattern.OperatorPattern):
     def __str__(self) -> str:
         return "{}{}".format(
             self.name(),
-            util.format_list(self.operators + self.values, str, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
+            util.format_list(self.operators + self.values, util.format_number, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
 
     def __repr__(self) -> str:
         return "{}[type=BFS, operators={}, values={}, confidence={}, tolerance={}]".format(
@@ -417,14 +702,15 @@ class BFSOperatorPattern(ParameterPattern, metaclass=MPattern.OperatorPattern):
     def __hash__(self):
         return hash((self.name(), tuple(self.values), tuple(self.operators)))
 
-    def weight(self) -> float:
+    @staticmethod
+    def weight() -> float:
         return 1.1
 
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         return "{}{}{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            util.format_list(self.operators + self.values, str, '', default.tokens[default.value_separator], ''),
+            util.format_list(self.operators + self.values, util.format_number, '', default.tokens[default.value_separator], ''),
             "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
             "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
             default.tokens[default.parameter_pattern_end])
@@ -438,29 +724,15 @@ class BFSOperatorPattern(ParameterPattern, metaclass=MPattern.OperatorPattern):
         return 3
 
     @staticmethod
-    def apply(original_parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        return 20.0
+
+    @staticmethod
+    def fit(original_parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
         if flags.has_str():
             return None
-
-        def validate(pattern: BFSOperatorPattern) -> bool:
-            parameter_reference = original_parameters
-            parameter_min = parameter_reference.min(initial=0)
-            parameter_max = parameter_reference.max(initial=0)
-            n_start = len(parameter_reference)
-            n_delta = 5
-            tol = 1.5
-            for extrapolation in range(n_start, n_start + n_delta):
-                parameter_range = parameter_max - parameter_min
-
-                parameter_next = pattern.next(parameter_reference[0], extrapolation)
-                if parameter_next - parameter_reference[-1] > tol * parameter_range:
-                    return False
-
-                parameter_min = min(parameter_min, parameter_next)
-                parameter_max = max(parameter_max, parameter_next)
-                parameter_reference = np.append(parameter_reference, parameter_next)
-
-            return True
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+        features = _features if _features is not None else SequenceFeatures(original_parameters)
 
         def expand_history(history, new_operator, new_parameter) -> Tuple[Operator.Operators, Primitive.Parameters]:
             if history is None:
@@ -476,31 +748,32 @@ class BFSOperatorPattern(ParameterPattern, metaclass=MPattern.OperatorPattern):
         queue = []
         init = True
         while len(queue) != 0 or init:
+            # The queue grows exponentially with the depth, so give up as soon as the budget runs out
+            if _token is not None and _token.expired:
+                _token.check()
+                return None
+
             if init:
                 init = False
                 history = None
                 new_parameters = original_parameters
             else:
                 operation, parameters, history = queue.pop(0)
-                new_parameters = operation.generate(parameters)
+                new_parameters = features.generate(operation) if parameters is original_parameters else operation.generate(parameters)
 
             if len(new_parameters) < 2:
                 continue
 
-            if util.all_same(new_parameters, tolerance):
-                confidence = ParameterPattern.calculate_confidence(new_parameters, np.full(new_parameters.shape, new_parameters[0], flags.dtype), tolerance)
+            if acceptance.all_same(new_parameters, tolerance):
+                confidence = ParameterPattern.calculate_confidence(new_parameters, np.full(new_parameters.shape, new_parameters[0], flags.dtype), tolerance, acceptance)
                 operators, values = expand_history(history, None, new_parameters[0])
 
-                pattern = BFSOperatorPattern(operators, ParameterPattern.rounded(values, _round), confidence, tolerance)
-                if not validate(pattern):
-                    return None
-
-                return pattern
+                return BFSOperatorPattern(operators, values, confidence, tolerance)
 
             if len(new_parameters) == 2:
                 continue
 
-            if any(new_parameter == 0 for new_parameter in new_parameters):
+            if features.zero if new_parameters is original_parameters else any(new_parameter == 0 for new_parameter in new_parameters):
                 operations = BFSOperatorPattern.zero_safe_operations
             else:
                 operations = BFSOperatorPattern.zero_unsafe_operations
@@ -510,6 +783,40 @@ class BFSOperatorPattern(ParameterPattern, metaclass=MPattern.OperatorPattern):
 
         return None
 
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        pattern = BFSOperatorPattern(self.operators, ParameterPattern.rounded(self.values, _round), self.confidence, self.tolerance)
+
+        return pattern if BFSOperatorPattern.validate(pattern, parameters) else None
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        # The constant last level, and every level above it from its first value and the level below
+        values = np.full(max(count - len(self.operators), 0), self.values[-1], dtype=float)
+        for level in reversed(range(len(self.operators))):
+            values = self.operators[level].accumulate(self.values[level], values[:max(count - level - 1, 0)])
+
+        return values[:count]
+
+    @staticmethod
+    def validate(pattern: BFSOperatorPattern, original_parameters: np.ndarray[Primitive.Parameter]) -> bool:
+        parameter_reference = original_parameters
+        parameter_min = parameter_reference.min(initial=0)
+        parameter_max = parameter_reference.max(initial=0)
+        n_start = len(parameter_reference)
+        n_delta = 5
+        tol = 1.5
+        for extrapolation in range(n_start, n_start + n_delta):
+            parameter_range = parameter_max - parameter_min
+
+            parameter_next = pattern.next(parameter_reference[0], extrapolation)
+            if parameter_next - parameter_reference[-1] > tol * parameter_range:
+                return False
+
+            parameter_min = min(parameter_min, parameter_next)
+            parameter_max = max(parameter_max, parameter_next)
+            parameter_reference = np.append(parameter_reference, parameter_next)
+
+        return True
+
     def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
         # if nth < len(self._cache):
         #     return self._cache[nth]
@@ -540,7 +847,7 @@ class SinusoidalPattern(ParameterPattern, metaclass=MPattern.SinusoidalPattern):
     def __str__(self) -> str:
         return "{}{}".format(
             self.name(),
-            util.format_list([self.amplitude, self.frequency, self.phase, self.mean], str, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
+            util.format_list([self.amplitude, self.frequency, self.phase, self.mean], util.format_number, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
 
     def __repr__(self) -> str:
         return "{}[amp={}, freq={}, phase={}, mean={}, confidence={}, tolerance={}]".format(
@@ -555,14 +862,15 @@ class SinusoidalPattern(ParameterPattern, metaclass=MPattern.SinusoidalPattern):
     def __hash__(self):
         return hash((self.name(), self.amplitude, self.frequency, self.phase, self.mean))
 
-    def weight(self) -> float:
+    @staticmethod
+    def weight() -> float:
         return 1.0
 
     def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
         return "{}{}{}{}{}{}".format(
             self.name(),
             default.tokens[default.parameter_pattern_begin],
-            util.format_list([self.amplitude, self.frequency, self.phase, self.mean], str, '', default.tokens[default.value_separator], ''),
+            util.format_list([self.amplitude, self.frequency, self.phase, self.mean], util.format_number, '', default.tokens[default.value_separator], ''),
             "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
             "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
             default.tokens[default.parameter_pattern_end])
@@ -576,22 +884,44 @@ class SinusoidalPattern(ParameterPattern, metaclass=MPattern.SinusoidalPattern):
         return 4
 
     @staticmethod
-    def apply(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _round: Optional[int] = None) -> Optional[ParameterPattern]:
+    def cost() -> float:
+        return 10.0
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
         if flags.has_str():
             return None
 
-        t = np.array(range(len(parameters)))
+        features = _features if _features is not None else SequenceFeatures(parameters)
+        t = features.indices
 
-        guess_mean = np.mean(parameters)
+        guess_mean = features.mean
         guess_phase = 0
         guess_freq = 1
         guess_amp = 1
-        est_amp, est_freq, est_phase, est_mean = leastsq(lambda x: x[0] * np.sin(x[1] * t + x[2]) + x[3] - parameters, np.array([guess_amp, guess_freq, guess_phase, guess_mean]))[0]
+
+        def residuals(x):
+            if _token is not None and _token.expired:
+                raise util.Cancelled()
+
+            return x[0] * np.sin(x[1] * t + x[2]) + x[3] - parameters
+
+        try:
+            est_amp, est_freq, est_phase, est_mean = leastsq(residuals, np.array([guess_amp, guess_freq, guess_phase, guess_mean]))[0]
+        except util.Cancelled:
+            _token.check()
+            return None
         true_sine = lambda x : est_amp * np.sin(est_freq * x + est_phase) + est_mean
         true_parameters = true_sine(t)
-        confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance)
+        confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, _acceptance)
+
+        return SinusoidalPattern(est_amp, est_freq, est_phase, est_mean, confidence, tolerance)
+
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        return SinusoidalPattern(ParameterPattern.rounded(self.amplitude, _round), ParameterPattern.rounded(self.frequency, _round), ParameterPattern.rounded(self.phase, _round), ParameterPattern.rounded(self.mean, _round), self.confidence, self.tolerance)
 
-        return SinusoidalPattern(ParameterPattern.rounded(est_amp, _round), ParameterPattern.rounded(est_freq, _round), ParameterPattern.rounded(est_phase, _round), ParameterPattern.rounded(est_mean, _round), confidence, tolerance)
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return self.amplitude * np.sin(self.frequency * np.arange(count) + self.phase) + self.mean
 
     def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
         if start is None:
@@ -600,6 +930,207 @@ class SinusoidalPattern(ParameterPattern, metaclass=MPattern.SinusoidalPattern):
         return start + self.amplitude * math.sin(self.frequency * nth + self.phase) + self.mean
 
 
+class PolynomialPattern(ParameterPattern, metaclass=MPattern.PolynomialPattern):
+    degrees = [2, 3]
+    # A least squares polynomial comes close to most short lists, only exact ones outrank periodic and operator patterns
+    approximate_weight = 1.05
+
+    def __init__(self, coefficients: Primitive.Parameters, confidence: float = default.confidence, tolerance: Tolerance = default.tolerance):
+        super(PolynomialPattern, self).__init__(confidence, tolerance)
+        # Lowest order first, the polynomial is evaluated at the index of every parameter
+        self.coefficients: Primitive.Parameters = coefficients
+
+    def __str__(self) -> str:
+        return "{}{}".format(
+            self.name(),
+            util.format_list(self.coefficients, util.format_number, default.tokens[default.parameter_pattern_begin], default.tokens[default.value_separator], default.tokens[default.parameter_pattern_end]))
+
+    def __repr__(self) -> str:
+        return "{}[coefficients={}, confidence={}, tolerance={}]".format(
+            self.name(),
+            self.coefficients,
+            self.confidence,
+            self.tolerance)
+
+    def __hash__(self):
+        return hash((self.name(), tuple(self.coefficients)))
+
+    @staticmethod
+    def weight() -> float:
+        return 1.25
+
+    def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
+        return "{}{}{}{}{}{}".format(
+            self.name(),
+            default.tokens[default.parameter_pattern_begin],
+            util.format_list(self.coefficients, util.format_number, '', default.tokens[default.value_separator], ''),
+            "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
+            "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
+            default.tokens[default.parameter_pattern_end])
+
+    @staticmethod
+    def name() -> str:
+        return "poly"
+
+    @staticmethod
+    def minimum_parameters() -> int:
+        # One more than the coefficients of the lowest degree, so that a fit is not exact by construction
+        return PolynomialPattern.degrees[0] + 2
+
+    @staticmethod
+    def cost() -> float:
+        return 1.8
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        if flags.has_str():
+            return None
+
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+        features = _features if _features is not None else SequenceFeatures(parameters)
+        if features.infinite:
+            return None
+
+        # Least squares on the Vandermonde matrix of the indices, lowest degree that is close enough
+        for degree in PolynomialPattern.degrees:
+            if len(parameters) < degree + 2:
+                break
+
+            fitted = np.polynomial.polynomial.polyfit(features.indices, parameters.astype(float), degree)
+            for coefficients in [np.round(fitted, ParameterPattern.snap_decimals) + 0.0, fitted]:
+                true_parameters = np.polynomial.polynomial.polyval(features.indices, coefficients)
+                if acceptance.all_close_to(parameters, true_parameters, tolerance):
+                    confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, acceptance)
+
+                    return PolynomialPattern(coefficients.tolist(), confidence, tolerance)
+
+        return None
+
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        # Rounding higher order coefficients moves the values further with every index, so they stay unrounded if the
+        # rounded polynomial no longer reproduces the parameters
+        pattern = PolynomialPattern(ParameterPattern.rounded(self.coefficients, _round), self.confidence, self.tolerance)
+
+        return pattern if pattern.reproduces(parameters) else PolynomialPattern(self.coefficients, self.confidence, self.tolerance)
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return np.polynomial.polynomial.polyval(np.arange(count), self.coefficients)
+
+    def value(self, nth: int) -> Primitive.Parameter:
+        result = 0
+        for coefficient in reversed(self.coefficients):
+            result = result * nth + coefficient
+
+        return result
+
+    def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
+        if start is None:
+            return self.value(nth)
+
+        return start + self.value(nth) - self.value(0)
+
+
+class GeometricPattern(ParameterPattern, metaclass=MPattern.GeometricPattern):
+    # Like a polynomial, a line through the log magnitudes only outranks periodic and operator patterns when it is exact
+    approximate_weight = 1.05
+
+    def __init__(self, start: Primitive.Parameter, ratio: Primitive.Parameter, confidence: float = default.confidence, tolerance: Tolerance = default.tolerance):
+        super(GeometricPattern, self).__init__(confidence, tolerance)
+        self.start: Primitive.Parameter = start
+        self.ratio: Primitive.Parameter = ratio
+
+    def __str__(self) -> str:
+        return "{}{}{}{}{}".format(
+            self.name(),
+            default.tokens[default.parameter_pattern_begin],
+            util.format_number(self.start),
+            "{} {}".format(default.tokens[default.value_separator], util.format_number(self.ratio)),
+            default.tokens[default.parameter_pattern_end])
+
+    def __repr__(self) -> str:
+        return "{}[start={}, ratio={}, confidence={}, tolerance={}]".format(
+            self.name(),
+            self.start,
+            self.ratio,
+            self.confidence,
+            self.tolerance)
+
+    def __hash__(self):
+        return hash((self.name(), self.start, self.ratio))
+
+    @staticmethod
+    def weight() -> float:
+        return 1.27
+
+    def dsl(self, _confidence: bool = False, _tolerance: bool = False) -> str:
+        return "{}{}{}{}{}{}{}".format(
+            self.name(),
+            default.tokens[default.parameter_pattern_begin],
+            util.format_number(self.start),
+            "{} {}".format(default.tokens[default.value_separator], util.format_number(self.ratio)),
+            "{} {}".format(default.tokens[default.value_separator], self.confidence) if _confidence else "",
+            "{} {}".format(default.tokens[default.value_separator], self.tolerance) if _tolerance else "",
+            default.tokens[default.parameter_pattern_end])
+
+    @staticmethod
+    def name() -> str:
+        return "geo"
+
+    @staticmethod
+    def minimum_parameters() -> int:
+        return 3
+
+    @staticmethod
+    def cost() -> float:
+        return 1.5
+
+    @staticmethod
+    def fit(parameters: np.ndarray[Primitive.Parameter], flags: ParameterFlags, tolerance: Tolerance = default.tolerance, _token: Optional[util.CancellationToken] = None, _acceptance: Optional[Acceptance] = None, _features: Optional[SequenceFeatures] = None) -> Optional[ParameterPattern]:
+        if flags.has_str():
+            return None
+
+        acceptance = _acceptance if _acceptance is not None else Acceptance()
+        features = _features if _features is not None else SequenceFeatures(parameters)
+        if features.zero or features.infinite:
+            return None
+
+        # Signs are all the same or alternate, the magnitudes grow log-linearly
+        signs = np.sign(parameters)
+        if np.all(signs == signs[0]):
+            sign = 1.0
+        elif np.all(signs[1:] == -signs[:-1]):
+            sign = -1.0
+        else:
+            return None
+
+        intercept, slope = np.polynomial.polynomial.polyfit(features.indices, np.log(np.abs(parameters.astype(float))), 1)
+        fitted = np.array([signs[0] * np.exp(intercept), sign * np.exp(slope)])
+        for start, ratio in [(np.round(fitted, ParameterPattern.snap_decimals) + 0.0).tolist(), fitted.tolist()]:
+            with np.errstate(over="ignore"):
+                true_parameters = start * ratio ** features.indices
+            if acceptance.all_close_to(parameters, true_parameters, tolerance):
+                confidence = ParameterPattern.calculate_confidence(parameters, true_parameters, tolerance, acceptance)
+
+                return GeometricPattern(start, ratio, confidence, tolerance)
+
+        return None
+
+    def finish(self, parameters: np.ndarray[Primitive.Parameter], _round: Optional[int] = None) -> Optional[ParameterPattern]:
+        # A rounded ratio compounds with every index, so the values stay unrounded if they no longer reproduce the parameters
+        pattern = GeometricPattern(ParameterPattern.rounded(self.start, _round), ParameterPattern.rounded(self.ratio, _round), self.confidence, self.tolerance)
+
+        return pattern if pattern.reproduces(parameters) else GeometricPattern(self.start, self.ratio, self.confidence, self.tolerance)
+
+    def sequence(self, count: int) -> np.ndarray[Primitive.Parameter]:
+        return self.start * self.ratio ** np.arange(count)
+
+    def next(self, start: Optional[Primitive.Parameter], nth: int) -> Primitive.Parameter:
+        if start is None:
+            return self.start * self.ratio ** nth
+
+        return start + self.start * self.ratio ** nth - self.start
+
+
 # class ILPPattern:
 #     def __init__(self):
 #         pass
@@ -0,0 +1,77 @@
+from __future__ import annotations
+from typing import *
+import json
+import os
+import threading
+
+from pattern.patterns import ParameterPattern
+
+
+class PatternStatistics:
+    """
+    Number of times every parameter pattern won the search, per kind of selector and length of the parameters.
+
+    Pattern.search_parameters fits the patterns that won most often first. Together with skipping the fits that cannot
+    outrank the best one, the usual winner is often the only pattern fitted. The result of the search does not depend on
+    the statistics, only its speed does. The statistics are kept as JSON, so they carry over to the next session.
+    """
+    # Upper bounds of the length buckets, longer parameter lists share the last bucket
+    buckets = [3, 4, 8, 16, 64, 256]
+
+    def __init__(self, path: Optional[str] = None):
+        self.path: Optional[str] = path
+        self.wins: Dict[str, Dict[str, int]] = dict()
+        self.changed: bool = False
+        # Recorded from the search worker and saved from the interface
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            try:
+                self.load()
+            except (ValueError, AttributeError, TypeError, OSError):
+                # Unreadable statistics only make the search slower
+                self.wins = dict()
+
+    @staticmethod
+    def key(kind: str, length: int) -> str:
+        bucket = next((str(bound) for bound in PatternStatistics.buckets if length <= bound), "more")
+
+        return "{}:{}".format(kind, bucket)
+
+    def record(self, kind: str, length: int, pattern: ParameterPattern):
+        key = PatternStatistics.key(kind, length)
+        with self._lock:
+            wins = self.wins.setdefault(key, dict())
+            wins[pattern.name()] = wins.get(pattern.name(), 0) + 1
+            self.changed = True
+
+    def order(self, kind: str, length: int, available_patterns: List[ParameterPattern]) -> List[ParameterPattern]:
+        # Most likely winners first, cheapest first among patterns that won equally often
+        with self._lock:
+            wins = dict(self.wins.get(PatternStatistics.key(kind, length), dict()))
+
+        return sorted(available_patterns, key=lambda pattern: (-wins.get(pattern.name(), 0), pattern.cost()))
+
+    def load(self):
+        with open(self.path, "r") as file:
+            wins = json.load(file)
+
+        with self._lock:
+            self.wins = { key: { name: int(count) for name, count in counts.items() } for key, counts in wins.items() }
+            self.changed = False
+
+    def save(self):
+        if self.path is None:
+            return
+
+        with self._lock:
+            if not self.changed:
+                return
+            wins = { key: dict(counts) for key, counts in self.wins.items() }
+            self.changed = False
+
+        directory = os.path.dirname(self.path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as file:
+            json.dump(wins, file, indent=4, sort_keys=True)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from typing import *
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import sys
+
+import numpy as np
+
+from gui.primitives import PrimitiveGroup, Primitive
+from misc.util import CancellationToken, ReferenceFactory, Tolerance
+from parsing.binary_scene import BinaryScene
+from parsing.primitive_parser import PrimitiveParser
+from pattern.fits import FitCache
+from pattern.pattern import InstancePattern, ParameterPattern, Pattern, PrimitivePattern
+from pattern.patterns import BFSOperatorPattern, ConstantPattern, GeometricPattern, LinearPattern, PeriodicPattern, PolynomialPattern, SinusoidalPattern
+
+
+class ToleranceTuner:
+    """
+    Searches a tree under every combination of a grid of absolute and relative tolerances, and keeps the settings whose
+    patterns are Pareto optimal in description length and reconstruction error.
+
+    The description length is the length of the DSL of the found patterns, the reconstruction error is the mean squared
+    difference between the parameters of the input and of the primitives the patterns generate for the same sizes.
+    Missing, extra or differently shaped primitives count as far off as the extent of the input parameters. The grid
+    points are searched on a pool of threads that share one FitCache.Store, so most grid points only accept, rank and
+    round fits that another grid point already made. Because of the interpreter lock, the pool mostly saves the fits,
+    not the time spent in Python.
+
+    The editor runs it on its search worker and applies the selected tolerance, batch jobs run it over scene files:
+    python -m pattern.tuning scene.txt scene.gxs ...
+    """
+
+    absolutes = [0.0, 0.01, 0.05, 0.1]
+    relatives = [0.0, 0.01, 0.05, 0.1, 0.2]
+
+    class Point:
+        def __init__(self, tolerance: Tolerance, pattern: InstancePattern, length: int, error: float):
+            self.tolerance = tolerance
+            self.pattern = pattern
+            self.length = length
+            self.error = error
+
+        def dominates(self, other: ToleranceTuner.Point) -> bool:
+            return self.length <= other.length and self.error <= other.error and (self.length < other.length or self.error < other.error)
+
+    def __init__(self, _workers: Optional[int] = None):
+        self.workers = _workers
+        self.fits: FitCache.Store = FitCache.Store()
+        # Fits made and skipped over all grid points
+        self.report: Pattern.Report = Pattern.Report()
+
+    def tune(self, root: PrimitiveGroup, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], available_patterns: List[ParameterPattern], _absolutes: Optional[List[float]] = None, _relatives: Optional[List[float]] = None, _round: Optional[int] = None, _size_pattern: bool = True, _token: Optional[CancellationToken] = None) -> List[ToleranceTuner.Point]:
+        # Pareto optimal grid points, shortest description first
+        absolutes = ToleranceTuner.absolutes if _absolutes is None else _absolutes
+        relatives = ToleranceTuner.relatives if _relatives is None else _relatives
+        tolerances = [Tolerance(absolute, relative) for absolute, relative in itertools.product(absolutes, relatives)]
+
+        # Geometry is read before the threads start, they only read the tree
+        root.bounds()
+        primitives = ToleranceTuner.primitives(root)
+
+        def evaluate(tolerance: Tolerance) -> Tuple[Optional[ToleranceTuner.Point], Pattern.Report]:
+            report = Pattern.Report()
+            pattern = Pattern.search_group_recursive(root, named_primitives, available_patterns, tolerance, ReferenceFactory(), _round, _size_pattern, _token, _report=report, _fits=self.fits)
+            if pattern is None:
+                return None, report
+
+            return ToleranceTuner.Point(tolerance, pattern, len(pattern.dsl()), ToleranceTuner.error(root, primitives, pattern, named_primitives)), report
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            results = list(pool.map(evaluate, tolerances))
+
+        points = []
+        for point, report in results:
+            self.report.fits += report.fits
+            self.report.skipped += report.skipped
+            self.report.reused += report.reused
+            if point is not None:
+                points.append(point)
+
+        return ToleranceTuner.front(points)
+
+    def tune_file(self, path: str, available_patterns: List[ParameterPattern], _round: Optional[int] = None, _size_pattern: bool = True) -> Optional[ToleranceTuner.Point]:
+        # Selected grid point for a text or binary scene, whose undeclared primitives select all parameters as in the editor
+        if path.endswith(BinaryScene.extension):
+            scene = BinaryScene(path)
+            root, named_primitives = scene.group(ReferenceFactory()), scene.named_primitives()
+        else:
+            with open(path, "r") as file:
+                root, named_primitives = PrimitiveParser(file.read()).parse(ReferenceFactory())
+        for signature in root.signatures():
+            named_primitives.setdefault(signature, list(range(signature[1])))
+
+        return ToleranceTuner.select(self.tune(root, named_primitives, available_patterns, _round=_round, _size_pattern=_size_pattern))
+
+    @staticmethod
+    def front(points: List[ToleranceTuner.Point]) -> List[ToleranceTuner.Point]:
+        # Of points with the same length and error, the first one in grid order is kept
+        front = []
+        for index, point in enumerate(points):
+            if any(other.dominates(point) for other in points):
+                continue
+            if any((other.length, other.error) == (point.length, point.error) for other in points[:index]):
+                continue
+            front.append(point)
+
+        return sorted(front, key=lambda point: (point.length, point.error))
+
+    @staticmethod
+    def select(front: List[ToleranceTuner.Point]) -> Optional[ToleranceTuner.Point]:
+        # Point of the front closest to the ideal of its shortest length and its lowest error, both scaled to the front,
+        # the more accurate one of equally close points
+        if len(front) == 0:
+            return None
+
+        lengths = np.array([point.length for point in front], dtype=np.float64)
+        errors = np.array([point.error for point in front], dtype=np.float64)
+        lengths = (lengths - lengths.min()) / max(np.ptp(lengths), 1.0)
+        errors = (errors - errors.min()) / np.ptp(errors) if np.ptp(errors) > 0 else np.zeros(len(errors))
+
+        distances = lengths ** 2 + errors ** 2
+
+        return min(zip(distances, errors, front), key=lambda candidate: candidate[:2])[2]
+
+    @staticmethod
+    def primitives(group: PrimitiveGroup) -> List[Primitive]:
+        result = []
+        for instance in group:
+            if isinstance(instance, PrimitiveGroup):
+                result += ToleranceTuner.primitives(instance)
+            else:
+                result.append(instance)
+
+        return result
+
+    @staticmethod
+    def error(root: PrimitiveGroup, primitives: List[Primitive], pattern: InstancePattern, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors]) -> float:
+        # The sizes of the input are reproduced by extrapolating the root once and every level below by its size pattern
+        generated = Pattern.next([root.master], pattern, named_primitives, [len(root)] + [1] * (pattern.level - 1))
+
+        numbers = [float(parameter) for primitive in primitives for parameter in primitive if not isinstance(parameter, str)]
+        penalty = np.ptp(numbers) ** 2 if len(numbers) > 0 else 1.0
+
+        errors = []
+        for expected, found in itertools.zip_longest(primitives, generated):
+            if expected is None or found is None or expected.name != found.name or expected.arity != found.arity:
+                errors += [penalty] * (expected.arity if expected is not None else found.arity)
+                continue
+
+            for a, b in zip(expected, found):
+                if isinstance(a, str) or isinstance(b, str):
+                    errors.append(0.0 if a == b else penalty)
+                else:
+                    errors.append((float(a) - float(b)) ** 2)
+
+        return float(np.mean(errors)) if len(errors) > 0 else 0.0
+
+
+if __name__ == '__main__':
+    # Same patterns and rounding as the editor starts with
+    patterns = [ConstantPattern, LinearPattern, PolynomialPattern, GeometricPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+    tuner = ToleranceTuner()
+    for path in sys.argv[1:]:
+        point = tuner.tune_file(path, patterns, _round=1)
+        if point is None:
+            print("{}: no patterns found".format(path))
+        else:
+            print("{}: Tolerance({}, {}) {}".format(path, point.tolerance.absolute, point.tolerance.relative, point.pattern.dsl()))
@@ -0,0 +1,243 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+import imgui
+
+from gui.graphics import Bounds, Point
+from pattern.extrapolation import Extrapolation
+from pattern.pattern import *
+
+
+class VirtualPrimitiveGroup(PrimitiveGroup):
+    """
+    Read only output of Pattern.next that is generated on demand instead of being stored.
+
+    The output is split in chunks of chunk_size consecutive primitives. A chunk is generated directly from its first
+    index, without the primitives before it, and the last max_chunks chunks that were used are kept. The bounds and
+    color of a chunk are remembered after it was evicted, so rendering only generates chunks in the viewport and draws
+    chunks too small to matter as a single box. The bounds of the whole output start out as those of the first and last
+    chunks, which is exact for outputs that move steadily, and grow as chunks outside them become known.
+    """
+    chunk_size = 256
+    max_chunks = 64
+    # Chunks without known bounds generated per render, so zooming out over millions of primitives stays interactive
+    max_discoveries = 16
+    chunk_pixels = 4.0
+
+    def __init__(self, identifier: ReferenceFactory.Reference, start: Primitive, pattern: InstancePattern, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], extrapolations: List[int], reference_factory: Optional[ReferenceFactory] = None):
+        super(VirtualPrimitiveGroup, self).__init__(identifier)
+        assert pattern.level == len(extrapolations)
+
+        self.start: Primitive = start
+        self.start_version: int = start.version
+        self.pattern: InstancePattern = pattern
+        self.named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors] = dict(named_primitives)
+        self.extrapolations: List[int] = list(extrapolations)
+        self.reference_factory: ReferenceFactory = reference_factory if reference_factory is not None else ReferenceFactory()
+
+        # Cumulative output sizes of the children of a group pattern per pattern and extrapolations
+        self._prefixes: Dict[Tuple[int, Tuple[int, ...]], List[int]] = dict()
+        self._size: int = self.size(pattern, self.extrapolations)
+        self._chunks: OrderedDict[int, List[Optional[Primitive]]] = OrderedDict()
+        self._chunk_bounds: Dict[int, Optional[Bounds]] = dict()
+        self._chunk_colors: Dict[int, Tuple[float, float, float, float]] = dict()
+        self._arity = self._size
+
+    def __str__(self) -> str:
+        return "{}[{}]".format(self.__class__.__name__, self._size)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, item: int) -> Optional[Primitive]:
+        if item < 0:
+            item += self._size
+        if not 0 <= item < self._size:
+            raise IndexError(item)
+
+        return self.chunk(item // self.chunk_size)[item % self.chunk_size]
+
+    def __iter__(self):
+        for chunk in range(self.chunk_count()):
+            for primitive in self.chunk(chunk):
+                if primitive is not None:
+                    yield primitive
+
+    @property
+    def master(self) -> Optional[Primitive]:
+        return self[0] if self._size > 0 else None
+
+    @master.setter
+    def master(self, value):
+        pass
+
+    def generates(self, start: Primitive, pattern: InstancePattern, named_primitives: Dict[Tuple[str, int], PrimitivePattern.Selectors], extrapolations: List[int]) -> bool:
+        # Whether this is the output for these arguments, so that its chunks can be kept. A search that found the same
+        # patterns again returns new objects, so patterns are compared by their DSL.
+        same_pattern = self.pattern is pattern or self.pattern.dsl() == pattern.dsl()
+
+        return self.start is start and self.start_version == start.version and same_pattern and self.named_primitives == named_primitives and self.extrapolations == list(extrapolations)
+
+    def size(self, pattern: InstancePattern, extrapolations: List[int]) -> int:
+        if isinstance(pattern, NonePattern):
+            return 1
+        if isinstance(pattern, PrimitivePattern):
+            return extrapolations[0]
+        if isinstance(pattern, GroupPattern):
+            return self.prefix(pattern, extrapolations)[-1]
+
+        raise Exception()
+
+    def prefix(self, pattern: GroupPattern, extrapolations: List[int]) -> List[int]:
+        key = (id(pattern), tuple(extrapolations))
+        if key not in self._prefixes:
+            count = extrapolations[0] if pattern.intergroup_pattern is not None else 1
+            prefix = [0]
+            for index in range(count):
+                child = pattern[index % len(pattern.intragroup_patterns)]
+                prefix.append(prefix[-1] + self.size(child, Extrapolation.child_extrapolations(pattern, extrapolations, index)))
+            self._prefixes[key] = prefix
+
+        return self._prefixes[key]
+
+    def totals(self, pattern: PrimitivePattern, start: Primitive, nth: int) -> Dict[PrimitivePattern.Selector, int]:
+        # Selector counts of the first nth primitives, without generating them when every primitive has the same signature
+        if isinstance(pattern.patterns.get(default.name), ConstantPattern) and len(pattern.arities) == 1:
+            return { selector: nth for selector in self.named_primitives[pattern.next_signature(start, 0)] }
+
+        totals: Dict[PrimitivePattern.Selector, int] = dict()
+        for index in range(nth):
+            for selector in self.named_primitives[pattern.next_signature(start, index)]:
+                totals[selector] = totals.get(selector, 0) + 1
+
+        return totals
+
+    def generate(self, pattern: InstancePattern, start: Primitive, extrapolations: List[int], begin: int, end: int) -> List[Optional[Primitive]]:
+        # Primitives begin up to end of Pattern.next([start], pattern, ...), None where a primitive could not be built
+        if isinstance(pattern, NonePattern):
+            return [start.copy(self.reference_factory)] if begin <= 0 < end else []
+
+        if isinstance(pattern, PrimitivePattern):
+            end = min(end, extrapolations[0])
+            return pattern.next_range(start, begin, end, self.named_primitives, self.reference_factory, _totals=self.totals(pattern, start, begin))
+
+        if isinstance(pattern, GroupPattern):
+            prefix = self.prefix(pattern, extrapolations)
+            first = bisect_right(prefix, begin) - 1
+            last = min(bisect_left(prefix, end), len(prefix) - 1)
+            if pattern.intergroup_pattern is None:
+                starts = [start]
+            else:
+                starts = pattern.intergroup_pattern.next_range(start, first, last, self.named_primitives, self.reference_factory, _totals=self.totals(pattern.intergroup_pattern, start, first))
+
+            result = []
+            for index, child_start in zip(range(first, last), starts):
+                child_begin = max(begin - prefix[index], 0)
+                child_end = min(end, prefix[index + 1]) - prefix[index]
+                if child_start is None:
+                    result += [None] * (child_end - child_begin)
+                else:
+                    result += self.generate(pattern[index % len(pattern.intragroup_patterns)], child_start, Extrapolation.child_extrapolations(pattern, extrapolations, index), child_begin, child_end)
+
+            return result
+
+        raise Exception()
+
+    def chunk_count(self) -> int:
+        return (self._size + self.chunk_size - 1) // self.chunk_size
+
+    def chunk(self, index: int) -> List[Optional[Primitive]]:
+        if index in self._chunks:
+            self._chunks.move_to_end(index)
+            return self._chunks[index]
+
+        begin = index * self.chunk_size
+        primitives = self.generate(self.pattern, self.start, self.extrapolations, begin, min(begin + self.chunk_size, self._size))
+        for primitive in primitives:
+            if primitive is not None:
+                primitive.parent_group = self
+
+        self._chunks[index] = primitives
+        if len(self._chunks) > self.max_chunks:
+            _, evicted = self._chunks.popitem(last=False)
+            for primitive in evicted:
+                if primitive is not None:
+                    self.reference_factory.release(primitive.identifier)
+
+        bounds = None
+        for primitive in primitives:
+            if primitive is not None:
+                bounds = primitive.bounds() if bounds is None else bounds.expanded(primitive.bounds())
+        self._chunk_bounds[index] = bounds
+        if bounds is not None and self._bounds is not None and not (bounds.min in self._bounds and bounds.max in self._bounds):
+            self.invalidate()
+        first = next((primitive for primitive in primitives if primitive is not None), None)
+        self._chunk_colors[index] = first.color_rgba() if first is not None else (default.r, default.g, default.b, default.a)
+
+        return primitives
+
+    def chunk_bounds(self, index: int) -> Optional[Bounds]:
+        if index not in self._chunk_bounds:
+            self.chunk(index)
+
+        return self._chunk_bounds[index]
+
+    def window(self, begin: int, end: int) -> List[Primitive]:
+        begin, end = max(begin, 0), min(end, self._size)
+        result = []
+        for chunk in range(begin // self.chunk_size, (end + self.chunk_size - 1) // self.chunk_size):
+            offset = chunk * self.chunk_size
+            result += self.chunk(chunk)[max(begin - offset, 0):end - offset]
+
+        return [primitive for primitive in result if primitive is not None]
+
+    def window_dsl(self, begin: int, end: int) -> str:
+        return "\n".join(primitive.dsl() for primitive in self.window(begin, end))
+
+    def changed(self):
+        pass
+
+    def _calculate_position(self) -> Point:
+        bounds = self.bounds()
+
+        return Point(0, 0) if bounds is None else (bounds.min + bounds.max) / 2
+
+    def _calculate_bounds(self) -> Optional[Bounds]:
+        if self.chunk_count() > 0:
+            self.chunk_bounds(0)
+            self.chunk_bounds(self.chunk_count() - 1)
+
+        bounds = None
+        for chunk_bounds in self._chunk_bounds.values():
+            if chunk_bounds is not None:
+                bounds = chunk_bounds if bounds is None else bounds.expanded(chunk_bounds)
+
+        return bounds
+
+    def render_visible(self, draw_list: Any, offset: Point, scale: float, viewport: Optional[Bounds] = None):
+        discoveries = 0
+        detailed = 0
+        for chunk in range(self.chunk_count()):
+            if chunk not in self._chunk_bounds:
+                if discoveries >= self.max_discoveries:
+                    continue
+                discoveries += 1
+
+            bounds = self.chunk_bounds(chunk)
+            if bounds is None or viewport is not None and not viewport.intersects(bounds):
+                continue
+
+            # Chunks that are too small on screen, or beyond what the cache holds this frame, are drawn as one box
+            if max(bounds.width(), bounds.height()) * scale < self.chunk_pixels or detailed >= self.max_chunks:
+                r, g, b, a = self._chunk_colors[chunk]
+                draw_list.add_rect_filled(bounds.min.x * scale + offset.x, bounds.max.y * -scale + offset.y, bounds.max.x * scale + offset.x, bounds.min.y * -scale + offset.y, imgui.get_color_u32_rgba(r, g, b, a))
+                continue
+
+            detailed += 1
+            for primitive in self.chunk(chunk):
+                if primitive is not None and (viewport is None or viewport.intersects(primitive.bounds())):
+                    primitive.render(draw_list, offset, scale)
@@ -0,0 +1,98 @@
+from unittest import TestCase
+
+import imgui
+
+from gui.batch import ColorCache, DrawBatch
+from gui.canvas import Canvas
+from gui.graphics import Point
+from gui.primitives import *
+from tests.canvas_tests import DrawList
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        imgui.create_context()
+
+    def canvas(self) -> Canvas:
+        canvas = Canvas()
+        canvas.primitives = PrimitiveGroup(0,
+            Rect(1, 5, 0, 0, 10, 20, "c_ff000080"),
+            PrimitiveGroup(2, Line(3, 4, 0, 0, 10, -5), Vector(4, 5, 5, 5, 90, 10, "r")),
+            PrimitiveGroup(5, *[Circle(6 + index, 4, index * 20, 100, 5, 120) for index in range(5)]))
+        canvas.selected_group = 2
+        canvas.scale = 1.5
+
+        return canvas
+
+    def test_colors(self):
+        cache = ColorCache()
+        for value, factor in [("c_ff000080", 1.0), ("c_336699", 0.5), (120, 1.0), ("r", 0.5), (None, 1.0)]:
+            self.assertEqual(cache.get(value, factor), parse_color(value, factor) if value is not None else imgui.get_color_u32_rgba(default.r, default.g, default.b, default.a))
+        cache.get("c_336699", 0.5)
+        self.assertEqual(len(cache), 5)
+
+    def test_arrays(self):
+        batch = DrawBatch()
+        batch.update(self.canvas().primitives, 2)
+
+        self.assertEqual(batch.kinds.tolist(), [DrawBatch.RECT, DrawBatch.LINE, DrawBatch.LINE, DrawBatch.GROUP] + [DrawBatch.CIRCLE] * 5 + [DrawBatch.GROUP])
+        self.assertEqual(batch.geometry[0].tolist(), [-5, -10, 5, 10])
+        self.assertEqual(batch.geometry[4].tolist(), [0, 100, 5, 0])
+        self.assertEqual(len(batch.colors), 6)
+
+    def test_matches_immediate(self):
+        canvas = self.canvas()
+        immediate = DrawList()
+        canvas.render(immediate, Point(30, 40), batch=False)
+        batched = DrawList()
+        canvas.render(batched, Point(30, 40))
+
+        self.assertEqual(batched.calls, immediate.calls)
+
+    def test_rebuild(self):
+        canvas = self.canvas()
+        canvas.render(DrawList(), Point(0, 0))
+        canvas.render(DrawList(), Point(5, 0))
+        self.assertEqual(canvas.batch.builds, 1)
+
+        canvas.primitives[2][3].move(Point(1, 1))
+        canvas.render(DrawList(), Point(5, 0))
+        self.assertEqual(canvas.batch.builds, 2)
+        self.assertEqual(canvas.batch.geometry[7].tolist(), [61, 101, 5, 0])
+
+        canvas.selected_group = 5
+        canvas.render(DrawList(), Point(5, 0))
+        self.assertEqual(canvas.batch.builds, 3)
+
+    def test_level_of_detail(self):
+        canvas = self.canvas()
+        batch = DrawBatch()
+        batch.update(canvas.primitives, 2)
+
+        kinds = [kind for kind, _ in batch.commands(Point(0, 0), 1.5)]
+        self.assertEqual(kinds.count(DrawBatch.CIRCLE), 5)
+        self.assertEqual(batch.commands(Point(0, 0), 1.5)[4][1][4], Circle.segments(7.5))
+        self.assertEqual(Circle.segments(1000), Circle.max_segments)
+
+        # The rect becomes a point, both groups are under two pixels and collapse into boxes in the color of their first child
+        commands = batch.commands(Point(0, 0), 0.01)
+        self.assertEqual([kind for kind, _ in commands], [DrawBatch.POINT, DrawBatch.GROUP_FILL, DrawBatch.GROUP_FILL])
+        self.assertEqual(commands[2][1][4], batch.color[4])
+
+        commands = batch.commands(Point(0, 0), 0.2)
+        self.assertEqual([kind for kind, _ in commands][4:], [DrawBatch.CIRCLE] * 5 + [DrawBatch.GROUP])
+        commands = batch.commands(Point(0, 0), 0.05)
+        self.assertEqual([kind for kind, _ in commands][-6:], [DrawBatch.POINT] * 5 + [DrawBatch.GROUP])
+        self.assertEqual(commands[-6][1][:4], (-0.5, -5.5, 0.5, -4.5))
+
+    def test_labels(self):
+        canvas = self.canvas()
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0), render_identifiers=True)
+        self.assertEqual(len([name for name, _ in draw_list.calls if name == "add_text"]), 10)
+
+        canvas.scale = 0.5
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0), render_identifiers=True)
+        self.assertEqual(len([name for name, _ in draw_list.calls if name == "add_text"]), 3)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from misc.util import ReferenceFactory
+from parsing.binary_scene import BinaryScene
+from parsing.primitive_parser import PrimitiveParser
+
+
+class BinarySceneTests(TestCase):
+    code = """
+        rect(0, 0, 50, 50, c_ff0000).
+        {
+            circle(1.5, -2, 10).
+            line(0, 0, 10, 10).
+            { vector(0, 0, 45, 100). p(name, 2). }
+        }
+        p(1).
+    """
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "scene" + BinaryScene.extension)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_roundtrip(self):
+        group, _ = PrimitiveParser(self.code).parse(ReferenceFactory())
+        BinaryScene.from_text(self.path, self.code)
+
+        self.assertEqual(BinaryScene.to_text(self.path), "\n".join(primitive.dsl() for primitive in group))
+
+    def test_named_primitives(self):
+        code = "$rect(x, y, w, h)\n$p(a, 1)\n" + self.code
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        BinaryScene.from_text(self.path, code)
+
+        self.assertEqual(BinaryScene(self.path).named_primitives(), named_primitives)
+        text = BinaryScene.to_text(self.path)
+        self.assertTrue(text.startswith("$rect(x, y, w, h)\n$p(a, 1)\n"))
+        self.assertEqual(PrimitiveParser(text).parse(ReferenceFactory())[1], named_primitives)
+
+    def test_columns(self):
+        BinaryScene.from_text(self.path, self.code)
+        scene = BinaryScene(self.path)
+
+        self.assertEqual(len(scene), 6)
+        self.assertEqual(scene.header["groups"], 3)
+        self.assertEqual(scene.columns["arities"].tolist(), [5, 3, 4, 4, 2, 1])
+        self.assertEqual(scene.primitive(1, ReferenceFactory()).parameters, [1.5, -2, 10])
+        self.assertEqual(scene.primitive(4, ReferenceFactory()).parameters, ["name", 2])
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from misc.util import Cancelled, CancellationToken
+from parsing.primitive_parser import PrimitiveParser
+from pattern.incremental import IncrementalSearch
+from pattern.pattern import *
+
+
+class BudgetTests(TestCase):
+    patterns = [PeriodicPattern, LinearPattern, BFSOperatorPattern]
+    code = """
+        { rect(0, 0, 20, 20). rect(30, 0, 20, 20). rect(60, 0, 20, 20). rect(90, 0, 20, 20). }
+        { rect(0, 40, 20, 20). rect(30, 40, 20, 20). rect(60, 40, 20, 20). rect(90, 40, 20, 20). }
+        { rect(0, 80, 20, 20). rect(30, 80, 20, 20). rect(60, 80, 20, 20). rect(90, 80, 20, 20). }
+    """
+
+    def test_search_parameters(self):
+        parameters = [0, 10, 20, 30, 40]
+
+        self.assertIsInstance(Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1)), LinearPattern)
+        # Out of budget, the first pattern that fits is good enough
+        self.assertIsInstance(Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1), _token=CancellationToken(0)), PeriodicPattern)
+
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(Cancelled):
+            Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1), _token=token)
+
+    def test_search_parameters_cheapest_first(self):
+        parameters = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 101]
+
+        # The linear fit is tried first and fails, the BFS fit cannot outrank the periodic one
+        report = Pattern.Report()
+        self.assertIsInstance(Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1), _report=report), PeriodicPattern)
+        self.assertEqual((report.fits, report.skipped), (2, 1))
+
+        report = Pattern.Report()
+        self.assertIsInstance(Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1), _token=CancellationToken(0), _report=report), PeriodicPattern)
+        self.assertEqual((report.fits, report.skipped), (1, 0))
+
+    def test_fitters(self):
+        numbers = np.array([1.0, 2.0, 4.0, 8.0, 16.0, 32.0])
+
+        self.assertIsNotNone(BFSOperatorPattern.apply(numbers, ParameterFlags(numbers), _token=CancellationToken(10)))
+        self.assertIsNone(BFSOperatorPattern.apply(numbers, ParameterFlags(numbers), _token=CancellationToken(0)))
+        self.assertIsNone(SinusoidalPattern.apply(numbers, ParameterFlags(numbers), _token=CancellationToken(0)))
+
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(Cancelled):
+            SinusoidalPattern.apply(numbers, ParameterFlags(numbers), _token=token)
+
+    def test_progress(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        completed = []
+
+        pattern = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory(), _progress=lambda group, found: completed.append((group, found)))
+        self.assertEqual([group for group, _ in completed], [root[0], root[1], root[2], root])
+        self.assertIs(completed[-1][1], pattern)
+
+    def test_incremental(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        search = IncrementalSearch()
+        full = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+
+        partial = search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), _token=CancellationToken(0))
+        self.assertNotEqual(partial.dsl(), full.dsl())
+
+        # Settled fits are not kept, so searching again with time to spare finds the same patterns as a full search
+        refined = search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1))
+        self.assertEqual(refined.dsl(), full.dsl())
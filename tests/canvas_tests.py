@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+import imgui
+
+from gui.canvas import Canvas
+from gui.graphics import Point
+from gui.primitives import *
+
+
+class DrawList:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+
+class CanvasTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        imgui.create_context()
+
+    def canvas(self) -> Canvas:
+        canvas = Canvas()
+        canvas.primitives = PrimitiveGroup(0,
+            Rect(1, 4, 0, 0, 10, 10),
+            PrimitiveGroup(2, *[Circle(3 + index, 3, 1000 + index * 20, 0, 5) for index in range(10)]))
+        canvas.selected_group = 0
+
+        return canvas
+
+    def test_viewport(self):
+        canvas = self.canvas()
+        canvas.scale = 2.0
+
+        viewport = canvas.viewport(Point(100, 50), Point(400, 300))
+        self.assertEqual((viewport.min_x(), viewport.min_y(), viewport.max_x(), viewport.max_y()), (-50, -125, 150, 25))
+
+    def test_culling(self):
+        canvas = self.canvas()
+
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0))
+        self.assertEqual(len(draw_list.calls), 12)
+
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0), viewport=canvas.viewport(Point(100, 100), Point(200, 200)))
+        self.assertEqual([name for name, _ in draw_list.calls], ["add_rect_filled"])
+
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0), viewport=canvas.viewport(Point(-990, 100), Point(30, 200)))
+        self.assertEqual(len(draw_list.calls), 3)
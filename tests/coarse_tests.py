@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from pattern.fits import FitCache
+from pattern.pattern import *
+
+
+class CoarseTests(TestCase):
+    length = ParameterPattern.coarse_length * 2
+
+    def fit_both(self, parameters: np.ndarray, pattern: Type[ParameterPattern], tolerance: Tolerance) -> Tuple[Optional[ParameterPattern], Optional[ParameterPattern]]:
+        flags = ParameterFlags(list(parameters))
+        return pattern.fit_coarse(parameters, flags, tolerance), pattern.fit(parameters, flags, tolerance)
+
+    def test_regular(self):
+        sequences = [
+            (np.full(self.length, 5), ConstantPattern),
+            (np.arange(self.length) * 3 + 1, LinearPattern),
+            (np.array([0, 10, 25] * (self.length // 3)), PeriodicPattern),
+            (np.array([0, 10, 25] * (self.length // 3)), LinearPattern),
+        ]
+        for parameters, pattern in sequences:
+            coarse, full = self.fit_both(parameters, pattern, Tolerance(0, 0.1))
+            self.assertEqual(coarse.dsl(_confidence=True) if coarse is not None else None, full.dsl(_confidence=True) if full is not None else None)
+
+    def test_verification(self):
+        # Regular over the prefix only, so the whole sequence is fitted. Periodic and operator patterns take long on all of it.
+        parameters = np.arange(self.length, dtype=float)
+        parameters[ParameterPattern.coarse_prefix * 2:] += 1000.0
+        for pattern in [ConstantPattern, LinearPattern, SinusoidalPattern]:
+            coarse, full = self.fit_both(parameters, pattern, Tolerance(0, 0))
+            self.assertEqual(coarse.dsl(_confidence=True) if coarse is not None else None, full.dsl(_confidence=True) if full is not None else None)
+
+    def test_prefix_only(self):
+        # Regular over the prefix only, and close to the pattern relative to the largest parameter but not to each one
+        parameters = np.arange(self.length) * 3.0
+        parameters[ParameterPattern.coarse_prefix:] += np.tile([1000.0, -1000.0], (self.length - ParameterPattern.coarse_prefix) // 2)
+        coarse, full = self.fit_both(parameters, LinearPattern, Tolerance(0, 0.1))
+        self.assertIsNone(full)
+        self.assertIsNone(coarse)
+        self.assertNotIsInstance(Pattern.search_parameters(list(parameters), [ConstantPattern, LinearPattern, SinusoidalPattern], Tolerance(0, 0.1)), LinearPattern)
+
+    def test_sequence(self):
+        for pattern in [LinearPattern(1, 0.5), BFSOperatorPattern([Operator.Div, Operator.Min], [1.0, 2.0, 1.0]), BFSOperatorPattern([Operator.Mul, Operator.Plus], [2.0, 3.0, 1.0]), SinusoidalPattern(2.0, 0.5, 0.1, 1.0)]:
+            self.assertTrue(np.allclose(pattern.sequence(10), [pattern.next(None, nth) for nth in range(10)]))
+
+        self.assertEqual(list(ConstantPattern(2.0).sequence(3)), [2.0, 2.0, 2.0])
+        self.assertEqual(list(PeriodicPattern([3, 1, 4]).sequence(5)), [3, 1, 4, 3, 1])
+
+    def test_replay(self):
+        # The acceptance of a coarse fit covers the prefix and the verification, so it is reused under other tolerances
+        parameters = np.arange(self.length) * 3.0 + np.tile([0.0, 0.01], self.length // 2)
+        fits = FitCache()
+        flags = ParameterFlags(list(parameters))
+
+        first, fitted = fits.apply(LinearPattern, parameters, flags, Tolerance(0.5, 0))
+        self.assertTrue(fitted)
+        self.assertIsNotNone(first)
+
+        second, fitted = fits.apply(LinearPattern, parameters, flags, Tolerance(1.0, 0))
+        self.assertFalse(fitted)
+        self.assertEqual(second.dsl(), first.dsl())
+
+        self.assertEqual(fits.apply(LinearPattern, parameters, flags, Tolerance(0, 0)), (None, True))
+
+    def test_all_close_to(self):
+        # Keeping only the strictest comparisons decides as numpy.allclose does, and replays under other tolerances
+        random = np.random.RandomState(0)
+        for _ in range(200):
+            values = random.uniform(-10, 10, 20)
+            parameters = values + random.uniform(-1, 1, 20) * random.choice([0.01, 0.1, 1.0])
+            tolerance = Tolerance(random.choice([0, 0.05, 0.5]), random.choice([0, 0.01, 0.1]))
+
+            acceptance = Acceptance()
+            self.assertEqual(acceptance.all_close_to(parameters, values, tolerance), np.allclose(parameters, values, rtol=tolerance.relative, atol=tolerance.absolute))
+
+            other = Tolerance(random.choice([0, 0.05, 0.5]), random.choice([0, 0.01, 0.1]))
+            if acceptance.holds(other):
+                self.assertEqual(Acceptance().all_close_to(parameters, values, other), np.allclose(parameters, values, rtol=other.relative, atol=other.absolute))
@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from misc import util
+from parsing.primitive_parser import PrimitiveParser
+from pattern.codec import SceneCodec
+from pattern.pattern import *
+
+
+class CodecTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern]
+
+    def roundtrip(self, code: str) -> Tuple[PrimitiveGroup, SceneCodec.Encoding, PrimitiveGroup]:
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        encoding = SceneCodec.encode(group, named_primitives, self.patterns, Tolerance(0, 0.1))
+        decoded = SceneCodec.decode(SceneCodec.Encoding.load(encoding.dump()))
+
+        return group, encoding, decoded
+
+    def test_regular(self):
+        code = "\n".join("rect({}, 0, 50, 50).".format(i * 60) for i in range(100))
+        group, encoding, decoded = self.roundtrip(code)
+
+        self.assertEqual(decoded.dsl(), group.dsl())
+        self.assertEqual(len(encoding), 0)
+        self.assertLess(len(encoding.dump()), len(group.dsl()))
+
+    def test_residuals(self):
+        code = "\n".join("rect({}, 0, 50, 50).".format(i * 60) for i in range(100))
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(group, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+
+        group[42][1] = 7
+        encoding = SceneCodec.encode(group, named_primitives, self.patterns, Tolerance(0, 0.1), _pattern=pattern)
+        decoded = SceneCodec.decode(SceneCodec.Encoding.load(encoding.dump()))
+
+        self.assertEqual(decoded.dsl(), group.dsl())
+        self.assertEqual(encoding.corrections, { 42: { 1: 7 } })
+
+    def test_small_floats(self):
+        code = "\n".join("rect({}, 0, {}, 50).".format(i * 60, util.format_number(size)) for i, size in enumerate([1e-20, 1.5e-300, 1e-20, 1.5e-300]))
+        group, encoding, decoded = self.roundtrip(code)
+
+        self.assertEqual([primitive[2] for primitive in decoded], [1e-20, 1.5e-300, 1e-20, 1.5e-300])
+        self.assertEqual(decoded.dsl(), group.dsl())
+
+    def test_groups(self):
+        code = """
+            { circle(0, 0, 10). rect(20, 0, 20). circle(40, 0, 10). }
+            { circle(-20, 20, 10). rect(0, 20, 20). circle(20, 20, 10). }
+            line(0, 0, 10, 10).
+        """
+        group, encoding, decoded = self.roundtrip(code)
+
+        self.assertEqual(decoded.dsl(), group.dsl())
+
+    def test_shape(self):
+        shape = [None, None, [None, None, None], [None, None, None], None]
+
+        self.assertEqual(SceneCodec.dump_shape(shape), "2 {3}*2 1")
+        self.assertEqual(SceneCodec.load_shape(SceneCodec.dump_shape(shape)), shape)
+
+    def test_unknown_primitives(self):
+        # A pattern found on another scene predicts circles the named primitives of this one do not know
+        alternating, named_alternating = PrimitiveParser("\n".join("{}({}, 0, 50).".format(["rect", "circle"][i % 2], i * 60) for i in range(10))).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(alternating, named_alternating, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+
+        group, named_primitives = PrimitiveParser("\n".join("rect({}, 0, 50).".format(i * 60) for i in range(10))).parse(ReferenceFactory())
+        encoding = SceneCodec.encode(group, named_primitives, self.patterns, Tolerance(0, 0.1), _pattern=pattern)
+        decoded = SceneCodec.decode(SceneCodec.Encoding.load(encoding.dump()))
+
+        self.assertEqual(decoded.dsl(), group.dsl())
+        self.assertEqual(sorted(encoding.replacements.keys()), list(range(10)))
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+from parsing.compressor import Compressor
+
+
+class CompressorTests(TestCase):
+    def test_compress(self):
+        code = "@4[0:lin(100, 250), 1:prd(rectangle, rectangle, circle), name:cte(rectangle)]"
+        result = Compressor.compress(code)
+
+        self.assertEqual(result.constants, { "rectangle": "v0" })
+        self.assertTrue(result.code.startswith("$v0 = rectangle\n"))
+        self.assertNotIn("rectangle,", result.code)
+        self.assertLess(result.compressed_size, result.original_size)
+        self.assertGreater(result.saving, 0.0)
+
+    def test_no_saving(self):
+        code = "@2[0:cte(1), 1:cte(1)]"
+        result = Compressor.compress(code)
+
+        self.assertEqual(result.constants, dict())
+        self.assertEqual(result.code, code)
+        self.assertEqual(result.ratio, 1.0)
+
+    def test_reserved(self):
+        code = "#cte(1)(@1[0:cte(1)]){ none, none, none, none, none, none }"
+        result = Compressor.compress(code)
+
+        self.assertNotIn("none", result.constants)
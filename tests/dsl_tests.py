@@ -0,0 +1,37 @@
+from io import StringIO
+from unittest import TestCase
+
+from misc import util
+from parsing.pattern_parser import PatternParser
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+
+
+class DslTests(TestCase):
+    def test_format_number(self):
+        self.assertEqual(util.format_number(3), "3")
+        self.assertEqual(util.format_number(1.5), "1.5")
+        self.assertEqual(util.format_number(np.float64(2.0)), "2.0")
+        self.assertEqual(util.format_number(1e-05), "0.00001")
+        self.assertEqual(util.format_number(1e-20), "0.00000000000000000001")
+        self.assertEqual(util.format_number(1e20), "100000000000000000000.0")
+        self.assertEqual(util.format_number("c_ff0000"), "c_ff0000")
+
+    def test_primitives(self):
+        code = "rect(0, 0, 50, 50).\n{\n\tcircle(1.5, -2, 10).\n\t{\n\t\tp(name, 2).\n\t}\n}"
+        group, _ = PrimitiveParser(code).parse(ReferenceFactory())
+
+        sink = StringIO()
+        group.write_children_dsl(sink)
+        self.assertEqual(sink.getvalue(), code)
+        self.assertEqual(group.children_dsl(), "\n".join(primitive.dsl() for primitive in group))
+
+    def test_patterns(self):
+        code = "\n".join("{{ rect({}, 0, 10, 10). rect({}, 20, 10, 10). }}".format(i * 30, i * 30) for i in range(5))
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(group, named_primitives, [ConstantPattern, LinearPattern, PeriodicPattern], Tolerance(0, 0.1), ReferenceFactory())
+
+        sink = StringIO()
+        pattern.write_dsl(sink, 0, True)
+        self.assertEqual(sink.getvalue(), pattern.dsl(0, True))
+        self.assertIsNotNone(PatternParser(sink.getvalue()).parse())
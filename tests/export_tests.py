@@ -0,0 +1,48 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from gui.export import SvgExporter, TikzExporter
+from gui.graphics import Bounds, Point
+from misc.util import ReferenceFactory
+from parsing.primitive_parser import PrimitiveParser
+
+
+class ExportTests(TestCase):
+    code = """
+        rect(0, 0, 50, 50, c_ff0000).
+        { line(0, 10, 10, 0). { circle(100, 100, 10). } }
+        vector(0, 0, 90, 20).
+        p(1).
+    """
+
+    def export(self, exporter, viewport=None):
+        group, _ = PrimitiveParser(self.code).parse(ReferenceFactory())
+        path = os.path.join(tempfile.mkdtemp(), "export" + exporter.extension)
+        count = exporter.write(path, group, viewport)
+        with open(path) as file:
+            text = file.read()
+        os.remove(path)
+
+        return count, text.split("\n")
+
+    def test_tikz(self):
+        count, lines = self.export(TikzExporter())
+
+        self.assertEqual(count, 4)
+        self.assertEqual(lines[2], "\t\t\\draw [fill={rgb, 255: red, 255; green, 0; blue, 0}, draw opacity=0.5] (-25.0, -25.0) rectangle (25.0, 25.0);")
+        self.assertEqual(lines[3], "\t\t\\draw [color={rgb, 255: red, 102; green, 153; blue, 102}, draw opacity=1.0] (0, 10) -- (10, 0);")
+
+    def test_svg(self):
+        count, lines = self.export(SvgExporter())
+
+        self.assertEqual(count, 4)
+        self.assertTrue(lines[0].startswith("<svg"))
+        self.assertIn("<circle cx=\"100\" cy=\"100\" r=\"10\"", lines[5])
+        self.assertEqual(lines[-2], "</svg>")
+
+    def test_viewport(self):
+        count, lines = self.export(SvgExporter(), Bounds(Point(50, 50), Point(200, 200)))
+
+        self.assertEqual(count, 1)
+        self.assertIn("<circle", lines[3])
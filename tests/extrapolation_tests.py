@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from parsing.primitive_parser import PrimitiveParser
+from pattern.extrapolation import Extrapolation
+from pattern.pattern import *
+
+
+class ExtrapolationTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern]
+
+    def search(self, code: str) -> Tuple[PrimitiveGroup, InstancePattern, Dict[Tuple[str, int], PrimitivePattern.Selectors]]:
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(group, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+
+        return group, pattern, named_primitives
+
+    def expected(self, group: PrimitiveGroup, pattern: InstancePattern, named_primitives, extrapolations: List[int]) -> str:
+        primitives = Pattern.next([group.master], pattern, named_primitives, list(extrapolations), ReferenceFactory())
+
+        return "\n".join(primitive.dsl() for primitive in primitives if primitive is not None)
+
+    def check(self, code: str, counts: List[List[int]]):
+        group, pattern, named_primitives = self.search(code)
+        extrapolation = Extrapolation()
+        output = PrimitiveGroup(-1)
+        reference_factory = ReferenceFactory()
+
+        for extrapolations in counts:
+            extrapolation.apply(output, group.master, pattern, named_primitives, extrapolations, reference_factory)
+
+            self.assertEqual(extrapolation.text(), self.expected(group, pattern, named_primitives, extrapolations))
+            self.assertEqual(output.children_dsl(), extrapolation.text())
+
+        return extrapolation, output
+
+    def test_primitive_pattern(self):
+        code = "\n".join("rect({}, {}, 50, 50).".format(i * 60, i % 2) for i in range(4))
+        self.check(code, [[5], [6], [12], [3], [0], [7]])
+
+    def test_group_pattern(self):
+        code = """
+            { circle(0, 0, 10). rect(20, 0, 20). circle(40, 0, 10). }
+            { circle(-20, 20, 10). rect(0, 20, 20). circle(20, 20, 10). }
+            { circle(-40, 40, 10). rect(-20, 40, 20). circle(0, 40, 10). }
+        """
+        self.check(code, [[3, 3], [4, 3], [4, 5], [2, 5], [2, 1], [6, 2]])
+
+    def test_delta(self):
+        code = "\n".join("rect({}, 0, 50, 50).".format(i * 60) for i in range(4))
+        group, pattern, named_primitives = self.search(code)
+        extrapolation = Extrapolation()
+        output = PrimitiveGroup(-1)
+        reference_factory = ReferenceFactory()
+
+        extrapolation.apply(output, group.master, pattern, named_primitives, [500], reference_factory)
+        kept = output[:500]
+        extrapolation.apply(output, group.master, pattern, named_primitives, [501], reference_factory)
+        extrapolation.apply(output, group.master, pattern, named_primitives, [499], reference_factory)
+
+        self.assertEqual(len(output), 499)
+        self.assertTrue(all(x is y for x, y in zip(kept, output)))
+
+        # A different pattern starts over
+        _, other, _ = self.search(code)
+        extrapolation.apply(output, group.master, other, named_primitives, [499], reference_factory)
+        self.assertFalse(output[0] is kept[0])
+        self.assertEqual(extrapolation.text(), self.expected(group, other, named_primitives, [499]))
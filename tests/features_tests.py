@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from pattern.pattern import *
+
+
+class FeaturesTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern, BFSOperatorPattern, SinusoidalPattern]
+    sequences = [
+        [5, 5, 5, 5, 5],
+        [0, 10, 20, 30, 40],
+        [1, 2, 4, 8, 16, 32],
+        [0, 10, 20, 0, 10, 20],
+        [3.0, 5.5, 3.0, 0.5, 3.0, 5.5, 3.0, 0.5],
+    ]
+
+    def test_shared(self):
+        # Fitting with features shared between all patterns finds what every pattern finds on its own
+        for sequence in self.sequences:
+            parameters = np.array(sequence)
+            flags = ParameterFlags(sequence)
+            features = SequenceFeatures(parameters)
+            for pattern in self.patterns:
+                shared = pattern.apply(parameters, flags, Tolerance(0.5, 0.1), _features=features)
+                alone = pattern.apply(parameters, flags, Tolerance(0.5, 0.1))
+                self.assertEqual(shared.dsl(_confidence=True) if shared is not None else None, alone.dsl(_confidence=True) if alone is not None else None)
+
+    def test_lazy(self):
+        features = SequenceFeatures(np.array([1.0, 2.0, 4.0, 8.0]))
+        self.assertNotIn("ratios", features.__dict__)
+
+        self.assertIs(features.generate(Operator.Min), features.differences)
+        self.assertIs(features.generate(Operator.Div), features.ratios)
+        self.assertEqual(list(features.ratios), [2.0, 2.0, 2.0])
+        self.assertEqual(features.differences_features.mean, 7.0 / 3.0)
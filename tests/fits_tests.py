@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+from parsing.primitive_parser import PrimitiveParser
+from pattern.fits import FitCache
+from pattern.incremental import IncrementalSearch
+from pattern.pattern import *
+
+
+class FitsTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+
+    def test_acceptance(self):
+        numbers = np.array([0.0, 10.0, 20.5, 30.0, 40.0])
+        acceptance = Acceptance()
+        self.assertIsNone(LinearPattern.apply(numbers, ParameterFlags(numbers), Tolerance(0.1, 0), _acceptance=acceptance))
+
+        self.assertTrue(acceptance.holds(Tolerance(0.2, 0)))
+        self.assertFalse(acceptance.holds(Tolerance(1, 0)))
+        self.assertIsNotNone(LinearPattern.apply(numbers, ParameterFlags(numbers), Tolerance(1, 0)))
+
+    def test_fit_cache(self):
+        numbers = np.array([0.0, 10.0, 20.2, 30.0, 40.0])
+        cache = FitCache()
+
+        result, fitted = cache.apply(LinearPattern, numbers, ParameterFlags(numbers), Tolerance(0.5, 0))
+        self.assertTrue(fitted)
+
+        # Another tolerance under which every comparison turns out the same only changes the confidence
+        result, fitted = cache.apply(LinearPattern, numbers, ParameterFlags(numbers), Tolerance(0.6, 0))
+        expected = LinearPattern.apply(numbers, ParameterFlags(numbers), Tolerance(0.6, 0))
+        self.assertFalse(fitted)
+        self.assertEqual(result.dsl(_confidence=True), expected.dsl(_confidence=True))
+        self.assertEqual(result.tolerance.absolute, 0.6)
+
+        result, fitted = cache.apply(LinearPattern, numbers, ParameterFlags(numbers), Tolerance(0.01, 0))
+        self.assertTrue(fitted)
+        self.assertIsNone(result)
+
+        # Both fits are kept, so going back to the first tolerance fits nothing
+        for tolerance in [Tolerance(0.5, 0), Tolerance(0.02, 0)]:
+            result, fitted = cache.apply(LinearPattern, numbers, ParameterFlags(numbers), tolerance)
+            self.assertFalse(fitted)
+            self.assertEqual(result is None, tolerance.absolute < 0.2)
+
+    def test_tolerance(self):
+        code = "\n".join("circle({}, {}, 10).".format(i * 30 + (i % 2) * 0.5, i % 3) for i in range(9))
+        root, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        search = IncrementalSearch()
+
+        for tolerance in [Tolerance(0, 0.1), Tolerance(0.01, 0.1), Tolerance(0.02, 0.1), Tolerance(0, 0.01), Tolerance(0.05, 0.1)]:
+            found = search.search_group_recursive(root, named_primitives, self.patterns, tolerance)
+            expected = Pattern.search_group_recursive(root, named_primitives, self.patterns, tolerance, ReferenceFactory())
+            self.assertEqual(found.dsl(_confidence=True), expected.dsl(_confidence=True))
+
+        # The small absolute tolerances change no comparison, so nothing is fitted again for them
+        search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1))
+        fits = search.report.fits
+        search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0.001, 0.1))
+        self.assertEqual(search.report.fits, fits)
+        self.assertGreater(search.report.reused, 0)
+
+    def test_ranking(self):
+        code = "\n".join("circle({}, {}, 10).".format(i * 30.25, 2 ** i) for i in range(8))
+        root, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        search = IncrementalSearch()
+        search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), _round=1)
+
+        # Fits that were made are only ranked and rounded again, fits skipped before are made once they can win
+        fits = search.report.fits
+        for available_patterns, _round in [(self.patterns, 0), (self.patterns, None), (self.patterns[:3], 1), (self.patterns[1:], 2)]:
+            found = search.search_group_recursive(root, named_primitives, available_patterns, Tolerance(0, 0.1), _round=_round)
+            expected = Pattern.search_group_recursive(root, named_primitives, available_patterns, Tolerance(0, 0.1), ReferenceFactory(), _round=_round)
+            self.assertEqual(found.dsl(_confidence=True), expected.dsl(_confidence=True))
+        # The operator pattern for y once periodic patterns are disabled, and once constant patterns are disabled too, the
+        # linear and periodic patterns for the name and the linear pattern for the radius
+        self.assertEqual(search.report.fits, fits + 4)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from parsing.primitive_parser import PrimitiveParser
+from pattern.incremental import IncrementalSearch
+from pattern.pattern import *
+
+
+class IncrementalTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern]
+    code = """
+        { rect(0, 0, 20, 20). rect(30, 0, 20, 20). rect(60, 0, 20, 20). }
+        { rect(0, 40, 20, 20). rect(30, 40, 20, 20). rect(60, 40, 20, 20). }
+        { rect(0, 80, 20, 20). rect(30, 80, 20, 20). rect(60, 80, 20, 20). }
+    """
+
+    def search(self, root: PrimitiveGroup, named_primitives, search: IncrementalSearch) -> Tuple[str, str]:
+        incremental = search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), _round=1)
+        full = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory(), _round=1)
+
+        return incremental.dsl(), full.dsl()
+
+    def test_same_result(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        search = IncrementalSearch()
+
+        incremental, full = self.search(root, named_primitives, search)
+        self.assertEqual(incremental, full)
+
+        root[1][2][0] = 75
+        incremental, full = self.search(root, named_primitives, search)
+        self.assertEqual(incremental, full)
+
+        root[2].pop(0)
+        incremental, full = self.search(root, named_primitives, search)
+        self.assertEqual(incremental, full)
+
+    def test_reuse(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        search = IncrementalSearch()
+
+        pattern = search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1))
+        fits = search.fits
+        self.assertIs(search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1)), pattern)
+        self.assertEqual(search.fits, fits)
+
+        # Only the x of the edited group is refitted, the root and the other groups keep their patterns
+        root[1][2][0] = 75
+        edited = search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1))
+        self.assertEqual(search.fits, fits + 1)
+        self.assertIs(edited[0], pattern[0])
+        self.assertIsNot(edited[1], pattern[1])
+
+        search.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.2))
+        self.assertGreater(search.fits, fits + 1 + 5)
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from parsing.pattern_parser import PatternParser
+from pattern.pattern import *
+
+
+class PolynomialTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PolynomialPattern, GeometricPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+
+    def test_search(self):
+        cases = [
+            ([i * i for i in range(8)], "poly(0.0, 0.0, 1.0)"),
+            ([i ** 3 - 2 * i for i in range(9)], "poly(0.0, -2.0, 0.0, 1.0)"),
+            ([1.5 * i * i + 2 for i in range(6)], "poly(2.0, 0.0, 1.5)"),
+            ([3 * 2 ** i for i in range(8)], "geo(3.0, 2.0)"),
+            ([5 * (-0.5) ** i for i in range(7)], "geo(5.0, -0.5)"),
+            ([0, 10, 20, 30], "lin(0, 10.0)"),
+            ([0, 10, 20, 0, 10, 20], "prd(0, 10, 20)"),
+        ]
+        for parameters, expected in cases:
+            self.assertEqual(Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1)).dsl(), expected)
+
+    def test_approximate(self):
+        # Approximate fits score below periodic and operator patterns, which reproduce the parameters exactly
+        for parameters in [[1, 2, 3, 5, 8, 13, 21], [1, 2, 4, 8, 16, 33]]:
+            found = Pattern.search_parameters(parameters, self.patterns, Tolerance(0, 0.1))
+            self.assertEqual(found.dsl(_confidence=True), "prd({}, 1.0)".format(", ".join(map(str, parameters))))
+
+        approximate = PolynomialPattern.apply(np.array([1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0]), ParameterFlags([1, 2, 3, 5, 8, 13, 21]), Tolerance(0, 0.1))
+        self.assertLess(approximate.confidence, ParameterPattern.exact_confidence)
+        self.assertLess(approximate.score(), PeriodicPattern.weight())
+        self.assertEqual(PolynomialPattern([0.0, 0.0, 1.0], 1.0).score(), PolynomialPattern.weight())
+
+    def test_before_operators(self):
+        # Constant, linear and geometric are fitted, the geometric fit outranks the rest, including the operator search
+        report = Pattern.Report()
+        Pattern.search_parameters([1, 2, 4, 8, 16, 32], self.patterns, Tolerance(0, 0.1), _report=report)
+        self.assertEqual((report.fits, report.skipped), (3, 4))
+
+    def test_round(self):
+        # Values that no longer reproduce the parameters once rounded stay unrounded
+        geometric = [100 * 1.05 ** i for i in range(8)]
+        found = Pattern.search_parameters(geometric, self.patterns, Tolerance(0, 0.1), 1)
+        self.assertEqual(found.dsl(), "geo(100.0, 1.05)")
+        self.assertTrue(found.reproduces(np.array(geometric)))
+
+        self.assertEqual(Pattern.search_parameters([0.001 * i * i for i in range(8)], self.patterns, Tolerance(0, 0.1), 1).dsl(), "poly(0.0, 0.0, 0.001)")
+        self.assertEqual(Pattern.search_parameters([3 * 2 ** i for i in range(8)], self.patterns, Tolerance(0, 0.1), 1).dsl(), "geo(3.0, 2.0)")
+
+    def test_next(self):
+        polynomial = PolynomialPattern([2.0, 0.0, 1.5])
+        self.assertEqual([polynomial.next(None, nth) for nth in range(4)], [2.0, 3.5, 8.0, 15.5])
+        self.assertEqual(polynomial.next(10.0, 3), 23.5)
+
+        geometric = GeometricPattern(3.0, 2.0)
+        self.assertEqual([geometric.next(None, nth) for nth in range(4)], [3.0, 6.0, 12.0, 24.0])
+        self.assertEqual(geometric.next(10.0, 3), 31.0)
+
+    def test_dsl(self):
+        code = "@0[name:cte(rect), 0:poly(1, 2.5, 3), 1:geo(2, 1.5), 2:cte(20), 3:cte(30)]"
+        pattern = PatternParser(code).parse()
+
+        self.assertEqual(pattern.dsl(), code)
+        self.assertIsInstance(pattern.patterns[0], PolynomialPattern)
+        self.assertIsInstance(pattern.patterns[1], GeometricPattern)
+        self.assertEqual(str(pattern.patterns[0]), "poly(1, 2.5, 3)")
+        self.assertEqual(str(pattern.patterns[1]), "geo(2, 1.5)")
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from gui.graphics import Point
+from gui.primitives import *
+
+
+class PrimitivesTests(TestCase):
+    def test_cached_geometry(self):
+        rect = Rect(0, 4, 0, 0, 10, 10)
+        group = PrimitiveGroup(-1, PrimitiveGroup(-2, rect), Rect(1, 4, 100, 0, 10, 10))
+
+        bounds = group.bounds()
+        self.assertIs(group.bounds(), bounds)
+        self.assertIs(group[1].bounds(), group[1].bounds())
+
+        rect.move(Point(-50, 0))
+        self.assertIsNot(group.bounds(), bounds)
+        self.assertEqual(group.bounds().min_x(), -55)
+        self.assertEqual(group[0].position().x, -50)
+
+        vector = Vector(2, 4, 0, 0, 90, 10)
+        start, end = vector.endpoints()
+        self.assertAlmostEqual(end.y, 10)
+        vector[2] = 0
+        self.assertAlmostEqual(vector.handles()[1].x, 10)
+
+    def test_handles_then_edit(self):
+        rect = Rect(0, 4, 0, 0, 10, 10)
+        inner = PrimitiveGroup(-2, rect, Rect(1, 4, 20, 0, 10, 10))
+        group = PrimitiveGroup(-1, inner, Rect(3, 4, 100, 0, 10, 10))
+        group.bounds()
+        inner.spatial_index()
+
+        # Reading only the handles of the groups reads none of their children
+        rect.move(Point(-50, 0))
+        inner.handles()
+        group.handles()
+        rect.move(Point(-50, 0))
+        inner[1].move(Point(0, 50))
+        self.assertEqual(inner.bounds().min_x(), -105)
+        self.assertEqual(group.bounds().min_x(), -105)
+        self.assertEqual(inner.spatial_index().query_point(Point(20, 50)), [inner[1]])
+
+        versions = inner.version, group.version
+        rect.move(Point(-50, 0))
+        self.assertGreater(inner.version, versions[0])
+        self.assertGreater(group.version, versions[1])
+
+    def test_registry(self):
+        inner = PrimitiveGroup(3, Circle(4, 2, 0, 0), Circle(5, 2, 1, 1))
+        root = PrimitiveGroup(0, Rect(1, 2, 0, 0), PrimitiveGroup(2, inner))
+
+        self.assertIs(root.find(5), inner[1])
+        self.assertEqual(root.depth(5), 3)
+        self.assertIs(root.parent(5), inner)
+        self.assertIs(root[1].find(4), inner[0])
+        self.assertEqual(root[1].depth(4), 2)
+        self.assertIsNone(inner.find(1))
+
+        line = Line(6, 4, 0, 0, 1, 1)
+        inner.append(line)
+        self.assertIs(root.find(6), line)
+        self.assertEqual(root.depth(6), 3)
+
+        root[1].remove(inner)
+        self.assertIsNone(root.find(5))
+        self.assertIs(inner.find(5), inner[1])
+        self.assertEqual(inner.depth(5), 1)
+
+    def test_signatures(self):
+        inner = PrimitiveGroup(3, Circle(4, 2, 0, 0), Circle(5, 3, 1, 1, 2))
+        root = PrimitiveGroup(0, Rect(1, 2, 0, 0), PrimitiveGroup(2, inner))
+
+        self.assertEqual(root.signatures(), { ("rect", 2): 1, ("circle", 2): 1, ("circle", 3): 1 })
+        inner.append(Circle(6, 2, 5, 5))
+        self.assertEqual(root.signatures()[("circle", 2)], 2)
+        root[1].remove(inner)
+        self.assertEqual(root.signatures(), { ("rect", 2): 1 })
+
+    def test_splice(self):
+        reference_factory = ReferenceFactory()
+        group = PrimitiveGroup(reference_factory.new(), *[Rect(reference_factory.new(), 4, i, 0, 1, 1) for i in range(5)])
+        group.splice(1, 3, [Line(reference_factory.new(), 5, 0, 0, 1, 1, "c_ff0000ff")])
+
+        self.assertEqual([primitive[0] for primitive in group], [0, 0, 3, 4])
+        self.assertEqual((group.min_arity, group.max_arity, group.arity), (4, 5, 4))
+        self.assertEqual(group.signatures(), { ("rect", 4): 3, ("line", 5): 1 })
+        self.assertEqual(group.intersect(Point(2.8, 0.2)), 2)
+
+        group.splice(0, 4, [])
+        self.assertEqual((group.master, group.min_arity, group.arity), (None, None, 0))
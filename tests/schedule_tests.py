@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from pattern.pattern import *
+
+
+class ScheduleTests(TestCase):
+    sequences = [
+        [5, 5, 5, 5, 5],
+        [0, 10, 20, 30, 40],
+        [1, 2, 4, 8, 16, 32],
+        [0, 10, 20, 0, 10, 20],
+        [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 101],
+        [3.0, 5.5, 3.0, 0.5, 3.0, 5.5, 3.0, 0.5],
+        ["rect", "circle", "rect", "circle"],
+    ]
+
+    @staticmethod
+    def search_all(parameters: Primitive.Parameters, available_patterns: List[ParameterPattern], tolerance: Tolerance) -> Optional[ParameterPattern]:
+        flags = ParameterFlags(parameters)
+        ranked_patterns = []
+        for available_pattern in available_patterns:
+            if len(parameters) < available_pattern.minimum_parameters():
+                continue
+
+            input_parameters = np.array(parameters, flags.dtype)
+            adjusted_tolerance = Tolerance(np.ptp(input_parameters) * tolerance.absolute, tolerance.relative) if not flags.has_str() else default.tolerance
+            result = available_pattern.apply(input_parameters, flags, adjusted_tolerance)
+            if result is not None:
+                ranked_patterns.append((result.score(), result))
+
+        ranked_patterns.sort(key=lambda pattern: pattern[0], reverse=True)
+
+        return ranked_patterns[0][1] if len(ranked_patterns) > 0 else None
+
+    def test_same_result(self):
+        patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+        for available_patterns in [patterns, list(reversed(patterns))]:
+            for parameters in self.sequences:
+                expected = self.search_all(parameters, available_patterns, Tolerance(0, 0.1))
+                found = Pattern.search_parameters(parameters, available_patterns, Tolerance(0, 0.1))
+                self.assertEqual(found.dsl(_confidence=True) if found is not None else None, expected.dsl(_confidence=True) if expected is not None else None)
+
+    def test_report(self):
+        patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+
+        report = Pattern.Report()
+        Pattern.search_parameters([5, 5, 5, 5, 5], patterns, Tolerance(0, 0.1), _report=report)
+        self.assertEqual((report.fits, report.skipped), (1, 4))
+
+        report = Pattern.Report()
+        Pattern.search_parameters([0, 10, 20, 30, 40], patterns, Tolerance(0, 0.1), _report=report)
+        self.assertEqual(report.fits + report.skipped, 5)
+        self.assertGreater(report.skipped, 0)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from gui.graphics import Bounds, Point
+from gui.primitives import *
+from gui.spatial import SpatialIndex
+
+
+class SpatialTests(TestCase):
+    def group(self, count: int) -> PrimitiveGroup:
+        return PrimitiveGroup(-1, *[Rect(index, 4, index * 10, 0, 8, 8) for index in range(count)])
+
+    def test_query(self):
+        group = self.group(1000)
+
+        self.assertEqual(group.intersect(Point(500, 2)), 50)
+        self.assertIsNone(group.intersect(Point(505, 2)))
+        self.assertEqual([rect.identifier for rect in group.query(Bounds(Point(95, -1), Point(125, 1)))], [10, 11, 12])
+
+    def test_topmost(self):
+        group = self.group(3)
+        group.append(Rect(3, 4, 10, 0, 100, 100))
+
+        self.assertEqual(group.intersect(Point(10, 0)), 3)
+        group.insert(0, group.pop(3))
+        self.assertEqual(group.intersect(Point(10, 0)), 2)
+        self.assertIs(group.master, group[0])
+
+    def test_edits(self):
+        group = self.group(10)
+        nested = PrimitiveGroup(-2, Circle(10, 3, 1000, 1000, 5))
+        group.append(nested)
+        self.assertIs(nested[0].parent_group, nested)
+
+        self.assertEqual(group.intersect(Point(1000, 1000)), 10)
+        group[0].move(Point(2000, 0))
+        nested[0].move(Point(500, 0))
+        self.assertEqual(group.intersect(Point(2000, 0)), 0)
+        self.assertEqual(group.intersect(Point(1500, 1000)), 10)
+        self.assertIsNone(group.intersect(Point(1000, 1000)))
+
+        group.remove(group[0])
+        self.assertIsNone(group.intersect(Point(2000, 0)))
+        self.assertEqual(group.intersect(Point(1500, 1000)), 9)
+
+    def test_large(self):
+        index = SpatialIndex(cell_size=1)
+        rect = Rect(0, 4, 0, 0, 100, 100)
+        index.insert(rect)
+
+        self.assertIn(id(rect), index.large)
+        self.assertEqual(index.query_point(Point(49, 49)), [rect])
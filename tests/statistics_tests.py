@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+from pattern.statistics import PatternStatistics
+
+
+class StatisticsTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern, PeriodicPattern, SinusoidalPattern]
+
+    def test_order(self):
+        statistics = PatternStatistics()
+        self.assertEqual(statistics.order("size", 10, self.patterns), [ConstantPattern, LinearPattern, PeriodicPattern, SinusoidalPattern, BFSOperatorPattern])
+
+        statistics.record("size", 10, SinusoidalPattern(1, 1, 0, 0))
+        self.assertEqual(statistics.order("size", 12, self.patterns)[0], SinusoidalPattern)
+        self.assertEqual(statistics.order("size", 100, self.patterns)[0], ConstantPattern)
+        self.assertEqual(statistics.order("coordinate", 10, self.patterns)[0], ConstantPattern)
+
+    def test_search(self):
+        # Without periodic patterns, which fit anything, the doubling y coordinates are only found by the slowest fitter
+        patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern, SinusoidalPattern]
+        code = "\n".join("circle({}, {}, 10).".format(i * 30, 2 ** i) for i in range(8))
+        root, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        expected = Pattern.search_group_recursive(root, named_primitives, patterns, Tolerance(0, 0.1), ReferenceFactory())
+        self.assertIsInstance(expected.patterns[1], BFSOperatorPattern)
+
+        statistics = PatternStatistics()
+        first = Pattern.Report()
+        found = Pattern.search_group_recursive(root, named_primitives, patterns, Tolerance(0, 0.1), ReferenceFactory(), _report=first, _statistics=statistics)
+        self.assertEqual(found.dsl(), expected.dsl())
+        self.assertEqual(statistics.wins["coordinate:8"], { "lin": 1, "op": 1 })
+
+        # The operator pattern is fitted first now, so the sinusoidal fit that cannot outrank it is skipped
+        second = Pattern.Report()
+        found = Pattern.search_group_recursive(root, named_primitives, patterns, Tolerance(0, 0.1), ReferenceFactory(), _report=second, _statistics=statistics)
+        self.assertEqual(found.dsl(), expected.dsl())
+        self.assertLess(second.fits, first.fits)
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statistics", "statistics.json")
+            statistics = PatternStatistics(path)
+            statistics.record("name", 2, ConstantPattern("rect"))
+            statistics.save()
+            self.assertFalse(statistics.changed)
+
+            loaded = PatternStatistics(path)
+            self.assertEqual(loaded.wins, { "name:3": { "cte": 1 } })
+
+            with open(path, "w") as file:
+                file.write("{")
+            self.assertEqual(PatternStatistics(path).wins, dict())
+
+            with open(path, "w") as file:
+                file.write('{"coordinate:8": {"lin": null}}')
+            self.assertEqual(PatternStatistics(path).wins, dict())
+
+            # A directory in place of the file cannot be opened
+            self.assertEqual(PatternStatistics(os.path.dirname(path)).wins, dict())
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from parsing.binary_scene import BinaryScene
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+from pattern.tuning import ToleranceTuner
+
+
+class TuningTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, BFSOperatorPattern]
+    code = """
+        { rect(0, 0, 20, 20). rect(30, 0, 20, 20). rect(60, 0, 20, 20). rect(91, 0, 20, 20). }
+        { rect(0, 40, 20, 20). rect(30, 40, 20, 20). rect(60, 40, 20, 20). rect(90, 40, 20, 20). }
+        { rect(0, 80, 20, 20). rect(30, 80, 20, 20). rect(60, 80, 20, 20). rect(90, 80, 20, 20). }
+    """
+
+    def test_front(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        tuner = ToleranceTuner(_workers=4)
+        front = tuner.tune(root, named_primitives, self.patterns)
+
+        self.assertGreater(len(front), 0)
+        for point in front:
+            expected = Pattern.search_group_recursive(root, named_primitives, self.patterns, point.tolerance, ReferenceFactory())
+            self.assertEqual(point.pattern.dsl(), expected.dsl())
+            self.assertFalse(any(other.dominates(point) for other in front))
+        self.assertEqual([point.length for point in front], sorted(point.length for point in front))
+
+        # Which grid point fits first depends on the threads, but not the results. Searched one after another, most fits
+        # are only accepted again.
+        sequential = ToleranceTuner(_workers=1)
+        self.assertEqual([(point.pattern.dsl(), point.error) for point in sequential.tune(root, named_primitives, self.patterns)], [(point.pattern.dsl(), point.error) for point in front])
+        self.assertEqual(tuner.report.fits + tuner.report.reused, sequential.report.fits + sequential.report.reused)
+        self.assertGreater(sequential.report.reused, sequential.report.fits)
+
+    def test_error(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        primitives = ToleranceTuner.primitives(root)
+
+        exact = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+        self.assertLess(ToleranceTuner.error(root, primitives, exact, named_primitives), 1)
+
+        # The first row does not fit without tolerance, so its primitives are missing
+        strict = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0), ReferenceFactory())
+        self.assertGreater(ToleranceTuner.error(root, primitives, strict, named_primitives), 100)
+
+    def test_select(self):
+        points = [ToleranceTuner.Point(Tolerance(0, 0), None, length, error) for length, error in [(100, 50.0), (120, 1.0), (300, 0.0)]]
+
+        self.assertEqual(ToleranceTuner.front(points + [ToleranceTuner.Point(Tolerance(0, 0), None, 150, 1.0)]), points)
+        self.assertIs(ToleranceTuner.select(points), points[1])
+        self.assertIsNone(ToleranceTuner.select([]))
+
+    def test_file(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        expected = ToleranceTuner.select(ToleranceTuner().tune(root, named_primitives, self.patterns))
+
+        with tempfile.TemporaryDirectory() as directory:
+            text = os.path.join(directory, "scene.txt")
+            with open(text, "w") as file:
+                file.write(self.code)
+            binary = os.path.join(directory, "scene" + BinaryScene.extension)
+            BinaryScene.write(binary, root, named_primitives)
+
+            tuner = ToleranceTuner()
+            for path in [text, binary]:
+                point = tuner.tune_file(path, self.patterns)
+                self.assertEqual((point.tolerance.absolute, point.tolerance.relative), (expected.tolerance.absolute, expected.tolerance.relative))
+                self.assertEqual(point.pattern.dsl(), expected.pattern.dsl())
@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+import imgui
+
+from gui.canvas import Canvas
+from gui.graphics import Bounds, Point
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+from pattern.virtual import VirtualPrimitiveGroup
+from tests.canvas_tests import DrawList
+
+
+class VirtualTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern]
+
+    @classmethod
+    def setUpClass(cls):
+        imgui.create_context()
+
+    def virtual(self, code: str, extrapolations: List[int]) -> Tuple[VirtualPrimitiveGroup, List[Primitive]]:
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(group, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+        expected = Pattern.next([group.master], pattern, named_primitives, list(extrapolations), ReferenceFactory())
+        virtual = VirtualPrimitiveGroup(-1, group.master, pattern, named_primitives, extrapolations, ReferenceFactory())
+        virtual.chunk_size = 4
+        virtual.max_chunks = 3
+
+        return virtual, expected
+
+    def test_primitive_pattern(self):
+        code = "\n".join("rect({}, {}, 50, 50).".format(i * 60, i % 2) for i in range(4))
+        virtual, expected = self.virtual(code, [30])
+
+        self.assertEqual(len(virtual), 30)
+        self.assertEqual(virtual.window_dsl(0, 30), "\n".join(primitive.dsl() for primitive in expected))
+        self.assertEqual(virtual[17].dsl(), expected[17].dsl())
+        self.assertEqual(virtual.window_dsl(9, 14), "\n".join(primitive.dsl() for primitive in expected[9:14]))
+
+    def test_group_pattern(self):
+        code = """
+            { circle(0, 0, 10). rect(20, 0, 20). circle(40, 0, 10). }
+            { circle(-20, 20, 10). rect(0, 20, 20). circle(20, 20, 10). }
+            { circle(-40, 40, 10). rect(-20, 40, 20). circle(0, 40, 10). }
+        """
+        virtual, expected = self.virtual(code, [5, 4])
+
+        self.assertEqual(len(virtual), len(expected))
+        self.assertEqual("\n".join(primitive.dsl() for primitive in virtual), "\n".join(primitive.dsl() for primitive in expected))
+        self.assertEqual(virtual.window_dsl(6, 11), "\n".join(primitive.dsl() for primitive in expected[6:11]))
+
+    def test_chunks(self):
+        code = "\n".join("rect({}, 0, 50, 50).".format(i * 60) for i in range(4))
+        virtual, _ = self.virtual(code, [100])
+
+        first = virtual[0]
+        for index in range(0, 40, 4):
+            virtual[index]
+        self.assertEqual(len(virtual._chunks), 3)
+        self.assertFalse(virtual[0] is first)
+        self.assertEqual(len(virtual._chunk_bounds), 10)
+
+        bounds = virtual.bounds()
+        self.assertEqual((bounds.min.x, bounds.max.x), (-25, 99 * 60 + 25))
+
+    def test_bounds(self):
+        # Only the first and last chunks are generated, chunks found outside of them widen the bounds
+        code = "\n".join("rect({}, {}, 50, 50).".format(i * 60, 100 if i == 2 else 0) for i in range(3))
+        group, named_primitives = PrimitiveParser(code).parse(ReferenceFactory())
+        pattern = Pattern.search_group_recursive(group, named_primitives, [LinearPattern, PeriodicPattern], Tolerance(0, 0.1), ReferenceFactory())
+        virtual = VirtualPrimitiveGroup(-1, group.master, pattern, named_primitives, [98])
+        virtual.chunk_size = 2
+
+        bounds = virtual.bounds()
+        self.assertEqual(len(virtual._chunk_bounds), 2)
+        self.assertEqual((bounds.min.x, bounds.max.x, bounds.max.y), (-25, 97 * 60 + 25, 25))
+
+        virtual[2]
+        self.assertEqual(virtual.bounds().max.y, 125)
+
+        self.assertTrue(virtual.generates(group.master, pattern, named_primitives, [98]))
+        self.assertFalse(virtual.generates(group.master, pattern, named_primitives, [99]))
+        group.master.move(Point(1, 0))
+        self.assertFalse(virtual.generates(group.master, pattern, named_primitives, [98]))
+
+    def test_render(self):
+        code = "\n".join("rect({}, 0, 50, 50).".format(i * 60) for i in range(4))
+        virtual, _ = self.virtual(code, [100])
+        canvas = Canvas()
+        canvas.primitives = virtual
+
+        # Unknown chunks are discovered a few per frame
+        virtual.max_discoveries = 10
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0), viewport=Bounds(Point(0, -100), Point(500, 100)))
+        self.assertEqual(len(virtual._chunk_bounds), 10)
+        self.assertEqual(len(draw_list.calls), 9)
+
+        # Zoomed out, every chunk is a single box without being generated again
+        for chunk in range(virtual.chunk_count()):
+            virtual.chunk_bounds(chunk)
+        virtual._chunks.clear()
+        canvas.scale = 0.01
+        draw_list = DrawList()
+        canvas.render(draw_list, Point(0, 0))
+        self.assertEqual(len(draw_list.calls), 25)
+        self.assertEqual(len(virtual._chunks), 0)
@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+from gui.worker import SearchWorker, Snapshot
+from parsing.primitive_parser import PrimitiveParser
+from pattern.pattern import *
+from pattern.tuning import ToleranceTuner
+
+
+class WorkerTests(TestCase):
+    patterns = [ConstantPattern, LinearPattern, PeriodicPattern]
+    code = """
+        { rect(0, 0, 20, 20). rect(30, 0, 20, 20). rect(60, 0, 20, 20). }
+        { rect(0, 40, 20, 20). rect(30, 40, 20, 20). rect(60, 40, 20, 20). }
+        { rect(0, 80, 20, 20). rect(30, 80, 20, 20). rect(60, 80, 20, 20). }
+    """
+
+    def test_snapshot(self):
+        root, _ = PrimitiveParser(self.code).parse(ReferenceFactory())
+        snapshot = Snapshot()
+
+        first = snapshot.copy(root)
+        self.assertEqual(first.dsl(), root.dsl())
+
+        root[1][2][0] = 75
+        second = snapshot.copy(root)
+        self.assertEqual(second.dsl(), root.dsl())
+        self.assertNotEqual(first.dsl(), root.dsl())
+        self.assertIsNot(second, first)
+        self.assertIs(second[0], first[0])
+        self.assertIsNot(second[1], first[1])
+
+        self.assertIs(snapshot.copy(root), second)
+
+        # Shared groups are not attached to the copies that share them
+        self.assertIsNone(first[0].parent_group)
+        self.assertEqual(second[0].signatures(), { ("rect", 4): 3 })
+        self.assertEqual(second.signatures(), { ("rect", 4): 9 })
+
+    def test_search(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        worker = SearchWorker()
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1)))
+        result = worker.wait(10)
+
+        expected = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+        self.assertIsNone(result.error)
+        self.assertEqual(result.opatterns, expected.dsl())
+        self.assertFalse(worker.busy)
+
+    def test_supersede(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        worker = SearchWorker()
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1)))
+        root[1][2][0] = 75
+        generation = worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1)))
+        result = worker.wait(10)
+
+        expected = Pattern.search_group_recursive(root, named_primitives, self.patterns, Tolerance(0, 0.1), ReferenceFactory())
+        self.assertEqual(result.generation, generation)
+        self.assertEqual(result.opatterns, expected.dsl())
+        self.assertIsNone(worker.poll())
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.2)))
+        worker.cancel()
+        self.assertIsNone(worker.wait(10))
+
+    def test_budget(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        worker = SearchWorker()
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1), _budget=0))
+        self.assertTrue(worker.wait(10).partial)
+        self.assertEqual(worker.progress, 4)
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1), _budget=10))
+        self.assertFalse(worker.wait(10).partial)
+
+    def test_tune(self):
+        root, named_primitives = PrimitiveParser(self.code).parse(ReferenceFactory())
+        worker = SearchWorker()
+
+        worker.submit(SearchWorker.Request(worker.snapshot.copy(root), named_primitives, self.patterns, Tolerance(0, 0.1), _tune=True))
+        result = worker.wait(60)
+
+        point = ToleranceTuner.select(ToleranceTuner().tune(root, named_primitives, self.patterns))
+        self.assertIsNone(result.error)
+        self.assertEqual((result.tolerance.absolute, result.tolerance.relative), (point.tolerance.absolute, point.tolerance.relative))
+        self.assertEqual(result.opatterns, point.pattern.dsl())